@@ -0,0 +1,176 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aggregates import RunningAggregates
+from cache_policy import PolicyCache
+from pipeline import Boundary, apply_new_records, fetch_new_records_by_type, stream_transactions, sync_boundaries
+from roblox_api import RobloxAPI
+from transaction_store import TransactionStore
+
+# Upper bound on accounts talking to the API at the same time, so a long
+# account list does not turn into a burst that trips rate limiting.
+MAX_PARALLEL_ACCOUNTS = 4
+
+@dataclass
+class Account:
+    api: RobloxAPI
+    user_info: Dict
+    store: Optional[TransactionStore] = None
+    aggregates: Optional[RunningAggregates] = None
+
+    @property
+    def user_id(self):
+        return self.user_info.get('id')
+
+    @property
+    def label(self) -> str:
+        return self.user_info.get('name') or str(self.user_id)
+
+    def reset(self):
+        self.store = TransactionStore()
+        self.aggregates = RunningAggregates(self.store)
+
+def _run_parallel(func: Callable, items: List, max_workers: int) -> List:
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        return list(pool.map(func, items))
+
+def connect_accounts(cookies: List[str], cache: Optional[PolicyCache] = None,
+                     max_workers: int = MAX_PARALLEL_ACCOUNTS) -> List[Optional[Account]]:
+    # One entry per cookie, in order; None where the cookie was rejected.
+    def connect(cookie: str) -> Optional[Account]:
+        api = RobloxAPI(cookie, cache=cache)
+        user_info = api.get_user_info()
+        if not user_info:
+            return None
+        return Account(api, user_info)
+
+    return _run_parallel(connect, cookies, max_workers)
+
+def merge_accounts(existing: List[Account], added: List[Optional[Account]]) -> Tuple[List[Account], int]:
+    # Drops rejected cookies and accounts that are already signed in; returns
+    # the new accounts and how many entries were skipped.
+    known = {account.user_id for account in existing}
+    merged = []
+    for account in added:
+        if account is None or account.user_id in known:
+            continue
+        known.add(account.user_id)
+        merged.append(account)
+    return merged, len(added) - len(merged)
+
+def load_accounts(
+    accounts: List[Account],
+    max_transactions: int = 1000,
+    max_workers: int = MAX_PARALLEL_ACCOUNTS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    poll_interval: float = 0.2
+) -> Dict[int, str]:
+    # Every account streams on its own worker; on_progress(loaded, spent) runs
+    # on the calling thread because Streamlit elements cannot be updated from
+    # worker threads. Returns the error per user id for accounts that failed
+    # to load; those keep whatever history they had (None if they had none)
+    # rather than being shown as empty.
+    lock = threading.Lock()
+    progress: Dict[int, Tuple[int, int]] = {}
+    errors: Dict[int, str] = {}
+
+    def load(index: int):
+        account = accounts[index]
+
+        def track(store, aggregates):
+            with lock:
+                progress[index] = (aggregates.count, aggregates.total)
+
+        try:
+            result = stream_transactions(account.api, max_transactions, on_page=track)
+        except Exception as e:
+            print(f"Error loading transactions for {account.label}: {e}")
+            with lock:
+                errors[account.user_id] = str(e)
+            return
+        if result is None:
+            account.reset()
+        else:
+            account.store, account.aggregates = result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(accounts)))) as pool:
+        pending = {pool.submit(load, index) for index in range(len(accounts))}
+        while pending:
+            _, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            if on_progress is not None:
+                with lock:
+                    loaded = sum(count for count, _ in progress.values())
+                    spent = sum(total for _, total in progress.values())
+                on_progress(loaded, spent)
+    return errors
+
+def account_boundaries(accounts: List[Account]) -> Dict[int, Dict[str, Boundary]]:
+    return {account.user_id: sync_boundaries(account.store, account.api.transaction_types) for account in accounts}
+
+def fetch_new_for_accounts(
+    accounts: List[Account],
+    boundaries: Dict[int, Dict[str, Boundary]],
+    max_transactions: int = 1000,
+    max_workers: int = MAX_PARALLEL_ACCOUNTS
+) -> Dict[int, List[Dict]]:
+    def fetch(account: Account) -> List[Dict]:
+        return fetch_new_records_by_type(account.api, boundaries[account.user_id], max_transactions)
+
+    results = _run_parallel(fetch, accounts, max_workers)
+    return {account.user_id: records for account, records in zip(accounts, results)}
+
+def apply_account_records(accounts: List[Account], new_records: Dict[int, List[Dict]]) -> List[Account]:
+    changed = []
+    for account in accounts:
+        records = new_records.get(account.user_id)
+        if records and apply_new_records(account.store, account.aggregates, records):
+            changed.append(account)
+    return changed
+
+def combine_accounts(accounts: List[Account]) -> Tuple[TransactionStore, RunningAggregates]:
+    # A single account is its own combined view. Otherwise the stores are
+    # merged column-wise and folded into one aggregates pass.
+    if len(accounts) == 1:
+        return accounts[0].store, accounts[0].aggregates
+    store = TransactionStore.merge([account.store for account in accounts])
+    aggregates = RunningAggregates(store)
+    aggregates.update()
+    return store, aggregates
+
+def extend_combined(
+    accounts: List[Account],
+    store: TransactionStore,
+    aggregates: RunningAggregates,
+    new_records: Dict[int, List[Dict]]
+) -> Tuple[TransactionStore, RunningAggregates]:
+    # Brings the combined view up to date after apply_account_records by
+    # appending only the new rows, so a refresh stays O(new rows). A single
+    # account's store is its own combined view and is already extended.
+    if len(accounts) == 1:
+        return accounts[0].store, accounts[0].aggregates
+    records = [record for account in accounts for record in new_records.get(account.user_id) or []]
+    apply_new_records(store, aggregates, records)
+    return store, aggregates
+
+def account_summary(accounts: List[Account]) -> pd.DataFrame:
+    totals = np.array([account.aggregates.total for account in accounts], dtype=np.float64)
+    grand_total = totals.sum()
+    last_purchase = [
+        None if account.aggregates.last_timestamp is None else pd.Timestamp(account.aggregates.last_timestamp)
+        for account in accounts
+    ]
+    return pd.DataFrame({
+        'account': [account.label for account in accounts],
+        'user_id': [account.user_id for account in accounts],
+        'transactions': [account.aggregates.count for account in accounts],
+        'total_spent': totals.astype(np.int64),
+        'share': np.divide(totals * 100, grand_total, out=np.zeros(len(accounts)), where=grand_total > 0),
+        'last_purchase': last_purchase,
+    })
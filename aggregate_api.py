@@ -0,0 +1,383 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from aggregates import RunningAggregates
+from budgets import budgets_path, evaluate_budgets, estimate_daily_rate, load_budgets
+from forecasting import forecast_spending
+from history_files import history_path, load_user_history, save_user_history
+from transaction_store import store_path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Read-only JSON view of the aggregates the dashboard computes, served from
+# the histories the app persists to TRANSACTION_DATA_DIR:
+#   GET /v1/users/<id>/categories
+#   GET /v1/users/<id>/monthly
+#   GET /v1/users/<id>/top-items?limit=10
+#   GET /v1/users/<id>/budgets?as_of=YYYY-MM-DD
+#   GET /v1/users/<id>/forecast?months=6
+
+MAX_AGE_SECONDS = int(os.environ.get('AGGREGATE_API_MAX_AGE', 60))
+MAX_CACHED_USERS = 32
+MIN_COMPRESS_BYTES = 256
+DEFAULT_TOP_ITEMS = 10
+MAX_TOP_ITEMS = 100
+DEFAULT_FORECAST_MONTHS = 6
+MAX_FORECAST_MONTHS = 24
+
+def dumps(payload: Dict) -> bytes:
+    return orjson.dumps(payload) if orjson is not None else json.dumps(payload).encode('utf-8')
+
+def source_version(data_dir: str, user_id: str) -> Optional[Tuple]:
+    # Size and mtime of the files a user's responses are computed from; None
+    # when there is no saved history.
+    version = []
+    for path in (history_path(data_dir, user_id), store_path(data_dir, user_id), budgets_path(data_dir, user_id)):
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            continue
+    if not version or version[0][0] == budgets_path(data_dir, user_id):
+        return None
+    return tuple(version)
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class UserSnapshot:
+    # One user's history folded into running aggregates, plus the encoded
+    # responses already served from it. Replaced whenever the files change.
+    def __init__(self, data_dir: str, user_id: str, version: Tuple):
+        self.user_id = user_id
+        self.version = version
+        store = load_user_history(data_dir, user_id)
+        if store is None or len(store) == 0:
+            raise ApiError(404, f"No saved history for user {user_id}")
+        self.aggregates = RunningAggregates(store)
+        self.aggregates.update()
+        self.budgets, self.threshold = load_budgets(data_dir, user_id)
+        self.responses: Dict[Tuple, Tuple[bytes, str]] = {}
+        self.lock = threading.Lock()
+
+    def categories(self) -> Dict:
+        totals = self.aggregates.totals('category')
+        total = self.aggregates.total
+        return {
+            'user_id': int(self.user_id),
+            'total': total,
+            'count': self.aggregates.count,
+            'categories': [
+                {'category': category, 'amount': int(amount), 'count': int(count),
+                 'share': float(amount / total * 100) if total else 0.0}
+                for category, amount, count in zip(totals['category'], totals['amount'], totals['count'])
+            ],
+        }
+
+    def monthly(self) -> Dict:
+        monthly = self.aggregates.monthly_series()
+        return {
+            'user_id': int(self.user_id),
+            'months': [{'month': month, 'amount': int(amount)} for month, amount in zip(monthly['month'], monthly['amount'])],
+        }
+
+    def top_items(self, limit: int) -> Dict:
+        top = self.aggregates.top('item', limit)
+        return {
+            'user_id': int(self.user_id),
+            'items': [
+                {'item': item, 'amount': int(amount), 'count': int(count)}
+                for item, amount, count in zip(top['item'], top['amount'], top['count'])
+            ],
+        }
+
+    def budget_status(self, as_of: date) -> Dict:
+        results = []
+        if self.budgets:
+            daily = self.aggregates.daily_frame()
+            forecast = forecast_spending(self.aggregates.monthly_series(), months_to_forecast=1, observed_through=as_of)
+            frame = evaluate_budgets(
+                daily, self.budgets, as_of, estimate_daily_rate(daily, as_of, forecast), self.threshold
+            )
+            for row in frame.to_dict(orient='records'):
+                breach = row['projected_breach']
+                row['projected_breach'] = None if pd.isna(breach) else breach.date().isoformat()
+                row['limit'], row['spent'], row['remaining'] = float(row['limit']), float(row['spent']), float(row['remaining'])
+                row['percentage'] = float(row['percentage'])
+                results.append(row)
+        return {'user_id': int(self.user_id), 'as_of': as_of.isoformat(), 'threshold': self.threshold, 'budgets': results}
+
+    def forecast(self, months: int, observed_through: date) -> Dict:
+        monthly = self.aggregates.monthly_series()
+        result = forecast_spending(monthly, months_to_forecast=months, observed_through=observed_through)
+        if result is None:
+            return {'user_id': int(self.user_id), 'forecast': None}
+        last_month = pd.Period(monthly['month'].iloc[-1], freq='M')
+        return {
+            'user_id': int(self.user_id),
+            'forecast': {
+                'model': result['model'],
+                'trend': result['trend'],
+                'confidence': result['confidence'],
+                'variability': float(result['variability']),
+                'slope': float(result['slope']),
+                'next_month_change': float(result['next_month_change']),
+                'months': [
+                    {'month': str(last_month + offset + 1), 'amount': float(amount), 'lower': float(lower), 'upper': float(upper)}
+                    for offset, (amount, lower, upper) in enumerate(zip(result['future_spending'], result['lower'], result['upper']))
+                ],
+            },
+        }
+
+# Snapshots for the most recently requested users; a request whose files
+# changed since its snapshot was built rebuilds it.
+class AggregateService:
+    def __init__(self, data_dir: str, max_users: int = MAX_CACHED_USERS):
+        self.data_dir = data_dir
+        self.max_users = max_users
+        self._snapshots: 'OrderedDict[str, UserSnapshot]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def snapshot(self, user_id: str) -> UserSnapshot:
+        version = source_version(self.data_dir, user_id)
+        if version is None:
+            raise ApiError(404, f"No saved history for user {user_id}")
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is not None and snapshot.version == version:
+                self._snapshots.move_to_end(user_id)
+                return snapshot
+        snapshot = UserSnapshot(self.data_dir, user_id, version)
+        with self._lock:
+            self._snapshots[user_id] = snapshot
+            self._snapshots.move_to_end(user_id)
+            while len(self._snapshots) > self.max_users:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def respond(self, user_id: str, resource: str, query: Dict[str, List[str]]) -> Tuple[bytes, str]:
+        # Encoded body and its ETag, built once per snapshot and parameters.
+        snapshot = self.snapshot(user_id)
+        if resource == 'categories':
+            key, build = (resource,), snapshot.categories
+        elif resource == 'monthly':
+            key, build = (resource,), snapshot.monthly
+        elif resource == 'top-items':
+            limit = min(_int_param(query, 'limit', DEFAULT_TOP_ITEMS), MAX_TOP_ITEMS)
+            key, build = (resource, limit), lambda: snapshot.top_items(limit)
+        elif resource == 'budgets':
+            as_of = _date_param(query, 'as_of')
+            key, build = (resource, as_of), lambda: snapshot.budget_status(as_of)
+        elif resource == 'forecast':
+            months = min(_int_param(query, 'months', DEFAULT_FORECAST_MONTHS), MAX_FORECAST_MONTHS)
+            # The forecast damps the current partial month, so it changes with
+            # the date even when the history does not.
+            today = datetime.now().date()
+            key, build = (resource, months, today), lambda: snapshot.forecast(months, today)
+        else:
+            raise ApiError(404, f"Unknown resource: {resource}")
+
+        with snapshot.lock:
+            cached = snapshot.responses.get(key)
+        if cached is not None:
+            return cached
+        body = dumps(build())
+        response = (body, f'"{hashlib.sha1(body).hexdigest()[:16]}"')
+        with snapshot.lock:
+            snapshot.responses[key] = response
+        return response
+
+def _int_param(query: Dict[str, List[str]], name: str, default: int) -> int:
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise ApiError(400, f"Invalid {name}")
+    if value < 1:
+        raise ApiError(400, f"Invalid {name}")
+    return value
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    # gzip (or x-gzip, or *) listed with a non-zero q-value; an explicit
+    # "gzip;q=0" refuses it even when a wildcard would allow it.
+    weights = {}
+    for entry in accept_encoding.split(','):
+        coding, _, params = entry.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+def _date_param(query: Dict[str, List[str]], name: str) -> date:
+    if name not in query:
+        return datetime.now().date()
+    try:
+        return date.fromisoformat(query[name][0])
+    except ValueError:
+        raise ApiError(400, f"Invalid {name}, expected YYYY-MM-DD")
+
+class AggregateApiHandler(BaseHTTPRequestHandler):
+    server_version = 'SpendSenseAPI/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status: int, body: bytes, headers: Dict[str, str]):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status: int, message: str):
+        self.send_body(status, dumps({'error': message}), {
+            'Content-Type': 'application/json', 'Cache-Control': 'no-store'
+        })
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        parts = [part for part in parsed.path.split('/') if part]
+        if len(parts) != 4 or parts[:2] != ['v1', 'users'] or not parts[2].isdigit():
+            self.send_error_json(404, 'Not found')
+            return
+
+        try:
+            body, etag = self.server.service.respond(parts[2], parts[3], parse_qs(parsed.query))
+        except ApiError as e:
+            self.send_error_json(e.status, str(e))
+            return
+        except Exception as e:
+            print(f"Error serving {parsed.path}: {e}")
+            self.send_error_json(500, 'Internal error')
+            return
+
+        headers = {
+            'Content-Type': 'application/json',
+            'Cache-Control': f'private, max-age={self.server.max_age}',
+            'ETag': etag,
+            'Vary': 'Accept-Encoding',
+        }
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_body(304, b'', headers)
+            return
+        if len(body) >= MIN_COMPRESS_BYTES and accepts_gzip(self.headers.get('Accept-Encoding', '')):
+            body = self.server.compressed(etag, body)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_body(200, body, headers)
+
+class AggregateApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: AggregateService, max_age: int = MAX_AGE_SECONDS, verbose: bool = False):
+        super().__init__(address, AggregateApiHandler)
+        self.service = service
+        self.max_age = max_age
+        self.verbose = verbose
+        self._compressed: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._compressed_lock = threading.Lock()
+
+    def compressed(self, etag: str, body: bytes) -> bytes:
+        # gzip output keyed by ETag, so repeated requests are not recompressed.
+        with self._compressed_lock:
+            if etag in self._compressed:
+                self._compressed.move_to_end(etag)
+                return self._compressed[etag]
+        data = gzip.compress(body, compresslevel=6, mtime=0)
+        with self._compressed_lock:
+            self._compressed[etag] = data
+            while len(self._compressed) > MAX_CACHED_USERS * 8:
+                self._compressed.popitem(last=False)
+        return data
+
+def create_api_server(data_dir: str, host: str = '127.0.0.1', port: int = 0,
+                      max_age: int = MAX_AGE_SECONDS, verbose: bool = False) -> AggregateApiServer:
+    return AggregateApiServer((host, port), AggregateService(data_dir), max_age, verbose)
+
+def start_api_server(data_dir: str, host: str = '127.0.0.1', port: int = 0,
+                     max_age: int = MAX_AGE_SECONDS) -> Tuple[AggregateApiServer, str]:
+    server = create_api_server(data_dir, host, port, max_age)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f'http://{bound_host}:{bound_port}'
+
+def seed_from_mock(data_dir: str, transactions: int) -> Optional[int]:
+    # Fetches a history from an in-process mock Roblox server and saves it, so
+    # the API can be tried without a real account.
+    from mock_roblox_server import MockConfig, start_mock_server
+    from pipeline import stream_transactions
+    from roblox_api import DEFAULT_BASE_URLS, RobloxAPI
+
+    mock, url = start_mock_server(MockConfig(total_transactions=transactions))
+    try:
+        api = RobloxAPI('mock-cookie', base_urls={service: url for service in DEFAULT_BASE_URLS})
+        if api.get_user_info() is None:
+            return None
+        result = stream_transactions(api, transactions)
+        if result is None:
+            return None
+        os.makedirs(data_dir, exist_ok=True)
+        save_user_history(data_dir, api.user_id, result[0])
+        return api.user_id
+    finally:
+        mock.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description='Read-only JSON API over saved spending histories.')
+    parser.add_argument('--data-dir', default=os.environ.get('TRANSACTION_DATA_DIR', 'data'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--max-age', type=int, default=MAX_AGE_SECONDS, help='Cache-Control max-age in seconds')
+    parser.add_argument('--mock', type=int, default=0, metavar='TRANSACTIONS',
+                        help='First save a history of this size fetched from the local mock server')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.mock:
+        user_id = seed_from_mock(args.data_dir, args.mock)
+        if user_id is None:
+            print("Error seeding history from the mock server")
+            return
+        print(f"Saved {args.mock} mock transactions for user {user_id} to {args.data_dir}")
+
+    server = create_api_server(args.data_dir, args.host, args.port, args.max_age, verbose=args.verbose)
+    print(f"Aggregate API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
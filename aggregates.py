@@ -0,0 +1,307 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from anomalies import SpikeDetector
+from search_index import SearchIndex
+from transaction_store import TransactionStore, STRING_COLUMNS, OUTGOING
+
+NS_PER_DAY = 86400 * 10**9
+BREAKDOWN_COLUMNS = ('category', 'type', 'item')
+
+# Rough cost of one dict entry with an int key and value, and with a tuple of
+# three ints as key (daily, combinations), for memory accounting.
+DICT_ENTRY_BYTES = 100
+TUPLE_ENTRY_BYTES = 220
+
+def _grow(values: np.ndarray, size: int) -> np.ndarray:
+    if len(values) >= size:
+        return values
+    return np.concatenate([values, np.zeros(size - len(values), dtype=values.dtype)])
+
+# Spending totals folded page by page from a TransactionStore. update() only
+# looks at rows appended since the previous call, so each page costs
+# O(page size); income rows are skipped (see net_flow_series for those).
+class RunningAggregates:
+    def __init__(self, store: TransactionStore):
+        self.store = store
+        self.rows = 0
+        self.count = 0
+        self.total = 0
+        self.first_timestamp: Optional[int] = None
+        self.last_timestamp: Optional[int] = None
+        self.sums = {column: np.zeros(0, dtype=np.int64) for column in STRING_COLUMNS}
+        self.counts = {column: np.zeros(0, dtype=np.int64) for column in STRING_COLUMNS}
+        self.monthly: Dict[int, int] = {}
+        self.daily: Dict[Tuple[int, int, int], int] = {}
+        self.daily_totals: Dict[int, int] = {}
+        self.daily_counts: Dict[int, int] = {}
+        self.combinations: Dict[Tuple[int, int, int], Tuple[int, int]] = {}
+        self.spikes = SpikeDetector()
+        self.search_index = SearchIndex(store)
+        self._sorted: Dict[str, np.ndarray] = {}
+        self._breakdown: Optional[pd.DataFrame] = None
+        self._windows: Optional['RollingWindows'] = None
+
+    def update(self):
+        store = self.store
+        start, end = self.rows, len(store)
+        if end <= start:
+            return
+
+        spending = store.directions[start:end] == OUTGOING
+        self.rows = end
+        self.search_index.update()
+        if not spending.any():
+            return
+
+        amounts = store.amounts[start:end][spending].astype(np.int64)
+        for column in STRING_COLUMNS:
+            size = len(store.dictionaries[column])
+            codes = store.codes[column][start:end][spending]
+            self.sums[column] = _grow(self.sums[column], size) + np.bincount(codes, weights=amounts, minlength=size).astype(np.int64)
+            self.counts[column] = _grow(self.counts[column], size) + np.bincount(codes, minlength=size)
+
+        timestamps = store.timestamps[start:end][spending]
+        months = timestamps.view('datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+        month_keys, month_index = np.unique(months, return_inverse=True)
+        month_sums = np.bincount(month_index, weights=amounts)
+        for month, amount in zip(month_keys.tolist(), month_sums.tolist()):
+            self.monthly[month] = self.monthly.get(month, 0) + int(amount)
+
+        days = timestamps // NS_PER_DAY
+        keys = np.stack([days, store.codes['category'][start:end][spending], store.codes['item'][start:end][spending]], axis=1)
+        daily_keys, daily_index = np.unique(keys, axis=0, return_inverse=True)
+        daily_sums = np.bincount(daily_index.ravel(), weights=amounts)
+        for (day, category, item), amount in zip(daily_keys.tolist(), daily_sums.tolist()):
+            self.daily[(day, category, item)] = self.daily.get((day, category, item), 0) + int(amount)
+            self.daily_totals[day] = self.daily_totals.get(day, 0) + int(amount)
+        day_keys, day_counts = np.unique(days, return_counts=True)
+        for day, count in zip(day_keys.tolist(), day_counts.tolist()):
+            self.daily_counts[day] = self.daily_counts.get(day, 0) + count
+        self.spikes.observe(self.daily_totals, self.daily_counts, day_keys.tolist())
+
+        combination_codes = [store.codes[column][start:end][spending] for column in BREAKDOWN_COLUMNS]
+        combination_keys, combination_index = np.unique(np.stack(combination_codes, axis=1), axis=0, return_inverse=True)
+        combination_index = combination_index.ravel()
+        combination_sums = np.bincount(combination_index, weights=amounts)
+        combination_counts = np.bincount(combination_index)
+        for key, amount, count in zip(combination_keys.tolist(), combination_sums.tolist(), combination_counts.tolist()):
+            previous_amount, previous_count = self.combinations.get(tuple(key), (0, 0))
+            self.combinations[tuple(key)] = (previous_amount + int(amount), previous_count + count)
+
+        first, last = int(timestamps.min()), int(timestamps.max())
+        self.first_timestamp = first if self.first_timestamp is None else min(self.first_timestamp, first)
+        self.last_timestamp = last if self.last_timestamp is None else max(self.last_timestamp, last)
+        self.count += len(amounts)
+        self.total += int(amounts.sum())
+        self._sorted.clear()
+        self._breakdown = None
+        self._windows = None
+
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(a.nbytes for a in self.sums.values()) + sum(a.nbytes for a in self.counts.values())
+        entries = len(self.monthly) + len(self.daily_totals) + len(self.daily_counts)
+        tuple_entries = len(self.daily) + len(self.combinations)
+        return arrays + entries * DICT_ENTRY_BYTES + tuple_entries * TUPLE_ENTRY_BYTES + self.search_index.nbytes
+
+    def _frame(self, column: str, codes: np.ndarray) -> pd.DataFrame:
+        values = self.store.dictionaries[column].values
+        return pd.DataFrame({
+            column: np.array([values[code] for code in codes.tolist()], dtype=object),
+            'amount': self.sums[column][codes],
+            'count': self.counts[column][codes],
+        })
+
+    def _ranked(self, column: str, codes: np.ndarray) -> np.ndarray:
+        # Highest amount first; ties keep dictionary (first seen) order.
+        return codes[np.lexsort((codes, -self.sums[column][codes]))]
+
+    def distinct(self, column: str) -> int:
+        return int(np.count_nonzero(self.counts[column]))
+
+    def sorted_codes(self, column: str) -> np.ndarray:
+        # Full ranking, computed once per update() and shared by totals() and
+        # every totals_page() call.
+        if column not in self._sorted:
+            self._sorted[column] = self._ranked(column, np.flatnonzero(self.counts[column]))
+        return self._sorted[column]
+
+    def totals(self, column: str) -> pd.DataFrame:
+        return self._frame(column, self.sorted_codes(column))
+
+    def totals_page(self, column: str, page: int, page_size: int) -> pd.DataFrame:
+        return self._frame(column, self.sorted_codes(column)[page * page_size:(page + 1) * page_size])
+
+    def top(self, column: str, n: int) -> pd.DataFrame:
+        if column in self._sorted:
+            return self._frame(column, self._sorted[column][:n])
+        # Partial selection: keep codes at or above the n-th largest amount
+        # (ties included) and only rank those.
+        codes = np.flatnonzero(self.counts[column])
+        if 0 < n < len(codes):
+            sums = self.sums[column][codes]
+            nth_largest = np.partition(sums, len(sums) - n)[len(sums) - n]
+            codes = codes[sums >= nth_largest]
+        return self._frame(column, self._ranked(column, codes)[:n])
+
+    def breakdown(self) -> pd.DataFrame:
+        # (category, type, item, amount, count); one row per combination seen,
+        # so its size is independent of the number of transactions.
+        if self._breakdown is None:
+            columns = {column: self.store.dictionaries[column].values for column in BREAKDOWN_COLUMNS}
+            keys = list(self.combinations)
+            frame = pd.DataFrame({
+                column: [values[key[position]] for key in keys]
+                for position, (column, values) in enumerate(columns.items())
+            })
+            frame['amount'] = np.array([self.combinations[key][0] for key in keys], dtype=np.int64)
+            frame['count'] = np.array([self.combinations[key][1] for key in keys], dtype=np.int64)
+            self._breakdown = frame
+        return self._breakdown
+
+    def monthly_series(self) -> pd.DataFrame:
+        months = sorted(self.monthly)
+        return pd.DataFrame({
+            'month': np.array(months, dtype='datetime64[M]').astype(str),
+            'amount': [self.monthly[m] for m in months],
+        })
+
+    def daily_series(self) -> pd.DataFrame:
+        days = sorted(self.daily_totals)
+        return pd.DataFrame({
+            'date': np.array(days, dtype='datetime64[D]'),
+            'amount': [self.daily_totals[d] for d in days],
+            'count': [self.daily_counts[d] for d in days],
+        })
+
+    def rolling_windows(self, as_of: date) -> 'RollingWindows':
+        # Built once per update() and day, so preset totals are lookups on
+        # every rerun.
+        if self._windows is None or self._windows.as_of_day != np.datetime64(as_of, 'D').astype(np.int64):
+            self._windows = RollingWindows(self.daily_series(), as_of)
+        return self._windows
+
+    def daily_frame(self) -> pd.DataFrame:
+        categories = self.store.dictionaries['category'].values
+        items = self.store.dictionaries['item'].values
+        return pd.DataFrame(
+            [(day, categories[category], items[item], amount) for (day, category, item), amount in self.daily.items()],
+            columns=['day', 'category', 'item', 'amount']
+        )
+
+def aggregate_daily(df: pd.DataFrame) -> pd.DataFrame:
+    # Groups on the frame's precomputed day column; only the grouped days are
+    # converted to epoch day numbers.
+    grouped = df.groupby(['day', 'category', 'item'], observed=True, sort=False)['amount'].sum().reset_index()
+    grouped['day'] = grouped['day'].values.astype('datetime64[D]').astype(np.int64)
+    return grouped
+
+# Same read interface as RunningAggregates, computed from an already filtered
+# frame for views that do not cover the whole history.
+class FrameAggregates:
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.count = len(df)
+        self.total = int(df['amount'].sum())
+        self._grouped: Dict[str, pd.DataFrame] = {}
+        self._sorted: Dict[str, pd.DataFrame] = {}
+
+    def _group(self, column: str) -> pd.DataFrame:
+        if column not in self._grouped:
+            grouped = self.df.groupby(column, observed=True)['amount'].agg(['sum', 'count'])
+            grouped = grouped.rename(columns={'sum': 'amount'}).rename_axis(column).reset_index()
+            grouped[column] = grouped[column].astype(object)
+            grouped['amount'] = grouped['amount'].astype(np.int64)
+            self._grouped[column] = grouped
+        return self._grouped[column]
+
+    def distinct(self, column: str) -> int:
+        return len(self._group(column))
+
+    def totals(self, column: str) -> pd.DataFrame:
+        if column not in self._sorted:
+            grouped = self._group(column)
+            self._sorted[column] = grouped.sort_values('amount', ascending=False, kind='stable').reset_index(drop=True)
+        return self._sorted[column]
+
+    def totals_page(self, column: str, page: int, page_size: int) -> pd.DataFrame:
+        return self.totals(column).iloc[page * page_size:(page + 1) * page_size].reset_index(drop=True)
+
+    def top(self, column: str, n: int) -> pd.DataFrame:
+        if column in self._sorted:
+            return self._sorted[column].head(n)
+        return self._group(column).nlargest(n, 'amount').reset_index(drop=True)
+
+    def breakdown(self) -> pd.DataFrame:
+        if 'breakdown' not in self._grouped:
+            grouped = self.df.groupby(list(BREAKDOWN_COLUMNS), observed=True)['amount'].agg(['sum', 'count'])
+            grouped = grouped.rename(columns={'sum': 'amount'}).reset_index()
+            for column in BREAKDOWN_COLUMNS:
+                grouped[column] = grouped[column].astype(object)
+            grouped['amount'] = grouped['amount'].astype(np.int64)
+            self._grouped['breakdown'] = grouped
+        return self._grouped['breakdown']
+
+    def monthly_series(self) -> pd.DataFrame:
+        grouped = self.df.groupby('month')['amount'].sum()
+        return pd.DataFrame({'month': grouped.index.astype(str), 'amount': grouped.values.astype(np.int64)})
+
+    def daily_series(self) -> pd.DataFrame:
+        grouped = self.df.groupby('day')['amount'].agg(['sum', 'count']).rename(columns={'sum': 'amount'})
+        return grouped.astype(np.int64).rename_axis('date').reset_index()
+
+    def daily_frame(self) -> pd.DataFrame:
+        return aggregate_daily(self.df)
+
+# Spend and purchase counts over trailing windows from one pass over a daily
+# series: the series is laid out densely and cumulatively summed, so any
+# window total is the difference of two entries.
+class RollingWindows:
+    def __init__(self, daily: pd.DataFrame, as_of: date):
+        days = daily['date'].values.astype('datetime64[D]').astype(np.int64)
+        as_of_day = int(np.datetime64(as_of, 'D').astype(np.int64))
+        self.first_day = int(days.min()) if len(days) else as_of_day
+        self.last_day = max(int(days.max()), as_of_day) if len(days) else as_of_day
+        self.as_of_day = as_of_day
+        offsets = days - self.first_day
+        size = self.last_day - self.first_day + 1
+        self.amounts = np.concatenate([[0], np.cumsum(np.bincount(offsets, weights=daily['amount'].values, minlength=size))])
+        self.counts = np.concatenate([[0], np.cumsum(np.bincount(offsets, weights=daily['count'].values, minlength=size))])
+
+    def _start_index(self, days: Optional[int]) -> int:
+        if days is None:
+            return 0
+        return int(np.clip(self.as_of_day - days - self.first_day, 0, len(self.amounts) - 1))
+
+    def window(self, days: Optional[int] = None) -> Tuple[int, int]:
+        # (spend, purchases) from `days` days before as_of through the last
+        # day of the series, the range the date presets select; None is all time.
+        start = self._start_index(days)
+        return int(self.amounts[-1] - self.amounts[start]), int(self.counts[-1] - self.counts[start])
+
+    def rolling_mean(self, days: int, span: Optional[int] = None) -> pd.DataFrame:
+        # Trailing `days`-day average daily spend for every day of the series
+        # (or its last `span` days). The first days of the series average over
+        # the days observed so far rather than reading as a ramp up from zero.
+        ends = np.arange(1, len(self.amounts))
+        starts = np.maximum(ends - days, 0)
+        means = (self.amounts[ends] - self.amounts[starts]) / (ends - starts)
+        dates = np.arange(self.first_day, self.last_day + 1).astype('datetime64[D]')
+        if span is not None:
+            dates, means = dates[-span:], means[-span:]
+        return pd.DataFrame({'date': dates, 'amount': means})
+
+def net_flow_series(flows: pd.DataFrame) -> pd.DataFrame:
+    # Monthly income, spending and net from a frame that still has income rows
+    # (TransactionStore.to_dataframe() without spending_only).
+    signed = flows['amount'].astype(np.int64) * flows['direction'].astype(np.int64)
+    grouped = pd.DataFrame({
+        'income': signed.clip(lower=0),
+        'spending': (-signed).clip(lower=0),
+        'net': signed,
+    }).groupby(flows['month'].values).sum()
+    grouped.index = grouped.index.astype(str)
+    return grouped.rename_axis('month').reset_index()
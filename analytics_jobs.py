@@ -0,0 +1,158 @@
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from transaction_store import TIME_COLUMNS
+
+MAX_ANALYTICS_WORKERS = int(os.environ.get('ANALYTICS_WORKERS', min(4, os.cpu_count() or 1)))
+RESULT_CACHE_SIZE = 64
+
+# Jobs one session may have in the pool at once, superseded ones included.
+MAX_SESSION_JOBS = 2
+
+# Jobs smaller than this run inline; pickling them to a worker would cost more
+# than the work itself.
+OFFLOAD_MIN_ROWS = int(os.environ.get('ANALYTICS_OFFLOAD_MIN_ROWS', 5000))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_results: 'OrderedDict[Tuple[str, Hashable], Any]' = OrderedDict()
+_results_lock = threading.Lock()
+
+def analytics_pool() -> ProcessPoolExecutor:
+    # One pool per server process, shared by every session. Workers are
+    # spawned rather than forked because the Streamlit server is threaded.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, MAX_ANALYTICS_WORKERS), mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def cached_result(name: str, key: Hashable) -> Tuple[bool, Any]:
+    with _results_lock:
+        if (name, key) not in _results:
+            return False, None
+        _results.move_to_end((name, key))
+        return True, _results[(name, key)]
+
+def store_result(name: str, key: Hashable, result: Any):
+    with _results_lock:
+        _results[(name, key)] = result
+        _results.move_to_end((name, key))
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+
+# Per-session view of the shared pool: one job per slot. Waiting polls and
+# calls on_wait between polls, so the caller can be interrupted (a Streamlit
+# rerun raises from the next st call); the job stays registered, and the next
+# run either picks it up again or, with a different key, supersedes it. A
+# superseded job that has not started is cancelled; one already running in a
+# worker cannot be stopped, so it is left to finish and still counts against
+# MAX_SESSION_JOBS. Past that limit the session's jobs run inline, and rapid
+# reruns cannot pile work onto the shared pool.
+class AnalyticsJobs:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Tuple[Hashable, Future]] = {}
+        self._superseded: List[Future] = []
+
+    def run(self, slot: str, key: Hashable, func: Callable, *args, size: int = 0,
+            on_wait: Optional[Callable[[], None]] = None, poll_interval: float = 0.2) -> Any:
+        name = f'{func.__module__}.{func.__qualname__}'
+        found, result = cached_result(name, key)
+        if found:
+            return result
+
+        if size < OFFLOAD_MIN_ROWS:
+            result = func(*args)
+        else:
+            result = self._run_in_pool(slot, key, func, args, on_wait, poll_interval)
+        store_result(name, key, result)
+        return result
+
+    def _submit(self, slot: str, key: Hashable, func: Callable, args: Tuple) -> Optional[Future]:
+        # None when the session already has MAX_SESSION_JOBS in the pool.
+        with self._lock:
+            current = self._jobs.get(slot)
+            if current is not None and current[0] == key:
+                return current[1]
+            if current is not None:
+                del self._jobs[slot]
+                if not current[1].cancel():
+                    self._superseded.append(current[1])
+            self._superseded = [future for future in self._superseded if not future.done()]
+            in_flight = len(self._superseded) + sum(not future.done() for _, future in self._jobs.values())
+            if in_flight >= MAX_SESSION_JOBS:
+                return None
+            future = analytics_pool().submit(func, *args)
+            self._jobs[slot] = (key, future)
+            return future
+
+    def _run_in_pool(self, slot: str, key: Hashable, func: Callable, args: Tuple,
+                     on_wait: Optional[Callable[[], None]], poll_interval: float) -> Any:
+        try:
+            future = self._submit(slot, key, func, args)
+            if future is None:
+                return func(*args)
+            while True:
+                try:
+                    result = future.result(timeout=poll_interval)
+                    break
+                except TimeoutError:
+                    if on_wait is not None:
+                        on_wait()
+        except (BrokenProcessPool, CancelledError) as e:
+            print(f"Error running analytics job {slot}: {e}")
+            if isinstance(e, BrokenProcessPool):
+                _reset_pool()
+            result = func(*args)
+        with self._lock:
+            if self._jobs.get(slot, (None,))[0] == key:
+                del self._jobs[slot]
+        return result
+
+    def cancel_all(self):
+        with self._lock:
+            for _, future in self._jobs.values():
+                future.cancel()
+            for future in self._superseded:
+                future.cancel()
+            self._jobs.clear()
+            self._superseded.clear()
+
+def format_days(df: pd.DataFrame, date_format: str = '%B %d, %Y') -> np.ndarray:
+    # Each distinct day is formatted once and spread over its rows.
+    codes, days = pd.factorize(df['day'])
+    return days.strftime(date_format).to_numpy()[codes]
+
+def transactions_csv(df: pd.DataFrame) -> str:
+    export = pd.DataFrame({
+        'DATE': format_days(df),
+        'ITEM': df['item'],
+        'CATEGORY': df['category'],
+        'SOURCE': df['type'],
+        'AMOUNT': '-' + df['amount'].astype('int64').astype(str) + ' R$',
+    })
+    return export.to_csv(index=False)
+
+def transactions_json(df: pd.DataFrame) -> str:
+    export = df.drop(columns=list(TIME_COLUMNS))
+    export['date'] = format_days(df)
+    return json.dumps(export.to_dict(orient='records'), indent=2)
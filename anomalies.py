@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Iterable, Tuple
+
+# A day is scored against the BASELINE_DAYS days before it with a robust
+# z-score: (value - median) / (1.4826 * MAD). Most accounts spend on only some
+# days, which leaves the MAD at zero, so the scale never drops below the
+# window's mean or a small absolute floor.
+BASELINE_DAYS = 28
+BASELINE_MONTHS = 6
+THRESHOLD = 4.0
+MAD_SCALE = 1.4826
+MIN_AMOUNT_SCALE = 25
+MIN_COUNT_SCALE = 1
+
+# Days below both floors are never flagged, however unusual for the account.
+MIN_FLAG_AMOUNT = 100
+MIN_FLAG_COUNT = 5
+
+ANOMALY_COLUMNS = ['date', 'amount', 'count', 'typical_amount', 'typical_count', 'score', 'reason']
+
+def robust_scores(values: np.ndarray, baselines: np.ndarray, min_scale: float) -> Tuple[np.ndarray, np.ndarray]:
+    # values[i] scored against the row baselines[i]; returns (median, score).
+    median = np.median(baselines, axis=1)
+    mad = np.median(np.abs(baselines - median[:, None]), axis=1)
+    scale = np.maximum(np.maximum(MAD_SCALE * mad, baselines.mean(axis=1)), min_scale)
+    return median, (values - median) / scale
+
+def _reasons(amount_flags: np.ndarray, count_flags: np.ndarray) -> np.ndarray:
+    return np.select(
+        [amount_flags & count_flags, amount_flags],
+        ['Spend spike and purchase burst', 'Spend spike'],
+        'Purchase burst'
+    )
+
+# Flags unusual days as the daily totals grow. observe() gets the days a page
+# touched and rescores only those and the days whose baseline includes them,
+# in one vectorized pass, so a page costs O(days it spans + BASELINE_DAYS)
+# whatever the length of the history. Pages may arrive in any date order.
+class SpikeDetector:
+    def __init__(self, window: int = BASELINE_DAYS, threshold: float = THRESHOLD):
+        self.window = window
+        self.threshold = threshold
+        self.first_day = None
+        self.last_day = None
+        self.flags: Dict[int, Tuple[int, int, float, float, float, str]] = {}
+
+    def observe(self, totals: Dict[int, int], counts: Dict[int, int], touched: Iterable[int]):
+        touched = np.asarray(list(touched), dtype=np.int64)
+        if len(touched) == 0:
+            return
+        low, high = int(touched.min()), int(touched.max())
+        previous_first = low if self.first_day is None else self.first_day
+        self.first_day = min(previous_first, low)
+        self.last_day = high if self.last_day is None else max(self.last_day, high)
+
+        # Days before the first purchase are not a baseline, so scoring starts
+        # one full window into the history; older history arriving makes the
+        # days up to the previous start scoreable too.
+        start = max(low, self.first_day + self.window)
+        end = min(max(high, previous_first - 1) + self.window, self.last_day)
+        if start > end:
+            return
+        span = range(start - self.window, end + 1)
+        amounts = np.array([totals.get(day, 0) for day in span], dtype=np.float64)
+        purchases = np.array([counts.get(day, 0) for day in span], dtype=np.float64)
+
+        typical_amount, amount_scores = robust_scores(
+            amounts[self.window:], sliding_window_view(amounts[:-1], self.window), MIN_AMOUNT_SCALE
+        )
+        typical_count, count_scores = robust_scores(
+            purchases[self.window:], sliding_window_view(purchases[:-1], self.window), MIN_COUNT_SCALE
+        )
+        amount_flags = (amount_scores >= self.threshold) & (amounts[self.window:] >= MIN_FLAG_AMOUNT)
+        count_flags = (count_scores >= self.threshold) & (purchases[self.window:] >= MIN_FLAG_COUNT)
+        flagged = np.flatnonzero(amount_flags | count_flags)
+
+        self.flags = {day: flag for day, flag in self.flags.items() if not start <= day <= end}
+        reasons = _reasons(amount_flags[flagged], count_flags[flagged])
+        for index, reason in zip(flagged.tolist(), reasons.tolist()):
+            self.flags[start + index] = (
+                int(amounts[self.window + index]), int(purchases[self.window + index]),
+                float(typical_amount[index]), float(typical_count[index]),
+                float(max(amount_scores[index], count_scores[index])), reason
+            )
+
+    def frame(self) -> pd.DataFrame:
+        # Flagged days, newest first.
+        days = sorted(self.flags, reverse=True)
+        frame = pd.DataFrame([self.flags[day] for day in days], columns=ANOMALY_COLUMNS[1:])
+        frame.insert(0, 'date', np.array(days, dtype=np.int64).astype('datetime64[D]'))
+        return frame
+
+    def recent(self, as_of_day: int, days: int) -> pd.DataFrame:
+        frame = self.frame()
+        return frame[frame['date'].values.astype('datetime64[D]').astype(np.int64) > as_of_day - days]
+
+def monthly_anomalies(monthly: pd.DataFrame, window: int = BASELINE_MONTHS, threshold: float = THRESHOLD) -> pd.DataFrame:
+    # Months (from monthly_series()) far above the months before them; months
+    # without purchases count as zero.
+    if len(monthly) == 0:
+        return pd.DataFrame(columns=['month', 'amount', 'typical_amount', 'score'])
+    periods = pd.PeriodIndex(monthly['month'], freq='M')
+    months = pd.period_range(periods.min(), periods.max(), freq='M')
+    if len(months) <= window:
+        return pd.DataFrame(columns=['month', 'amount', 'typical_amount', 'score'])
+    amounts = pd.Series(monthly['amount'].values, index=periods).reindex(months, fill_value=0).values.astype(np.float64)
+    typical, scores = robust_scores(amounts[window:], sliding_window_view(amounts[:-1], window), MIN_AMOUNT_SCALE)
+    flagged = (scores >= threshold) & (amounts[window:] >= MIN_FLAG_AMOUNT)
+    return pd.DataFrame({
+        'month': months[window:][flagged].astype(str),
+        'amount': amounts[window:][flagged].astype(np.int64),
+        'typical_amount': typical[flagged],
+        'score': scores[flagged],
+    })
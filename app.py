@@ -4,8 +4,71 @@ import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 import numpy as np
-import json
-from roblox_api import RobloxAPI
+import os
+import html
+from analytics_jobs import AnalyticsJobs, format_days, transactions_csv, transactions_json
+from background_refresh import BackgroundRefresher
+from cache_policy import CachePolicy, PolicyCache, DATA_CLASSES
+from history_files import save_user_history, scan_history, user_history_file
+from search_index import search_mask
+from session_memory import DEFAULT_BUDGET_MB, SessionData, SessionMemory
+from accounts import (
+    connect_accounts, merge_accounts, load_accounts, account_boundaries, fetch_new_for_accounts,
+    apply_account_records, combine_accounts, extend_combined, account_summary
+)
+from aggregates import FrameAggregates, net_flow_series
+from anomalies import monthly_anomalies
+from budgets import Budget, evaluate_budgets, estimate_daily_rate, save_budgets, load_budgets
+from forecasting import forecast_spending
+from sql_backend import SqlAggregates, SqlStore
+
+DATA_DIR = os.environ.get('TRANSACTION_DATA_DIR')
+ANALYTICS_BACKEND = os.environ.get('ANALYTICS_BACKEND')
+ANALYTICS_DB_PATH = os.environ.get('ANALYTICS_DB_PATH', ':memory:')
+SESSION_MEMORY_BUDGET_MB = float(os.environ.get('SESSION_MEMORY_BUDGET_MB', DEFAULT_BUDGET_MB))
+
+BUDGET_KIND_LABELS = {'overall': 'Overall', 'monthly': 'Monthly', 'weekly': 'Weekly', 'rolling': 'Rolling'}
+BUDGET_TABLE_COLUMNS = ['Name', 'Type', 'Category', 'Game / Item', 'Limit', 'Window (days)']
+ITEM_PAGE_SIZE = 25
+RECENT_SPIKE_DAYS = 7
+# After a failed background refresh, expired caches wait this long before the
+# next automatic attempt (the Refresh button still retries immediately).
+REFRESH_RETRY_SECONDS = 60
+# Period comparisons only total amounts by category, so their history scans
+# read just these columns.
+PERIOD_COLUMNS = ['date', 'amount', 'category', 'direction']
+
+# Card-list templates are built once; render_card_list() fills one per row and
+# sends the whole list as a single markdown element.
+CARD_TEMPLATE = (
+    '<div class="game-card">'
+    '<div style="display: flex; justify-content: space-between; align-items: center;">'
+    '<div style="flex: 1;">'
+    '<div style="color: #ffffff; font-weight: 600; margin-bottom: 4px;">{title}</div>'
+    '<div style="color: #666; font-size: 12px;">{subtitle}</div>'
+    '</div>'
+    '<div style="text-align: right;">'
+    '<div style="color: #8b5cf6; font-size: 18px; font-weight: bold;">{value}</div>'
+    '<div style="color: #666; font-size: 12px;">{note}</div>'
+    '</div>'
+    '</div>'
+    '</div>'
+)
+LEGEND_ROW_TEMPLATE = (
+    '<div style="display: flex; justify-content: space-between; padding: 8px 0; border-bottom: 1px solid #2a2a2a;">'
+    '<div style="color: #a0a0a0;">● {title}</div>'
+    '<div>'
+    '<span style="color: #ffffff; font-weight: 600;">{value}</span>'
+    '<span style="color: #666; margin-left: 12px;">{note}</span>'
+    '</div>'
+    '</div>'
+)
+VALUE_ROW_TEMPLATE = (
+    '<div style="display: flex; justify-content: space-between; padding: 12px 0; border-bottom: 1px solid #2a2a2a;">'
+    '<div style="color: #ffffff;">{title}</div>'
+    '<div style="color: #8b5cf6; font-weight: 600;">{value}</div>'
+    '</div>'
+)
 
 st.set_page_config(
     page_title="Roblox Expense Tracker",
@@ -75,8 +138,6 @@ st.markdown("""
 def init_session_state():
     if 'roblox_api' not in st.session_state:
         st.session_state.roblox_api = None
-    if 'transactions' not in st.session_state:
-        st.session_state.transactions = None
     if 'user_info' not in st.session_state:
         st.session_state.user_info = None
     if 'cookie_validated' not in st.session_state:
@@ -97,15 +158,353 @@ def init_session_state():
         st.session_state.comparison_mode = "Month vs Month"
     if 'cache_timestamp' not in st.session_state:
         st.session_state.cache_timestamp = None
+    if 'refresher' not in st.session_state:
+        st.session_state.refresher = BackgroundRefresher()
+    if 'refresh_failed_at' not in st.session_state:
+        st.session_state.refresh_failed_at = None
+    if 'cache_policy' not in st.session_state:
+        st.session_state.cache_policy = CachePolicy()
+    if 'response_cache' not in st.session_state:
+        st.session_state.response_cache = PolicyCache(st.session_state.cache_policy)
+    if 'session_data' not in st.session_state:
+        st.session_state.session_data = SessionData(st.session_state.refresher, st.session_state.response_cache)
+    if 'analytics_jobs' not in st.session_state:
+        st.session_state.analytics_jobs = AnalyticsJobs()
+    if 'identity_timestamp' not in st.session_state:
+        st.session_state.identity_timestamp = None
+    if 'custom_budgets' not in st.session_state:
+        st.session_state.custom_budgets = []
+    if 'budget_table' not in st.session_state:
+        st.session_state.budget_table = budgets_to_table([])
+    if 'saved_budgets' not in st.session_state:
+        st.session_state.saved_budgets = None
+    if 'account_warning' not in st.session_state:
+        st.session_state.account_warning = None
+    if 'account_errors' not in st.session_state:
+        st.session_state.account_errors = []
+    if 'games_page' not in st.session_state:
+        st.session_state.games_page = 0
+    if 'recipients_page' not in st.session_state:
+        st.session_state.recipients_page = 0
+
+def budgets_to_table(budgets):
+    return pd.DataFrame([
+        {
+            'Name': b.name,
+            'Type': BUDGET_KIND_LABELS.get(b.kind, 'Overall'),
+            'Category': b.category,
+            'Game / Item': b.item,
+            'Limit': int(b.limit),
+            'Window (days)': int(b.window_days)
+        }
+        for b in budgets
+    ], columns=BUDGET_TABLE_COLUMNS)
+
+def table_to_budgets(table):
+    kinds = {label: kind for kind, label in BUDGET_KIND_LABELS.items()}
+    budgets = []
+    for row in table.to_dict(orient='records'):
+        limit = row.get('Limit')
+        if pd.isna(limit) or limit <= 0:
+            continue
+        category = row.get('Category')
+        item = row.get('Game / Item')
+        window_days = row.get('Window (days)')
+        budgets.append(Budget(
+            name=row.get('Name') if isinstance(row.get('Name'), str) and row.get('Name').strip() else f"Budget {len(budgets) + 1}",
+            limit=float(limit),
+            kind=kinds.get(row.get('Type'), 'overall'),
+            category=category if isinstance(category, str) and category else None,
+            item=item.strip() if isinstance(item, str) and item.strip() else None,
+            window_days=int(window_days) if not pd.isna(window_days) and window_days > 0 else 30
+        ))
+    return budgets
+
+def load_saved_budgets(user_id):
+    if not DATA_DIR:
+        return
+    budgets, threshold = load_budgets(DATA_DIR, user_id)
+    custom_budgets = []
+    for budget in budgets:
+        if budget.name == 'Overall Budget' and budget.kind == 'overall' and not budget.category and not budget.item:
+            st.session_state.overall_budget = int(budget.limit)
+        elif budget.name == 'Monthly Budget' and budget.kind == 'monthly' and not budget.category and not budget.item:
+            st.session_state.monthly_budget = int(budget.limit)
+        else:
+            custom_budgets.append(budget)
+    st.session_state.custom_budgets = custom_budgets
+    st.session_state.budget_table = budgets_to_table(custom_budgets)
+    st.session_state.budget_threshold = int(threshold)
+    st.session_state.saved_budgets = ([b.to_dict() for b in budgets], threshold)
+
+def persist_budgets(budgets):
+    if not DATA_DIR:
+        return
+    snapshot = ([b.to_dict() for b in budgets], st.session_state.budget_threshold)
+    if snapshot != st.session_state.saved_budgets:
+        save_budgets(DATA_DIR, st.session_state.user_info.get('id'), budgets, st.session_state.budget_threshold)
+        st.session_state.saved_budgets = snapshot
+
+def run_analytics(slot, key, func, *args, size=0):
+    # Heavy jobs go to the shared process pool. The placeholder update while
+    # waiting gives Streamlit a point to stop this run if a rerun supersedes it.
+    status = st.empty()
+    try:
+        return st.session_state.analytics_jobs.run(
+            slot, key, func, *args, size=size, on_wait=lambda: status.caption("⏳ Crunching numbers...")
+        )
+    finally:
+        status.empty()
+
+def get_forecast(monthly_spending):
+    forecast_key = (
+        'forecast', st.session_state.date_range_start, st.session_state.date_range_end,
+        st.session_state.get('selected_account'), st.session_state.get('item_search', '').strip()
+    )
+    forecast_result = st.session_state.response_cache.get('aggregates', forecast_key)
+    if forecast_result is None:
+        # A few dozen monthly totals: cheaper to fit here than to ship to a worker.
+        observed_through = min(st.session_state.date_range_end, datetime.now().date())
+        forecast_result = forecast_spending(monthly_spending, 6, observed_through)
+        if forecast_result is not None:
+            st.session_state.response_cache.set('aggregates', forecast_key, forecast_result)
+    return forecast_result
+
+def render_budget_card(title, alert_label, budget_noun, result):
+    if result.status == 'Budget Exceeded':
+        color, icon = "#ef4444", "🚨"
+    elif result.status == 'Approaching Limit':
+        color, icon = "#f59e0b", "⚠️"
+    else:
+        color, icon = "#10b981", "✅"
+    
+    projection = ""
+    if not pd.isna(result.projected_breach):
+        projection = f'<div style="margin-top: 4px; color: #f59e0b; font-size: 13px;">📈 Projected to exceed on {result.projected_breach.strftime("%b %d, %Y")} at the forecast spending rate</div>'
+    
+    st.markdown(f"""
+    <div style="background-color: #1a1a1a; border-radius: 12px; padding: 20px; border: 2px solid {color}; margin-bottom: 16px;">
+        <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 12px;">
+            <div>
+                <div style="color: #a0a0a0; font-size: 14px;">{title}</div>
+                <div style="color: #ffffff; font-size: 24px; font-weight: bold; margin-top: 4px;">{format_robux(result.spent)} / {format_robux(result.limit)}</div>
+            </div>
+            <div style="text-align: right;">
+                <div style="color: {color}; font-size: 18px; font-weight: bold;">{icon} {result.status}</div>
+                <div style="color: #a0a0a0; font-size: 14px; margin-top: 4px;">{result.percentage:.1f}% used</div>
+            </div>
+        </div>
+        <div style="background-color: #2a2a2a; border-radius: 8px; height: 24px; overflow: hidden;">
+            <div style="background: linear-gradient(90deg, {color}, {color}); height: 100%; width: {min(result.percentage, 100):.1f}%; transition: width 0.3s ease;"></div>
+        </div>
+        <div style="margin-top: 8px; color: #a0a0a0; font-size: 13px;">
+            {'Remaining: ' + format_robux(result.remaining) if result.remaining > 0 else 'Over budget by: ' + format_robux(abs(result.remaining))}
+        </div>
+        {projection}
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if result.percentage >= 100:
+        st.error(f"🚨 **{alert_label} Alert:** You've exceeded your {budget_noun} by {format_robux(abs(result.remaining))}!")
+    elif result.percentage >= st.session_state.budget_threshold:
+        st.warning(f"⚠️ **{alert_label} Warning:** You've used {result.percentage:.1f}% of your {budget_noun}. {format_robux(result.remaining)} remaining.")
+
+def card_list_html(template, titles, values, subtitles=None, notes=None, title_length=None):
+    rows = len(titles)
+    subtitles = subtitles if subtitles is not None else [''] * rows
+    notes = notes if notes is not None else [''] * rows
+    return ''.join(
+        template.format(
+            title=html.escape(str(title)[:title_length]),
+            subtitle=subtitle,
+            value=value,
+            note=note
+        )
+        for title, value, subtitle, note in zip(titles, values, subtitles, notes)
+    )
+
+def render_card_list(template, titles, values, subtitles=None, notes=None, title_length=None):
+    if len(titles) > 0:
+        st.markdown(card_list_html(template, titles, values, subtitles, notes, title_length), unsafe_allow_html=True)
+
+def percentages(amounts, total):
+    amounts = np.asarray(amounts, dtype=np.float64)
+    return amounts / total * 100 if total > 0 else np.zeros(len(amounts))
+
+def render_item_pages(view, page_key):
+    item_count = view.distinct('item')
+    total_pages = max(1, (item_count + ITEM_PAGE_SIZE - 1) // ITEM_PAGE_SIZE)
+    page = min(st.session_state[page_key], total_pages - 1)
+    page_items = view.totals_page('item', page, ITEM_PAGE_SIZE)
+    
+    st.dataframe(
+        pd.DataFrame({
+            'RANK': np.arange(page * ITEM_PAGE_SIZE + 1, page * ITEM_PAGE_SIZE + len(page_items) + 1),
+            'ITEM': page_items['item'],
+            'SPENT': [format_robux(amount) for amount in page_items['amount']],
+            'TRANSACTIONS': page_items['count'],
+            'SHARE': [f"{amount / view.total * 100:.1f}%" for amount in page_items['amount']],
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    if total_pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if page > 0 and st.button("⬅️ Previous", key=f"{page_key}_previous", use_container_width=True):
+                st.session_state[page_key] = page - 1
+                st.rerun()
+        with col2:
+            st.markdown(f'<div style="text-align: center; color: #666; padding: 8px;">Page {page + 1} of {total_pages}</div>', unsafe_allow_html=True)
+        with col3:
+            if page < total_pages - 1 and st.button("Next ➡️", key=f"{page_key}_next", use_container_width=True):
+                st.session_state[page_key] = page + 1
+                st.rerun()
 
 def format_robux(amount):
     return f"{amount:,.0f} R$"
 
-def is_cache_valid(cache_timestamp, expiry_minutes=30):
-    if cache_timestamp is None:
+def preset_caption(windows, days):
+    spend, count = windows.window(days)
+    return f"{format_robux(spend)} • {count:,} purchases"
+
+def is_cache_valid(cache_timestamp, data_class='transactions'):
+    return st.session_state.cache_policy.is_valid(data_class, cache_timestamp)
+
+def get_cache_ttl_minutes(data_class='transactions'):
+    return int(st.session_state.cache_policy.ttl_for(data_class).total_seconds() / 60)
+
+def get_cache_expires_in_minutes(cache_timestamp, data_class='transactions'):
+    return int(st.session_state.cache_policy.expires_in(data_class, cache_timestamp).total_seconds() / 60)
+
+def set_transactions(fetched_at, changed_accounts, new_records=None):
+    # With new_records (a refresh) the combined view is extended in place;
+    # otherwise (first load, added account) it is rebuilt from the accounts.
+    data = st.session_state.session_data
+    if new_records is None or data.transactions is None:
+        data.transactions, data.aggregates = combine_accounts(data.accounts)
+    else:
+        data.transactions, data.aggregates = extend_combined(data.accounts, data.transactions, data.aggregates, new_records)
+    data.measure()
+    mark_transactions_updated(fetched_at, changed_accounts)
+
+def mark_transactions_updated(fetched_at, changed_accounts):
+    st.session_state.cache_timestamp = fetched_at
+    if not changed_accounts:
+        return
+    transactions = st.session_state.session_data.transactions
+    spending = transactions.spending_rows()
+    st.session_state.cache_policy.update_activity(transactions.dates if spending is None else transactions.dates[spending])
+    st.session_state.response_cache.invalidate('aggregates')
+    if DATA_DIR:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        for account in changed_accounts:
+            save_user_history(DATA_DIR, account.user_id, account.store)
+    if ANALYTICS_BACKEND:
+        for account in changed_accounts:
+            analytics_db().load(account.user_id, account.store)
+
+def start_background_refresh():
+    accounts = list(st.session_state.session_data.accounts)
+    boundaries = account_boundaries(accounts)
+    return st.session_state.refresher.start(
+        lambda: fetch_new_for_accounts(accounts, boundaries, max_transactions=1000)
+    )
+
+def refresh_backoff_elapsed():
+    failed_at = st.session_state.refresh_failed_at
+    return failed_at is None or (datetime.now() - failed_at).total_seconds() >= REFRESH_RETRY_SECONDS
+
+def apply_background_refresh():
+    result = st.session_state.refresher.take_result()
+    if result is None:
         return False
-    time_elapsed = datetime.now() - cache_timestamp
-    return time_elapsed.total_seconds() < (expiry_minutes * 60)
+    st.session_state.refresh_failed_at = None
+    new_records, fetched_at = result
+    changed = apply_account_records(st.session_state.session_data.accounts, new_records)
+    if changed:
+        set_transactions(fetched_at, changed, new_records)
+    else:
+        mark_transactions_updated(fetched_at, changed)
+    return True
+
+def add_account(cookie):
+    added, skipped = merge_accounts(
+        st.session_state.session_data.accounts,
+        connect_accounts([cookie], cache=st.session_state.response_cache)
+    )
+    if not added:
+        return False
+    errors = load_accounts(added, max_transactions=1000)
+    record_account_errors(added, errors)
+    added = [account for account in added if account.store is not None]
+    if added:
+        st.session_state.session_data.accounts.extend(added)
+        set_transactions(st.session_state.cache_timestamp or datetime.now(), added)
+    return True
+
+def record_account_errors(accounts, errors):
+    # Shown once with st.error; the accounts are left out of the dashboard.
+    st.session_state.account_errors.extend(
+        f"Could not load {account.label}: {errors[account.user_id]}"
+        for account in accounts if account.user_id in errors
+    )
+
+@st.cache_resource
+def session_memory():
+    # Memory accounting shared by every session in the server process;
+    # evicted sessions are restored from the saved histories in DATA_DIR, or
+    # without one from a temporary spill directory removed at exit.
+    return SessionMemory(int(SESSION_MEMORY_BUDGET_MB * 2**20), DATA_DIR)
+
+@st.cache_resource
+def analytics_db():
+    # One embedded database per server process, shared by every session.
+    return SqlStore(ANALYTICS_BACKEND, ANALYTICS_DB_PATH)
+
+def history_files_for(accounts):
+    # Persisted history for the accounts on screen, or None while any of them
+    # only exists in memory.
+    if not DATA_DIR:
+        return None
+    paths = [user_history_file(DATA_DIR, account.user_id) for account in accounts]
+    return None if None in paths else paths
+
+def day_range_mask(df, start, end):
+    days = df['day'].values
+    return (days >= np.datetime64(start, 'D')) & (days <= np.datetime64(end, 'D'))
+
+def load_date_range(df, history, start, end, columns=None):
+    # Spending between start and end inclusive. With history files the date
+    # predicate and column list are pushed down to the Parquet reader;
+    # otherwise df is sliced (all columns, since the slice is already in memory).
+    if history is not None:
+        return scan_history(history, start, end, spending_only=True, columns=columns)
+    return df[day_range_mask(df, start, end)]
+
+def period_view(df, history, user_ids, start, end, use_sql=True):
+    # Aggregates for start..end inclusive: queried from the SQL backend when
+    # one is configured (and the view is not narrowed by a search), otherwise
+    # computed from the period's rows.
+    if ANALYTICS_BACKEND and use_sql:
+        return SqlAggregates(analytics_db(), user_ids, start, end)
+    return FrameAggregates(load_date_range(df, history, start, end, PERIOD_COLUMNS))
+
+def period_bounds(period):
+    # Period clamped to the dashboard's date filter.
+    return (
+        max(period.start_time.date(), st.session_state.date_range_start),
+        min(period.end_time.date(), st.session_state.date_range_end)
+    )
+
+@st.fragment(run_every=2)
+def watch_background_refresh():
+    refresher = st.session_state.refresher
+    if refresher.has_result():
+        st.rerun()
+    elif refresher.is_running():
+        st.caption("🔄 Refreshing transactions in the background...")
 
 def get_cache_age_text(cache_timestamp):
     if cache_timestamp is None:
@@ -123,9 +522,8 @@ def get_cache_age_text(cache_timestamp):
         hours = int(minutes / 60)
         return f"{hours} hour{'s' if hours != 1 else ''} ago"
 
-def create_spending_chart(df):
-    category_spending = df.groupby('category')['amount'].sum().reset_index()
-    category_spending = category_spending.sort_values('amount', ascending=False)
+def create_spending_chart(category_totals):
+    category_spending = category_totals[['category', 'amount']].copy()
     
     total = category_spending['amount'].sum()
     category_spending['percentage'] = (category_spending['amount'] / total * 100).round(1)
@@ -161,8 +559,8 @@ def create_spending_chart(df):
     
     return fig
 
-def create_distribution_chart(df):
-    category_spending = df.groupby('category')['amount'].sum().reset_index()
+def create_distribution_chart(category_totals):
+    category_spending = category_totals[['category', 'amount']].copy()
     total = category_spending['amount'].sum()
     category_spending['percentage'] = (category_spending['amount'] / total * 100).round(1)
     
@@ -197,24 +595,37 @@ def create_distribution_chart(df):
     
     return fig
 
-def create_spending_trend_chart(df):
-    df_sorted = df.sort_values('date')
-    df_sorted['cumulative'] = df_sorted['amount'].cumsum()
-    
+def create_net_flow_chart(net_flow):
     fig = go.Figure()
     
+    fig.add_trace(go.Bar(
+        x=net_flow['month'],
+        y=net_flow['income'],
+        name='Income',
+        marker_color='#10b981',
+        hovertemplate='%{x}<br>Income: %{y:,.0f} R$<extra></extra>'
+    ))
+    
+    fig.add_trace(go.Bar(
+        x=net_flow['month'],
+        y=net_flow['spending'],
+        name='Spending',
+        marker_color='#8b5cf6',
+        hovertemplate='%{x}<br>Spending: %{y:,.0f} R$<extra></extra>'
+    ))
+    
     fig.add_trace(go.Scatter(
-        x=df_sorted['date'],
-        y=df_sorted['cumulative'],
-        mode='lines',
-        line=dict(color='#8b5cf6', width=2),
-        fill='tozeroy',
-        fillcolor='rgba(139, 92, 246, 0.1)',
-        name='Cumulative Spending',
-        hovertemplate='%{x}<br>%{y:,.0f} R$<extra></extra>'
+        x=net_flow['month'],
+        y=net_flow['net'],
+        mode='lines+markers',
+        name='Net',
+        line=dict(color='#f59e0b', width=2),
+        marker=dict(size=6),
+        hovertemplate='%{x}<br>Net: %{y:,.0f} R$<extra></extra>'
     ))
     
     fig.update_layout(
+        barmode='group',
         plot_bgcolor='#0a0a0a',
         paper_bgcolor='#0a0a0a',
         font_color='#ffffff',
@@ -229,15 +640,44 @@ def create_spending_trend_chart(df):
             gridcolor='#2a2a2a',
             color='#ffffff'
         ),
-        showlegend=False
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color='#ffffff')
+        )
     )
     
     return fig
 
-def create_comparison_chart(df1, df2, label1, label2):
-    cat1 = df1.groupby('category')['amount'].sum().reset_index()
-    cat2 = df2.groupby('category')['amount'].sum().reset_index()
+def create_trend_sparkline(rolling):
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=rolling['date'],
+        y=rolling['amount'],
+        mode='lines',
+        line=dict(color='#8b5cf6', width=2),
+        fill='tozeroy',
+        fillcolor='rgba(139, 92, 246, 0.1)',
+        hovertemplate='%{x|%b %d}<br>%{y:,.0f} R$/day<extra></extra>'
+    ))
     
+    fig.update_layout(
+        plot_bgcolor='#0a0a0a',
+        paper_bgcolor='#0a0a0a',
+        height=80,
+        margin=dict(t=5, b=5, l=5, r=5),
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        showlegend=False
+    )
+    
+    return fig
+
+def create_comparison_chart(cat1, cat2, label1, label2):
     all_categories = list(set(cat1['category'].tolist() + cat2['category'].tolist()))
     
     amounts1 = []
@@ -296,75 +736,6 @@ def create_comparison_chart(df1, df2, label1, label2):
     
     return fig
 
-def forecast_spending(monthly_spending_df, months_to_forecast=6):
-    if len(monthly_spending_df) < 2:
-        return None
-    
-    monthly_spending_df = monthly_spending_df.sort_values('month')
-    
-    x = np.arange(len(monthly_spending_df))
-    y = monthly_spending_df['amount'].values
-    
-    coefficients = np.polyfit(x, y, 1)
-    slope, intercept = coefficients
-    
-    future_x = np.arange(len(monthly_spending_df), len(monthly_spending_df) + months_to_forecast)
-    future_y = slope * future_x + intercept
-    future_y = np.maximum(future_y, 0)
-    
-    historical_trend = slope * x + intercept
-    residuals = y - historical_trend
-    std_dev = np.std(residuals)
-    mean_residual = np.mean(np.abs(residuals))
-    
-    avg_spending = np.mean(y)
-    if avg_spending > 0:
-        variability = (std_dev / avg_spending) * 100
-    else:
-        variability = 0
-    
-    if variability < 20:
-        confidence = "High"
-        confidence_color = "#10b981"
-    elif variability < 40:
-        confidence = "Medium"
-        confidence_color = "#f59e0b"
-    else:
-        confidence = "Low"
-        confidence_color = "#ef4444"
-    
-    if slope > avg_spending * 0.05:
-        trend = "Increasing"
-        trend_icon = "↑"
-        trend_color = "#ef4444"
-    elif slope < -avg_spending * 0.05:
-        trend = "Decreasing"
-        trend_icon = "↓"
-        trend_color = "#10b981"
-    else:
-        trend = "Stable"
-        trend_icon = "—"
-        trend_color = "#a0a0a0"
-    
-    last_month_spending = y[-1]
-    if last_month_spending > 0:
-        next_month_change = ((future_y[0] - last_month_spending) / last_month_spending) * 100
-    else:
-        next_month_change = 0
-    
-    return {
-        'future_months': future_x,
-        'future_spending': future_y,
-        'trend': trend,
-        'trend_icon': trend_icon,
-        'trend_color': trend_color,
-        'confidence': confidence,
-        'confidence_color': confidence_color,
-        'variability': variability,
-        'slope': slope,
-        'next_month_change': next_month_change
-    }
-
 def create_forecast_chart(monthly_spending_df, forecast_data, months_to_forecast=6):
     monthly_spending_df = monthly_spending_df.sort_values('month')
     
@@ -394,6 +765,20 @@ def create_forecast_chart(monthly_spending_df, forecast_data, months_to_forecast
     forecast_x = [last_historical_month] + [str(m) for m in forecast_months]
     forecast_y = [last_historical_amount] + list(forecast_data['future_spending'])
     
+    # Prediction interval from the model's backtest errors, drawn as a band
+    # that opens from the last actual month.
+    band_x = forecast_x + forecast_x[::-1]
+    band_y = [last_historical_amount] + list(forecast_data['upper']) + list(forecast_data['lower'])[::-1] + [last_historical_amount]
+    fig.add_trace(go.Scatter(
+        x=band_x,
+        y=band_y,
+        fill='toself',
+        fillcolor='rgba(59, 130, 246, 0.15)',
+        line=dict(color='rgba(59, 130, 246, 0)'),
+        name='80% Interval',
+        hoverinfo='skip'
+    ))
+    
     fig.add_trace(go.Scatter(
         x=forecast_x,
         y=forecast_y,
@@ -459,70 +844,226 @@ if not st.session_state.cookie_validated:
         """)
     
     cookie_input = st.text_input("Roblox Cookie (.ROBLOSECURITY)", type="password", placeholder="Enter your cookie here...")
+    extra_cookies_input = st.text_area(
+        "Additional Account Cookies (optional)",
+        placeholder="One cookie per line for family or alt accounts...",
+        help="Every account is fetched in parallel and shown in a combined dashboard."
+    )
     
     col1, col2, col3 = st.columns([1, 1, 1])
     with col2:
         if st.button("🔐 Authenticate", use_container_width=True):
             if cookie_input:
                 with st.spinner("Validating cookie..."):
-                    api = RobloxAPI(cookie_input)
-                    if api.validate_cookie():
-                        st.session_state.roblox_api = api
-                        st.session_state.user_info = api.get_user_info()
+                    extra_cookies = [c.strip() for c in extra_cookies_input.splitlines() if c.strip()]
+                    connected = connect_accounts([cookie_input] + extra_cookies, cache=st.session_state.response_cache)
+                    primary = connected[0]
+                    if primary is not None:
+                        accounts, skipped = merge_accounts([], connected)
+                        st.session_state.session_data.accounts = accounts
+                        st.session_state.roblox_api = primary.api
+                        st.session_state.user_info = primary.user_info
+                        st.session_state.identity_timestamp = datetime.now()
                         st.session_state.cookie_validated = True
+                        if skipped:
+                            st.session_state.account_warning = f"{skipped} additional cookie{'s were' if skipped != 1 else ' was'} invalid or a duplicate and skipped."
+                        load_saved_budgets(st.session_state.user_info.get('id'))
                         st.rerun()
                     else:
                         st.error("❌ Invalid cookie. Please check and try again.")
             else:
                 st.warning("Please enter your cookie.")
 else:
+    # Marks this session active, restores its data if it was evicted while
+    # idle, and evicts idle sessions while the process is over budget.
+    session_memory().touch(st.session_state.session_data)
+    apply_background_refresh()
+    refresh_error = st.session_state.refresher.take_error()
+    if refresh_error:
+        st.session_state.refresh_failed_at = datetime.now()
+    cache_policy = st.session_state.cache_policy
+    
+    identity_valid = is_cache_valid(st.session_state.identity_timestamp, 'identity')
+    cache_policy.record('identity', identity_valid)
+    if not identity_valid:
+        user_info = st.session_state.roblox_api.get_user_info()
+        if user_info:
+            st.session_state.user_info = user_info
+            st.session_state.session_data.accounts[0].user_info = user_info
+            st.session_state.identity_timestamp = datetime.now()
+    
+    cache_valid = is_cache_valid(st.session_state.cache_timestamp)
+    cache_policy.record('transactions', cache_valid)
+    
+    if st.session_state.session_data.transactions is None:
+        with st.spinner("Fetching transactions from API..."):
+            progress = st.empty()
+            
+            def show_progress(loaded, spent):
+                progress.markdown(f'<div class="info-banner">⏳ Loading transactions... {loaded:,} loaded so far • {format_robux(spent)} spent</div>', unsafe_allow_html=True)
+            
+            accounts = st.session_state.session_data.accounts
+            errors = load_accounts(accounts, max_transactions=1000, on_progress=show_progress)
+            progress.empty()
+            if accounts[0].store is None:
+                st.error(f"Unable to fetch transactions: {errors.get(accounts[0].user_id)}. Please try again.")
+                st.stop()
+            record_account_errors(accounts[1:], errors)
+            accounts = st.session_state.session_data.accounts = [account for account in accounts if account.store is not None]
+            if any(len(account.store) for account in accounts):
+                set_transactions(datetime.now(), accounts)
+                cache_valid = True
+                account_note = f" across {len(accounts)} accounts" if len(accounts) > 1 else ""
+                st.info(f"✅ Loaded {len(st.session_state.session_data.transactions)} transactions{account_note} from API. Cache valid for {get_cache_ttl_minutes()} minutes.")
+            else:
+                st.error("Unable to fetch transactions. Please try again.")
+                st.stop()
+    elif not cache_valid and refresh_backoff_elapsed():
+        start_background_refresh()
+    
+    is_refreshing = st.session_state.refresher.is_running()
+    
     col1, col2, col3 = st.columns([2, 1, 1])
     with col1:
         cache_age = get_cache_age_text(st.session_state.cache_timestamp)
-        cache_status = "🟢 Cached" if is_cache_valid(st.session_state.cache_timestamp) else "🔴 Expired" if st.session_state.cache_timestamp else "⚪ Not cached"
-        st.markdown(f'<div class="info-banner">🔒 <b>Private Data Analysis</b><br>User ID: {st.session_state.user_info.get("id", "N/A")} | Last updated: {cache_age} | {cache_status}</div>', unsafe_allow_html=True)
+        cache_status = "🟢 Cached" if cache_valid else "🔴 Expired" if st.session_state.cache_timestamp else "⚪ Not cached"
+        if is_refreshing:
+            cache_status += " | 🔄 Refreshing..."
+        linked_accounts = len(st.session_state.session_data.accounts) - 1
+        linked_text = f" (+{linked_accounts} linked account{'s' if linked_accounts != 1 else ''})" if linked_accounts > 0 else ""
+        st.markdown(f'<div class="info-banner">🔒 <b>Private Data Analysis</b><br>User ID: {st.session_state.user_info.get("id", "N/A")}{linked_text} | Last updated: {cache_age} | {cache_status}</div>', unsafe_allow_html=True)
     with col3:
-        if st.button("🔄 Refresh", use_container_width=True):
-            st.session_state.transactions = None
-            st.session_state.cache_timestamp = None
-            st.success("♻️ Cache cleared! Fetching fresh data...")
+        if st.button("🔄 Refresh", use_container_width=True, disabled=is_refreshing):
+            start_background_refresh()
             st.rerun()
     
-    cache_valid = is_cache_valid(st.session_state.cache_timestamp)
-    
-    if st.session_state.transactions is None or not cache_valid:
-        data_source = "cache (expired)" if st.session_state.cache_timestamp else "API (no cache)"
-        if st.session_state.transactions is None:
-            data_source = "API (forced refresh)"
-        
-        with st.spinner(f"Fetching transactions from {data_source}..."):
-            raw_transactions = st.session_state.roblox_api.get_all_transactions(max_transactions=1000)
-            if raw_transactions:
-                st.session_state.transactions = st.session_state.roblox_api.parse_transactions(raw_transactions)
-                st.session_state.cache_timestamp = datetime.now()
-                st.info(f"✅ Loaded {len(st.session_state.transactions)} transactions from API. Cache valid for 30 minutes.")
+    if refresh_error:
+        st.warning(f"⚠️ {refresh_error} Showing previously loaded data.")
+    
+    if st.session_state.account_warning:
+        st.warning(f"⚠️ {st.session_state.account_warning}")
+        st.session_state.account_warning = None
+    
+    for account_error in st.session_state.account_errors:
+        st.error(f"❌ {account_error}. It is left out of the dashboard; add it again from Accounts to retry.")
+    st.session_state.account_errors = []
+    
+    unparseable = [row for account in st.session_state.session_data.accounts for row in account.api.unparseable_rows]
+    unparseable_count = sum(account.api.unparseable_count for account in st.session_state.session_data.accounts)
+    if unparseable_count:
+        with st.expander(f"⚠️ {unparseable_count:,} transaction{'s' if unparseable_count != 1 else ''} skipped: unreadable timestamp"):
+            st.dataframe(pd.DataFrame(unparseable), hide_index=True, use_container_width=True)
+    
+    if is_refreshing or st.session_state.refresher.has_result():
+        watch_background_refresh()
+    
+    with st.expander("👥 Accounts"):
+        accounts = st.session_state.session_data.accounts
+        if len(accounts) > 1:
+            st.dataframe(
+                account_summary(accounts),
+                column_config={
+                    'account': 'Account',
+                    'user_id': st.column_config.NumberColumn('User ID', format="%d"),
+                    'transactions': 'Transactions',
+                    'total_spent': st.column_config.NumberColumn('Total Spent', format="%d R$"),
+                    'share': st.column_config.ProgressColumn('Share', format="%.1f%%", min_value=0, max_value=100),
+                    'last_purchase': st.column_config.DatetimeColumn('Last Purchase', format="MMM D, YYYY"),
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+        st.markdown("Add a family member or alt account to combine its spending with this dashboard.")
+        new_cookie = st.text_input("Account Cookie (.ROBLOSECURITY)", type="password", key="new_account_cookie")
+        if st.button("➕ Add Account", disabled=is_refreshing):
+            if new_cookie:
+                with st.spinner("Fetching account transactions..."):
+                    if add_account(new_cookie):
+                        st.rerun()
+                    else:
+                        st.error("❌ That cookie is invalid or the account is already added.")
             else:
-                st.error("Unable to fetch transactions. Please try again.")
-                st.stop()
+                st.warning("Please enter your cookie.")
     
-    transactions = st.session_state.transactions
+    account_labels = ["All accounts"] + [account.label for account in st.session_state.session_data.accounts]
+    selected_account = st.selectbox("Account", account_labels, key="selected_account") if len(account_labels) > 2 else "All accounts"
+    if selected_account == "All accounts":
+        viewed_accounts = st.session_state.session_data.accounts
+        transactions, aggregates = st.session_state.session_data.transactions, st.session_state.session_data.aggregates
+    else:
+        viewed_accounts = [st.session_state.session_data.accounts[account_labels.index(selected_account) - 1]]
+        transactions, aggregates = viewed_accounts[0].store, viewed_accounts[0].aggregates
+    history = history_files_for(viewed_accounts)
+    viewed_user_ids = [account.user_id for account in viewed_accounts]
     
     if not transactions:
         st.info("No transactions found.")
         st.stop()
     
-    df = pd.DataFrame(transactions)
+    df = transactions.to_dataframe(spending_only=True)
+    has_income = transactions.spending_rows() is not None
+    
+    if aggregates.count == 0:
+        st.info("No purchases found.")
+        st.stop()
+    
+    # Flagged as pages are folded into the aggregates; a recent one may mean a
+    # binge or someone else spending with the account.
+    spikes = aggregates.spikes.frame()
+    spike_months = monthly_anomalies(aggregates.monthly_series())
+    recent_spikes = aggregates.spikes.recent(int(np.datetime64(datetime.now().date(), 'D').astype(np.int64)), RECENT_SPIKE_DAYS)
+    if len(recent_spikes):
+        latest = recent_spikes.iloc[0]
+        st.warning(
+            f"🚨 Unusual spending on {pd.Timestamp(latest['date']).strftime('%B %d')}: {format_robux(latest['amount'])} across "
+            f"{latest['count']:,} purchases (typically {format_robux(latest['typical_amount'])}). "
+            "If this wasn't you, change your password and sign out of all sessions."
+        )
+    if len(spikes) or len(spike_months):
+        with st.expander(f"🚨 Spending anomalies ({len(spikes):,} days, {len(spike_months):,} months)"):
+            if len(spikes):
+                st.dataframe(
+                    spikes,
+                    column_config={
+                        'date': st.column_config.DateColumn('Date', format="MMM D, YYYY"),
+                        'amount': st.column_config.NumberColumn('Spent', format="%d R$"),
+                        'count': st.column_config.NumberColumn('Purchases'),
+                        'typical_amount': st.column_config.NumberColumn('Typical Day', format="%.0f R$"),
+                        'typical_count': st.column_config.NumberColumn('Typical Purchases', format="%.0f"),
+                        'score': st.column_config.NumberColumn('Score', format="%.1f"),
+                        'reason': st.column_config.TextColumn('Reason'),
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
+            if len(spike_months):
+                st.markdown("**Unusual months**")
+                st.dataframe(
+                    spike_months,
+                    column_config={
+                        'month': st.column_config.TextColumn('Month'),
+                        'amount': st.column_config.NumberColumn('Spent', format="%d R$"),
+                        'typical_amount': st.column_config.NumberColumn('Typical Month', format="%.0f R$"),
+                        'score': st.column_config.NumberColumn('Score', format="%.1f"),
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
     
     st.markdown("## 📅 Date Range Filter")
     
-    min_date = df['date'].min().date()
-    max_date = df['date'].max().date()
+    min_date = pd.Timestamp(aggregates.first_timestamp).date()
+    max_date = pd.Timestamp(aggregates.last_timestamp).date()
     
     if st.session_state.date_range_start is None:
         st.session_state.date_range_start = min_date
     if st.session_state.date_range_end is None:
         st.session_state.date_range_end = max_date
     
+    # Spend and counts for every preset (and the sparkline) come from one pass
+    # over the daily series.
+    windows = aggregates.rolling_windows(datetime.now().date())
+    
     col1, col2, col3, col4, col5, col6 = st.columns([1, 1, 1, 1, 1, 2])
     
     with col1:
@@ -530,24 +1071,32 @@ else:
             st.session_state.date_range_start = (datetime.now() - timedelta(days=7)).date()
             st.session_state.date_range_end = max_date
             st.rerun()
+        st.caption(preset_caption(windows, 7))
     
     with col2:
         if st.button("📅 Last 30 Days", use_container_width=True):
             st.session_state.date_range_start = (datetime.now() - timedelta(days=30)).date()
             st.session_state.date_range_end = max_date
             st.rerun()
+        st.caption(preset_caption(windows, 30))
     
     with col3:
         if st.button("📅 Last 90 Days", use_container_width=True):
             st.session_state.date_range_start = (datetime.now() - timedelta(days=90)).date()
             st.session_state.date_range_end = max_date
             st.rerun()
+        st.caption(preset_caption(windows, 90))
     
     with col4:
         if st.button("📅 All Time", use_container_width=True):
             st.session_state.date_range_start = min_date
             st.session_state.date_range_end = max_date
             st.rerun()
+        st.caption(preset_caption(windows, None))
+    
+    with col6:
+        st.caption("7-day average, last 90 days")
+        st.plotly_chart(create_trend_sparkline(windows.rolling_mean(7, span=90)), use_container_width=True, config={'displayModeBar': False})
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -577,25 +1126,58 @@ else:
             st.session_state.date_range_end = to_date
             st.rerun()
     
-    df['date_only'] = df['date'].dt.date
-    df = df[(df['date_only'] >= st.session_state.date_range_start) & (df['date_only'] <= st.session_state.date_range_end)]
-    df = df.drop('date_only', axis=1)
-    
-    if len(df) == 0:
-        st.warning("⚠️ No transactions found in the selected date range. Please adjust your filters.")
+    with col3:
+        search_query = st.text_input("Search Items", placeholder="🔍 Item or source name, e.g. vip or pass", key="item_search").strip()
+        search_matches = aggregates.search_index.search(search_query, aggregates.sums) if search_query else None
+        if search_matches is not None:
+            top_matches = ", ".join(search_matches['value'].head(5).tolist())
+            st.caption(f"{len(search_matches):,} matching name{'s' if len(search_matches) != 1 else ''}" + (f": {top_matches}" if top_matches else ""))
+    
+    # Full-range views read the incrementally maintained aggregates; narrower
+    # date ranges are queried from the SQL backend when one is configured, or
+    # aggregate the filtered frame. With the SQL backend the range's rows are
+    # only loaded by the transaction list, the one section that shows them. A
+    # search narrows the frame to the matching items, so its views are always
+    # computed from the frame.
+    full_range = st.session_state.date_range_start <= min_date and st.session_state.date_range_end >= max_date
+    rows_pending = False
+    if full_range and search_matches is None:
+        view = aggregates
+    elif ANALYTICS_BACKEND and search_matches is None:
+        view = SqlAggregates(analytics_db(), viewed_user_ids, st.session_state.date_range_start, st.session_state.date_range_end)
+        rows_pending = True
+    else:
+        if not full_range:
+            df = load_date_range(df, history, st.session_state.date_range_start, st.session_state.date_range_end)
+        if search_matches is not None:
+            df = df[search_mask(df, search_matches)]
+            history = None
+        view = FrameAggregates(df)
+    category_totals = view.totals('category')
+    breakdown = view.breakdown()
+    top_items = view.top('item', 10)
+    item_count = view.distinct('item')
+    
+    if view.count == 0:
+        if search_matches is not None:
+            st.warning(f"⚠️ No transactions in the selected date range match \"{search_query}\". Try a shorter search.")
+        else:
+            st.warning("⚠️ No transactions found in the selected date range. Please adjust your filters.")
         st.stop()
     
     date_range_days = (st.session_state.date_range_end - st.session_state.date_range_start).days + 1
     cache_age = get_cache_age_text(st.session_state.cache_timestamp)
     is_cached = is_cache_valid(st.session_state.cache_timestamp)
     cache_indicator = "🟢 Using cached data" if is_cached else "🔴 Cache expired" if st.session_state.cache_timestamp else "⚪ No cache"
+    if is_refreshing:
+        cache_indicator += " • 🔄 Refreshing in background"
     
     st.markdown(f"""
     <div style="background-color: #1a1a1a; border-radius: 8px; padding: 16px; border: 1px solid #2a2a2a; margin-bottom: 20px;">
         <div style="color: #8b5cf6; font-weight: 600; font-size: 16px;">📊 Showing transactions from {st.session_state.date_range_start.strftime('%B %d, %Y')} to {st.session_state.date_range_end.strftime('%B %d, %Y')}</div>
-        <div style="color: #a0a0a0; font-size: 14px; margin-top: 4px;">{date_range_days} days • {len(df):,} transactions • {format_robux(df['amount'].sum())} total spent</div>
+        <div style="color: #a0a0a0; font-size: 14px; margin-top: 4px;">{date_range_days} days • {view.count:,} transactions • {format_robux(view.total)} total spent</div>
         <div style="color: #666; font-size: 13px; margin-top: 8px; padding-top: 8px; border-top: 1px solid #2a2a2a;">
-            💾 {cache_indicator} • Last fetched: {cache_age} • Cache expires in: {30 - int((datetime.now() - st.session_state.cache_timestamp).total_seconds() / 60) if st.session_state.cache_timestamp and is_cached else 0} min
+            💾 {cache_indicator} • Last fetched: {cache_age} • Cache expires in: {get_cache_expires_in_minutes(st.session_state.cache_timestamp) if is_cached else 0} min
         </div>
     </div>
     """, unsafe_allow_html=True)
@@ -642,106 +1224,118 @@ else:
         )
         st.session_state.budget_threshold = threshold_input
         
-        if st.session_state.overall_budget or st.session_state.monthly_budget:
+        st.markdown("#### Additional Budgets")
+        st.markdown("Add per-category, per-game, weekly or rolling-window budgets. Rows without a limit are ignored.")
+        
+        edited_budgets = st.data_editor(
+            st.session_state.budget_table,
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            key="budget_editor",
+            column_config={
+                'Name': st.column_config.TextColumn("Name"),
+                'Type': st.column_config.SelectboxColumn("Type", options=list(BUDGET_KIND_LABELS.values()), default='Monthly', required=True),
+                'Category': st.column_config.SelectboxColumn("Category", options=sorted(category_totals['category'].tolist())),
+                'Game / Item': st.column_config.TextColumn("Game / Item", help="Exact item name as shown in Recent Transactions"),
+                'Limit': st.column_config.NumberColumn("Limit (R$)", min_value=0, step=100),
+                'Window (days)': st.column_config.NumberColumn("Window (days)", min_value=1, max_value=365, default=30, help="Only used by Rolling budgets")
+            }
+        )
+        st.session_state.custom_budgets = table_to_budgets(edited_budgets)
+        
+        if st.session_state.overall_budget or st.session_state.monthly_budget or st.session_state.custom_budgets:
             st.success(f"✅ Budget settings saved! Alerts will trigger at {st.session_state.budget_threshold}% of your budget.")
         else:
             st.info("💡 Set at least one budget limit to start tracking your spending goals.")
     
-    st.markdown("## Total Spending Overview")
-    
-    total_spent = df['amount'].sum()
+    with st.expander("⚙️ Cache Settings"):
+        st.markdown("### Configure Data Refresh")
+        st.markdown("Adaptive expiry refreshes more often when you buy things frequently and less often when your account is quiet.")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            cache_mode = st.radio(
+                "Transaction Cache Expiry",
+                ["Adaptive", "Fixed"],
+                index=0 if cache_policy.transactions_override is None else 1,
+                horizontal=True,
+                key="cache_mode_selector"
+            )
+        
+        with col2:
+            fixed_minutes = st.number_input(
+                "Fixed Expiry (minutes)",
+                min_value=1,
+                max_value=1440,
+                value=int(cache_policy.transactions_override.total_seconds() / 60) if cache_policy.transactions_override else 30,
+                step=5,
+                disabled=cache_mode == "Adaptive",
+                help="Used when the cache expiry is set to Fixed"
+            )
+        
+        cache_policy.transactions_override = timedelta(minutes=fixed_minutes) if cache_mode == "Fixed" else None
+        
+        st.markdown(f"Current transaction cache expiry: **{get_cache_ttl_minutes()} min** • Recent activity: {cache_policy.purchases_per_day:.1f} purchases/day")
+        
+        cache_metrics = pd.DataFrame([
+            {
+                'DATA': data_class.replace('_', ' ').title(),
+                'EXPIRY (MIN)': get_cache_ttl_minutes(data_class),
+                'HITS': cache_policy.stats[data_class].hits,
+                'MISSES': cache_policy.stats[data_class].misses,
+                'EVICTIONS': cache_policy.stats[data_class].evictions,
+                'HIT RATE': f"{cache_policy.stats[data_class].hit_rate * 100:.0f}%"
+            }
+            for data_class in DATA_CLASSES
+        ])
+        st.dataframe(cache_metrics, use_container_width=True, hide_index=True)
+        
+        memory = session_memory()
+        st.caption(
+            f"Session memory: {st.session_state.session_data.nbytes / 2**20:.1f} MB for this session • "
+            f"{memory.total_bytes / 2**20:.1f} MB of {memory.budget_bytes / 2**20:.0f} MB across {len(memory.sessions())} sessions • "
+            f"{memory.evictions:,} idle session{'s' if memory.evictions != 1 else ''} evicted"
+        )
     
-    df_sorted = df.sort_values('date')
-    df_sorted['month'] = df_sorted['date'].dt.to_period('M').astype(str)
-    current_month = datetime.now().strftime('%Y-%m')
-    monthly_spending = df_sorted[df_sorted['month'] == current_month]['amount'].sum()
+    st.markdown("## Total Spending Overview")
     
-    if st.session_state.overall_budget or st.session_state.monthly_budget:
-        if st.session_state.overall_budget:
-            overall_percentage = (total_spent / st.session_state.overall_budget * 100) if st.session_state.overall_budget > 0 else 0
-            overall_remaining = st.session_state.overall_budget - total_spent
-            
-            if overall_percentage < st.session_state.budget_threshold:
-                overall_color = "#10b981"
-                overall_status = "On Track"
-                overall_icon = "✅"
-            elif overall_percentage < 100:
-                overall_color = "#f59e0b"
-                overall_status = "Approaching Limit"
-                overall_icon = "⚠️"
-            else:
-                overall_color = "#ef4444"
-                overall_status = "Budget Exceeded"
-                overall_icon = "🚨"
-            
-            st.markdown(f"""
-            <div style="background-color: #1a1a1a; border-radius: 12px; padding: 20px; border: 2px solid {overall_color}; margin-bottom: 16px;">
-                <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 12px;">
-                    <div>
-                        <div style="color: #a0a0a0; font-size: 14px;">💎 Overall Budget Status</div>
-                        <div style="color: #ffffff; font-size: 24px; font-weight: bold; margin-top: 4px;">{format_robux(total_spent)} / {format_robux(st.session_state.overall_budget)}</div>
-                    </div>
-                    <div style="text-align: right;">
-                        <div style="color: {overall_color}; font-size: 18px; font-weight: bold;">{overall_icon} {overall_status}</div>
-                        <div style="color: #a0a0a0; font-size: 14px; margin-top: 4px;">{overall_percentage:.1f}% used</div>
-                    </div>
-                </div>
-                <div style="background-color: #2a2a2a; border-radius: 8px; height: 24px; overflow: hidden;">
-                    <div style="background: linear-gradient(90deg, {overall_color}, {overall_color}); height: 100%; width: {min(overall_percentage, 100):.1f}%; transition: width 0.3s ease;"></div>
-                </div>
-                <div style="margin-top: 8px; color: #a0a0a0; font-size: 13px;">
-                    {'Remaining: ' + format_robux(overall_remaining) if overall_remaining > 0 else 'Over budget by: ' + format_robux(abs(overall_remaining))}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            if overall_percentage >= 100:
-                st.error(f"🚨 **Budget Alert:** You've exceeded your overall budget by {format_robux(abs(overall_remaining))}!")
-            elif overall_percentage >= st.session_state.budget_threshold:
-                st.warning(f"⚠️ **Budget Warning:** You've used {overall_percentage:.1f}% of your overall budget. {format_robux(overall_remaining)} remaining.")
+    total_spent = view.total
+    
+    budgets = []
+    if st.session_state.overall_budget:
+        budgets.append(Budget('Overall Budget', st.session_state.overall_budget, 'overall'))
+    if st.session_state.monthly_budget:
+        budgets.append(Budget('Monthly Budget', st.session_state.monthly_budget, 'monthly'))
+    budgets.extend(st.session_state.custom_budgets)
+    persist_budgets(budgets)
+    
+    if budgets:
+        today = datetime.now().date()
+        budget_daily = view.daily_frame()
+        budget_forecast = get_forecast(view.monthly_series())
+        budget_results = evaluate_budgets(
+            budget_daily,
+            budgets,
+            as_of=today,
+            daily_rate=estimate_daily_rate(budget_daily, today, budget_forecast),
+            threshold=st.session_state.budget_threshold
+        )
         
-        if st.session_state.monthly_budget:
-            monthly_percentage = (monthly_spending / st.session_state.monthly_budget * 100) if st.session_state.monthly_budget > 0 else 0
-            monthly_remaining = st.session_state.monthly_budget - monthly_spending
-            
-            if monthly_percentage < st.session_state.budget_threshold:
-                monthly_color = "#10b981"
-                monthly_status = "On Track"
-                monthly_icon = "✅"
-            elif monthly_percentage < 100:
-                monthly_color = "#f59e0b"
-                monthly_status = "Approaching Limit"
-                monthly_icon = "⚠️"
+        for budget, result in zip(budgets, budget_results.itertuples(index=False)):
+            if budget.name == 'Overall Budget' and budget.kind == 'overall' and not budget.category and not budget.item:
+                render_budget_card("💎 Overall Budget Status", "Budget", "overall budget", result)
+            elif budget.name == 'Monthly Budget' and budget.kind == 'monthly' and not budget.category and not budget.item:
+                render_budget_card("📅 Monthly Budget Status (Current Month)", "Monthly Budget", "monthly budget", result)
             else:
-                monthly_color = "#ef4444"
-                monthly_status = "Budget Exceeded"
-                monthly_icon = "🚨"
-            
-            st.markdown(f"""
-            <div style="background-color: #1a1a1a; border-radius: 12px; padding: 20px; border: 2px solid {monthly_color}; margin-bottom: 16px;">
-                <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 12px;">
-                    <div>
-                        <div style="color: #a0a0a0; font-size: 14px;">📅 Monthly Budget Status (Current Month)</div>
-                        <div style="color: #ffffff; font-size: 24px; font-weight: bold; margin-top: 4px;">{format_robux(monthly_spending)} / {format_robux(st.session_state.monthly_budget)}</div>
-                    </div>
-                    <div style="text-align: right;">
-                        <div style="color: {monthly_color}; font-size: 18px; font-weight: bold;">{monthly_icon} {monthly_status}</div>
-                        <div style="color: #a0a0a0; font-size: 14px; margin-top: 4px;">{monthly_percentage:.1f}% used</div>
-                    </div>
-                </div>
-                <div style="background-color: #2a2a2a; border-radius: 8px; height: 24px; overflow: hidden;">
-                    <div style="background: linear-gradient(90deg, {monthly_color}, {monthly_color}); height: 100%; width: {min(monthly_percentage, 100):.1f}%; transition: width 0.3s ease;"></div>
-                </div>
-                <div style="margin-top: 8px; color: #a0a0a0; font-size: 13px;">
-                    {'Remaining: ' + format_robux(monthly_remaining) if monthly_remaining > 0 else 'Over budget by: ' + format_robux(abs(monthly_remaining))}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            if monthly_percentage >= 100:
-                st.error(f"🚨 **Monthly Budget Alert:** You've exceeded your monthly budget by {format_robux(abs(monthly_remaining))}!")
-            elif monthly_percentage >= st.session_state.budget_threshold:
-                st.warning(f"⚠️ **Monthly Budget Warning:** You've used {monthly_percentage:.1f}% of your monthly budget. {format_robux(monthly_remaining)} remaining.")
+                period = f"last {budget.window_days} days" if budget.kind == 'rolling' else BUDGET_KIND_LABELS[budget.kind]
+                render_budget_card(
+                    f"🎯 {html.escape(budget.name)} • {html.escape(budget.scope)} • {period}",
+                    budget.name,
+                    f"{budget.name} budget",
+                    result
+                )
     
     col1, col2 = st.columns(2)
     
@@ -755,7 +1349,7 @@ else:
         """, unsafe_allow_html=True)
     
     with col2:
-        transaction_count = len(df)
+        transaction_count = view.count
         st.markdown(f"""
         <div style="background-color: #1a1a1a; border-radius: 12px; padding: 24px; border: 1px solid #2a2a2a;">
             <div style="color: #a0a0a0; font-size: 14px; margin-bottom: 8px;">💳 Transaction Count</div>
@@ -764,49 +1358,98 @@ else:
         </div>
         """, unsafe_allow_html=True)
     
+    if has_income:
+        flows = transactions.to_dataframe()
+        flows = flows[day_range_mask(flows, st.session_state.date_range_start, st.session_state.date_range_end)]
+        net_flow = net_flow_series(flows)
+        total_income = int(net_flow['income'].sum())
+        net_total = int(net_flow['net'].sum())
+        
+        st.markdown("## 💱 Income vs Spending")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.markdown(f"""
+            <div style="background-color: #1a1a1a; border-radius: 12px; padding: 24px; border: 1px solid #2a2a2a;">
+                <div style="color: #a0a0a0; font-size: 14px; margin-bottom: 8px;">💰 Robux Earned</div>
+                <div style="color: #10b981; font-size: 36px; font-weight: bold;">{format_robux(total_income)}</div>
+                <div style="color: #666; font-size: 12px; margin-top: 4px;">Sales, payouts, stipends and trades</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col2:
+            st.markdown(f"""
+            <div style="background-color: #1a1a1a; border-radius: 12px; padding: 24px; border: 1px solid #2a2a2a;">
+                <div style="color: #a0a0a0; font-size: 14px; margin-bottom: 8px;">💎 Robux Spent</div>
+                <div style="color: #8b5cf6; font-size: 36px; font-weight: bold;">{format_robux(int(net_flow['spending'].sum()))}</div>
+                <div style="color: #666; font-size: 12px; margin-top: 4px;">Purchases and outgoing trades</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col3:
+            net_color = '#10b981' if net_total >= 0 else '#ef4444'
+            net_sign = '+' if net_total > 0 else '-' if net_total < 0 else ''
+            st.markdown(f"""
+            <div style="background-color: #1a1a1a; border-radius: 12px; padding: 24px; border: 1px solid #2a2a2a;">
+                <div style="color: #a0a0a0; font-size: 14px; margin-bottom: 8px;">⚖️ Net Flow</div>
+                <div style="color: {net_color}; font-size: 36px; font-weight: bold;">{net_sign}{format_robux(abs(net_total))}</div>
+                <div style="color: #666; font-size: 12px; margin-top: 4px;">Earned minus spent</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        if len(net_flow) > 0:
+            st.plotly_chart(create_net_flow_chart(net_flow), use_container_width=True)
+        
+        income_by_type = flows[flows['direction'] > 0].groupby('transaction_type', observed=True)['amount'].agg(['sum', 'count'])
+        if len(income_by_type) > 0:
+            income_by_type = income_by_type.sort_values('sum', ascending=False)
+            st.dataframe(
+                pd.DataFrame({
+                    'SOURCE': income_by_type.index.astype(str),
+                    'EARNED': [format_robux(v) for v in income_by_type['sum']],
+                    'TRANSACTIONS': income_by_type['count'].values,
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+    
     st.markdown("<br>", unsafe_allow_html=True)
     
     col1, col2 = st.columns([1, 1])
     
     with col1:
         st.markdown("### Spending by Category")
-        fig_category = create_spending_chart(df)
+        fig_category = create_spending_chart(category_totals)
         st.plotly_chart(fig_category, use_container_width=True)
     
     with col2:
         st.markdown("### Top Games")
-        game_spending = df.groupby('item').agg({
-            'amount': ['sum', 'count']
-        }).reset_index()
+        game_spending = top_items.head(5).copy()
         game_spending.columns = ['game', 'total_spent', 'purchases']
-        game_spending = game_spending.sort_values('total_spent', ascending=False).head(5)
         
-        total_all_games = df['amount'].sum()
+        total_all_games = view.total
         
-        for idx, row in game_spending.iterrows():
-            percentage = (row['total_spent'] / total_all_games * 100)
-            st.markdown(f"""
-            <div class="game-card">
-                <div style="display: flex; justify-content: space-between; align-items: center;">
-                    <div>
-                        <div style="color: #ffffff; font-weight: 600;">{row['game'][:40]}</div>
-                        <div style="color: #666; font-size: 12px;">{int(row['purchases'])} purchases</div>
-                    </div>
-                    <div style="text-align: right;">
-                        <div style="color: #8b5cf6; font-size: 18px; font-weight: bold;">{format_robux(row['total_spent'])}</div>
-                        <div style="color: #666; font-size: 12px;">{percentage:.1f}% of total</div>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        render_card_list(
+            CARD_TEMPLATE,
+            game_spending['game'].tolist(),
+            [format_robux(amount) for amount in game_spending['total_spent']],
+            subtitles=[f"{int(count)} purchases" for count in game_spending['purchases']],
+            notes=[f"{p:.1f}% of total" for p in percentages(game_spending['total_spent'], total_all_games)],
+            title_length=40
+        )
         
         if len(game_spending) == 5:
-            st.markdown(f'<div style="text-align: center; color: #666; margin-top: 12px; cursor: pointer;">View All Games ({df["item"].nunique()})</div>', unsafe_allow_html=True)
+            with st.expander(f"View All Games ({item_count})"):
+                render_item_pages(view, 'games_page')
     
     st.markdown("<br>", unsafe_allow_html=True)
     
     st.markdown("## Recent Transactions")
     
+    if rows_pending:
+        df = load_date_range(df, history, st.session_state.date_range_start, st.session_state.date_range_end)
+    
     col1, col2 = st.columns([3, 1])
     with col1:
         category_filter = st.multiselect(
@@ -819,14 +1462,15 @@ else:
     
     export_col1, export_col2, export_col3 = st.columns([1, 1, 3])
     
+    # The rows follow from the store version and the filters on screen, so
+    # the export cache is keyed on those rather than on the rows themselves.
+    export_key = (
+        transactions.version, st.session_state.date_range_start, st.session_state.date_range_end,
+        search_query, frozenset(category_filter)
+    )
+    
     with export_col1:
-        csv_df = df_filtered.copy()
-        csv_df['DATE'] = csv_df['date'].dt.strftime('%B %d, %Y')
-        csv_df['ITEM'] = csv_df['item']
-        csv_df['CATEGORY'] = csv_df['category']
-        csv_df['SOURCE'] = csv_df['type']
-        csv_df['AMOUNT'] = csv_df['amount'].apply(lambda x: f"-{int(x)} R$")
-        csv_export = csv_df[['DATE', 'ITEM', 'CATEGORY', 'SOURCE', 'AMOUNT']].to_csv(index=False)
+        csv_export = run_analytics('export_csv', export_key, transactions_csv, df_filtered, size=len(df_filtered))
         
         st.download_button(
             label="📥 Export CSV",
@@ -837,10 +1481,7 @@ else:
         )
     
     with export_col2:
-        json_df = df_filtered.copy()
-        json_df['date'] = json_df['date'].dt.strftime('%B %d, %Y')
-        json_data = json_df.to_dict(orient='records')
-        json_export = json.dumps(json_data, indent=2)
+        json_export = run_analytics('export_json', export_key, transactions_json, df_filtered, size=len(df_filtered))
         
         st.download_button(
             label="📥 Export JSON",
@@ -860,7 +1501,7 @@ else:
     end_idx = min(start_idx + items_per_page, len(df_filtered))
     
     display_df = df_filtered.iloc[start_idx:end_idx].copy()
-    display_df['formatted_date'] = display_df['date'].dt.strftime('%B %d, %Y')
+    display_df['formatted_date'] = format_days(display_df)
     display_df['formatted_amount'] = display_df['amount'].apply(lambda x: f"-{int(x)} R$")
     
     table_df = display_df[['formatted_date', 'item', 'category', 'type', 'formatted_amount']].copy()
@@ -896,33 +1537,20 @@ else:
     tab1, tab2, tab3 = st.tabs(["All", "Players", "Groups"])
     
     with tab1:
-        top_items = df.groupby('item')['amount'].sum().sort_values(ascending=False).head(10).reset_index()
-        
-        for idx, row in top_items.iterrows():
-            item_transactions = len(df[df['item'] == row['item']])
-            percentage = (row['amount'] / total_spent * 100)
-            
-            st.markdown(f"""
-            <div class="game-card">
-                <div style="display: flex; justify-content: space-between; align-items: center;">
-                    <div style="flex: 1;">
-                        <div style="color: #ffffff; font-weight: 600; margin-bottom: 4px;">{row['item'][:50]}</div>
-                        <div style="color: #666; font-size: 12px;">{item_transactions} transactions</div>
-                    </div>
-                    <div style="text-align: right;">
-                        <div style="color: #8b5cf6; font-size: 18px; font-weight: bold;">{format_robux(row['amount'])}</div>
-                        <div style="color: #666; font-size: 12px;">{percentage:.1f}%</div>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        render_card_list(
+            CARD_TEMPLATE,
+            top_items['item'].tolist(),
+            [format_robux(amount) for amount in top_items['amount']],
+            subtitles=[f"{count} transactions" for count in top_items['count']],
+            notes=[f"{p:.1f}%" for p in percentages(top_items['amount'], total_spent)],
+            title_length=50
+        )
         
-        st.markdown(f'<div style="text-align: center; color: #666; margin-top: 12px;">View All {df["item"].nunique()} Recipients</div>', unsafe_allow_html=True)
+        with st.expander(f"View All {item_count} Recipients"):
+            render_item_pages(view, 'recipients_page')
     
     with tab2:
-        df_sorted = df.sort_values('date')
-        df_sorted['month'] = df_sorted['date'].dt.to_period('M').astype(str)
-        monthly_spending = df_sorted.groupby('month')['amount'].sum().reset_index()
+        monthly_spending = view.monthly_series()
         
         if len(monthly_spending) > 0:
             st.markdown("### Spending Trend Over Time")
@@ -982,7 +1610,7 @@ else:
             st.markdown("### 🔮 Spending Forecast")
             st.markdown("Predictive analytics based on your historical spending patterns.")
             
-            forecast_result = forecast_spending(monthly_spending, months_to_forecast=6)
+            forecast_result = get_forecast(monthly_spending)
             
             if forecast_result is None:
                 st.info("📊 Insufficient data for forecasting. You need at least 2 months of transaction history to generate predictions.")
@@ -1056,7 +1684,7 @@ else:
                                     {forecast_result['confidence']}
                                 </div>
                                 <div style="color: #666; font-size: 12px; margin-top: 4px;">
-                                    Variability: {forecast_result['variability']:.1f}%
+                                    {forecast_result['model_label']} • Backtest error: {forecast_result['variability']:.1f}%
                                 </div>
                             </div>
                         </div>
@@ -1072,7 +1700,7 @@ else:
                 <div style="background-color: #1a1a1a; border-left: 4px solid #f59e0b; padding: 12px 16px; border-radius: 4px; margin-top: 16px;">
                     <div style="color: #f59e0b; font-weight: 600; margin-bottom: 4px;">⚠️ Disclaimer</div>
                     <div style="color: #a0a0a0; font-size: 13px;">
-                        Predictions are based on historical spending patterns using linear regression. Actual spending may vary due to changing habits, special events, or other factors. Use these forecasts as guidance, not guarantees.
+                        Predictions come from whichever model (linear trend, Holt-Winters or a seasonal naive baseline) best predicted your past months in backtests; the shaded band is an 80% prediction interval. Actual spending may vary due to changing habits, special events, or other factors. Use these forecasts as guidance, not guarantees.
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
@@ -1080,34 +1708,24 @@ else:
             st.markdown('<div style="text-align: center; color: #666; padding: 40px; background-color: #1a1a1a; border-radius: 8px;">No data available for spending trends.</div>', unsafe_allow_html=True)
     
     with tab3:
-        game_category_df = df[df['category'] == 'Game']
+        game_breakdown = breakdown[breakdown['category'] == 'Game']
         
-        if len(game_category_df) > 0:
+        if len(game_breakdown) > 0:
             st.markdown("### Game Purchases Analysis")
             
-            game_type_spending = game_category_df.groupby('type')['amount'].sum().reset_index()
-            game_type_spending = game_type_spending.sort_values('amount', ascending=False)
+            game_type_spending = game_breakdown.groupby('type', sort=False)[['amount', 'count']].sum().reset_index()
+            game_type_spending = game_type_spending.sort_values('amount', ascending=False, kind='stable')
             
             total_game_spending = game_type_spending['amount'].sum()
+            game_purchase_count = game_type_spending['count'].sum()
             
-            for idx, row in game_type_spending.iterrows():
-                percentage = (row['amount'] / total_game_spending * 100) if total_game_spending > 0 else 0
-                transaction_count = len(game_category_df[game_category_df['type'] == row['type']])
-                
-                st.markdown(f"""
-                <div class="game-card">
-                    <div style="display: flex; justify-content: space-between; align-items: center;">
-                        <div style="flex: 1;">
-                            <div style="color: #ffffff; font-weight: 600; margin-bottom: 4px;">{row['type']}</div>
-                            <div style="color: #666; font-size: 12px;">{transaction_count} purchases</div>
-                        </div>
-                        <div style="text-align: right;">
-                            <div style="color: #8b5cf6; font-size: 18px; font-weight: bold;">{format_robux(row['amount'])}</div>
-                            <div style="color: #666; font-size: 12px;">{percentage:.1f}%</div>
-                        </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            render_card_list(
+                CARD_TEMPLATE,
+                game_type_spending['type'].tolist(),
+                [format_robux(amount) for amount in game_type_spending['amount']],
+                subtitles=[f"{count} purchases" for count in game_type_spending['count']],
+                notes=[f"{p:.1f}%" for p in percentages(game_type_spending['amount'], total_game_spending)]
+            )
             
             col1, col2 = st.columns(2)
             with col1:
@@ -1119,7 +1737,7 @@ else:
                 """, unsafe_allow_html=True)
             
             with col2:
-                avg_game_purchase = total_game_spending / len(game_category_df) if len(game_category_df) > 0 else 0
+                avg_game_purchase = total_game_spending / game_purchase_count if game_purchase_count > 0 else 0
                 st.markdown(f"""
                 <div style="background-color: #1a1a1a; border-radius: 8px; padding: 16px; border: 1px solid #2a2a2a;">
                     <div style="color: #a0a0a0; font-size: 14px;">Avg per Game Purchase</div>
@@ -1127,28 +1745,17 @@ else:
                 </div>
                 """, unsafe_allow_html=True)
         else:
-            non_game_types = df['category'].value_counts().head(5)
+            non_game_types = category_totals.sort_values('count', ascending=False, kind='stable').head(5)
             
             st.markdown("### Spending by Category Type")
             
-            for category, count in non_game_types.items():
-                category_amount = df[df['category'] == category]['amount'].sum()
-                percentage = (category_amount / total_spent * 100) if total_spent > 0 else 0
-                
-                st.markdown(f"""
-                <div class="game-card">
-                    <div style="display: flex; justify-content: space-between; align-items: center;">
-                        <div style="flex: 1;">
-                            <div style="color: #ffffff; font-weight: 600; margin-bottom: 4px;">{category}</div>
-                            <div style="color: #666; font-size: 12px;">{count} transactions</div>
-                        </div>
-                        <div style="text-align: right;">
-                            <div style="color: #8b5cf6; font-size: 18px; font-weight: bold;">{format_robux(category_amount)}</div>
-                            <div style="color: #666; font-size: 12px;">{percentage:.1f}%</div>
-                        </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            render_card_list(
+                CARD_TEMPLATE,
+                non_game_types['category'].tolist(),
+                [format_robux(amount) for amount in non_game_types['amount']],
+                subtitles=[f"{count} transactions" for count in non_game_types['count']],
+                notes=[f"{p:.1f}%" for p in percentages(non_game_types['amount'], total_spent)]
+            )
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -1156,30 +1763,24 @@ else:
     
     with col1:
         st.markdown("## Spending Distribution")
-        fig_dist = create_distribution_chart(df)
+        fig_dist = create_distribution_chart(category_totals)
         st.plotly_chart(fig_dist, use_container_width=True)
         
-        category_totals = df.groupby('category')['amount'].sum().sort_values(ascending=False)
-        for category, amount in category_totals.items():
-            percentage = (amount / total_spent * 100)
-            st.markdown(f"""
-            <div style="display: flex; justify-content: space-between; padding: 8px 0; border-bottom: 1px solid #2a2a2a;">
-                <div style="color: #a0a0a0;">● {category}</div>
-                <div>
-                    <span style="color: #ffffff; font-weight: 600;">{format_robux(amount)}</span>
-                    <span style="color: #666; margin-left: 12px;">{percentage:.1f}% of total</span>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        render_card_list(
+            LEGEND_ROW_TEMPLATE,
+            category_totals['category'].tolist(),
+            [format_robux(amount) for amount in category_totals['amount']],
+            notes=[f"{p:.1f}% of total" for p in percentages(category_totals['amount'], total_spent)]
+        )
     
     with col2:
         st.markdown("## Cosmetics Breakdown")
         
-        cosmetics_df = df[df['category'] == 'Cosmetics']
+        cosmetics_breakdown = breakdown[breakdown['category'] == 'Cosmetics']
         
-        if len(cosmetics_df) > 0:
-            cosmetics_total = cosmetics_df['amount'].sum()
-            cosmetics_count = len(cosmetics_df)
+        if len(cosmetics_breakdown) > 0:
+            cosmetics_total = cosmetics_breakdown['amount'].sum()
+            cosmetics_count = cosmetics_breakdown['count'].sum()
             
             st.markdown(f"""
             <div style="background-color: #1a1a1a; border-radius: 12px; padding: 24px; border: 1px solid #2a2a2a; margin-bottom: 20px;">
@@ -1189,15 +1790,14 @@ else:
             </div>
             """, unsafe_allow_html=True)
             
-            top_cosmetics = cosmetics_df.groupby('item')['amount'].sum().sort_values(ascending=False).head(5)
+            top_cosmetics = cosmetics_breakdown.groupby('item', sort=False)['amount'].sum().nlargest(5)
             
-            for item, amount in top_cosmetics.items():
-                st.markdown(f"""
-                <div style="display: flex; justify-content: space-between; padding: 12px 0; border-bottom: 1px solid #2a2a2a;">
-                    <div style="color: #ffffff;">{item[:35]}</div>
-                    <div style="color: #8b5cf6; font-weight: 600;">{format_robux(amount)}</div>
-                </div>
-                """, unsafe_allow_html=True)
+            render_card_list(
+                VALUE_ROW_TEMPLATE,
+                top_cosmetics.index.tolist(),
+                [format_robux(amount) for amount in top_cosmetics.values],
+                title_length=35
+            )
         else:
             st.markdown('<div style="text-align: center; color: #666; padding: 60px 20px; background-color: #1a1a1a; border-radius: 12px;">No cosmetic purchases found</div>', unsafe_allow_html=True)
     
@@ -1215,12 +1815,8 @@ else:
     
     st.markdown("<br>", unsafe_allow_html=True)
     
-    df_sorted = df.sort_values('date')
-    df_sorted['month'] = df_sorted['date'].dt.to_period('M')
-    df_sorted['week'] = df_sorted['date'].dt.to_period('W')
-    
     if comparison_mode == "Month vs Month":
-        available_months = sorted(df_sorted['month'].unique(), reverse=True)
+        available_months = sorted(view.monthly_series()['month'], reverse=True)
         
         if len(available_months) < 2:
             st.info("📊 Not enough data for month comparison. You need transactions from at least 2 different months.")
@@ -1245,16 +1841,16 @@ else:
                 )
             
             if month1 and month2:
-                df_month1 = df_sorted[df_sorted['month'] == pd.Period(month1)]
-                df_month2 = df_sorted[df_sorted['month'] == pd.Period(month2)]
+                view_month1 = period_view(df, history, viewed_user_ids, *period_bounds(pd.Period(month1, freq='M')), use_sql=search_matches is None)
+                view_month2 = period_view(df, history, viewed_user_ids, *period_bounds(pd.Period(month2, freq='M')), use_sql=search_matches is None)
                 
-                if len(df_month1) == 0 or len(df_month2) == 0:
+                if view_month1.count == 0 or view_month2.count == 0:
                     st.warning("⚠️ One or both selected months have no transaction data.")
                 else:
-                    total1 = df_month1['amount'].sum()
-                    total2 = df_month2['amount'].sum()
-                    count1 = len(df_month1)
-                    count2 = len(df_month2)
+                    total1 = view_month1.total
+                    total2 = view_month2.total
+                    count1 = view_month1.count
+                    count2 = view_month2.count
                     avg1 = total1 / count1 if count1 > 0 else 0
                     avg2 = total2 / count2 if count2 > 0 else 0
                     
@@ -1344,11 +1940,11 @@ else:
                     st.markdown("<br>", unsafe_allow_html=True)
                     st.markdown("### Spending by Category Comparison")
                     
-                    fig_comparison = create_comparison_chart(df_month1, df_month2, month1, month2)
+                    fig_comparison = create_comparison_chart(view_month1.totals('category'), view_month2.totals('category'), month1, month2)
                     st.plotly_chart(fig_comparison, use_container_width=True)
     
     elif comparison_mode == "Week vs Week":
-        available_weeks = sorted(df_sorted['week'].unique(), reverse=True)
+        available_weeks = sorted(pd.PeriodIndex(view.daily_series()['date'], freq='W').unique(), reverse=True)
         
         if len(available_weeks) < 2:
             st.info("📊 Not enough data for week comparison. You need transactions from at least 2 different weeks.")
@@ -1373,16 +1969,16 @@ else:
                 )
             
             if week1 and week2:
-                df_week1 = df_sorted[df_sorted['week'] == pd.Period(week1)]
-                df_week2 = df_sorted[df_sorted['week'] == pd.Period(week2)]
+                view_week1 = period_view(df, history, viewed_user_ids, *period_bounds(pd.Period(week1, freq='W')), use_sql=search_matches is None)
+                view_week2 = period_view(df, history, viewed_user_ids, *period_bounds(pd.Period(week2, freq='W')), use_sql=search_matches is None)
                 
-                if len(df_week1) == 0 or len(df_week2) == 0:
+                if view_week1.count == 0 or view_week2.count == 0:
                     st.warning("⚠️ One or both selected weeks have no transaction data.")
                 else:
-                    total1 = df_week1['amount'].sum()
-                    total2 = df_week2['amount'].sum()
-                    count1 = len(df_week1)
-                    count2 = len(df_week2)
+                    total1 = view_week1.total
+                    total2 = view_week2.total
+                    count1 = view_week1.count
+                    count2 = view_week2.count
                     avg1 = total1 / count1 if count1 > 0 else 0
                     avg2 = total2 / count2 if count2 > 0 else 0
                     
@@ -1472,7 +2068,7 @@ else:
                     st.markdown("<br>", unsafe_allow_html=True)
                     st.markdown("### Spending by Category Comparison")
                     
-                    fig_comparison = create_comparison_chart(df_week1, df_week2, week1, week2)
+                    fig_comparison = create_comparison_chart(view_week1.totals('category'), view_week2.totals('category'), week1, week2)
                     st.plotly_chart(fig_comparison, use_container_width=True)
     
     else:
@@ -1527,16 +2123,16 @@ else:
         elif period2_start > period2_end:
             st.error("⚠️ Period 2: Start date must be before end date.")
         else:
-            df_period1 = df[(df['date'].dt.date >= period1_start) & (df['date'].dt.date <= period1_end)]
-            df_period2 = df[(df['date'].dt.date >= period2_start) & (df['date'].dt.date <= period2_end)]
+            view_period1 = period_view(df, history, viewed_user_ids, max(period1_start, st.session_state.date_range_start), min(period1_end, st.session_state.date_range_end), use_sql=search_matches is None)
+            view_period2 = period_view(df, history, viewed_user_ids, max(period2_start, st.session_state.date_range_start), min(period2_end, st.session_state.date_range_end), use_sql=search_matches is None)
             
-            if len(df_period1) == 0 or len(df_period2) == 0:
+            if view_period1.count == 0 or view_period2.count == 0:
                 st.warning("⚠️ One or both selected periods have no transaction data. Please adjust your date ranges.")
             else:
-                total1 = df_period1['amount'].sum()
-                total2 = df_period2['amount'].sum()
-                count1 = len(df_period1)
-                count2 = len(df_period2)
+                total1 = view_period1.total
+                total2 = view_period2.total
+                count1 = view_period1.count
+                count2 = view_period2.count
                 avg1 = total1 / count1 if count1 > 0 else 0
                 avg2 = total2 / count2 if count2 > 0 else 0
                 
@@ -1630,7 +2226,7 @@ else:
                 st.markdown("<br>", unsafe_allow_html=True)
                 st.markdown("### Spending by Category Comparison")
                 
-                fig_comparison = create_comparison_chart(df_period1, df_period2, period1_label, period2_label)
+                fig_comparison = create_comparison_chart(view_period1.totals('category'), view_period2.totals('category'), period1_label, period2_label)
                 st.plotly_chart(fig_comparison, use_container_width=True)
     
     st.markdown("<br><br>", unsafe_allow_html=True)
@@ -0,0 +1,53 @@
+import threading
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple
+
+# Runs one fetch at a time off the Streamlit script thread and hands the result
+# back as a single (data, fetched_at) tuple so it can be swapped in atomically.
+class BackgroundRefresher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._result: Optional[Tuple[Any, datetime]] = None
+        self._error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+
+    def is_running(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def start(self, fetch: Callable[[], Optional[Any]]) -> bool:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._error = None
+            self.started_at = datetime.now()
+            self._thread = threading.Thread(target=self._run, args=(fetch,), daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, fetch: Callable[[], Optional[Any]]):
+        try:
+            data = fetch()
+        except Exception as e:
+            print(f"Error refreshing transactions: {e}")
+            data = None
+        with self._lock:
+            if data is not None:
+                self._result = (data, datetime.now())
+            else:
+                self._error = "Unable to refresh transactions."
+
+    def has_result(self) -> bool:
+        with self._lock:
+            return self._result is not None
+
+    def take_result(self) -> Optional[Tuple[Any, datetime]]:
+        with self._lock:
+            result, self._result = self._result, None
+            return result
+
+    def take_error(self) -> Optional[str]:
+        with self._lock:
+            error, self._error = self._error, None
+            return error
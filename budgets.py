@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+from dataclasses import dataclass, asdict, fields
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from aggregates import aggregate_daily
+from forecasting import forecast_spending, monthly_spending_series
+from history_files import load_user_history
+
+BUDGET_KINDS = ('overall', 'monthly', 'weekly', 'rolling')
+AVERAGE_DAYS_PER_MONTH = 30.44
+RECENT_RATE_DAYS = 30
+MAX_PROJECTION_DAYS = 5 * 366
+
+RESULT_COLUMNS = [
+    'name', 'kind', 'category', 'item', 'window_days', 'limit', 'spent', 'remaining',
+    'percentage', 'status', 'projected_breach'
+]
+
+@dataclass
+class Budget:
+    name: str
+    limit: float
+    kind: str = 'overall'
+    category: Optional[str] = None
+    item: Optional[str] = None
+    window_days: int = 30
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Budget':
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @property
+    def scope(self) -> str:
+        if self.item:
+            return self.item
+        if self.category:
+            return self.category
+        return 'All spending'
+
+def _epoch_day(value) -> int:
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+def budget_windows(budgets: List[Budget], as_of: date):
+    # Inclusive [start, end] day numbers for the current period of every budget,
+    # plus the last day of that period for breach projection (int64 max = open-ended).
+    today = _epoch_day(as_of)
+    month_start = _epoch_day(as_of.replace(day=1))
+    month_end = _epoch_day((pd.Timestamp(as_of) + pd.offsets.MonthEnd(0)).date())
+    week_start = today - as_of.weekday()
+
+    kinds = np.array([b.kind for b in budgets])
+    window_days = np.array([max(1, int(b.window_days or 1)) for b in budgets], dtype=np.int64)
+
+    start = np.select(
+        [kinds == 'monthly', kinds == 'weekly', kinds == 'rolling'],
+        [month_start, week_start, today - window_days + 1],
+        np.iinfo(np.int64).min
+    )
+    end = np.full(len(budgets), today, dtype=np.int64)
+    period_end = np.select(
+        [kinds == 'monthly', kinds == 'weekly', kinds == 'rolling'],
+        [month_end, week_start + 6, today + window_days],
+        np.iinfo(np.int64).max
+    )
+    return start, end, period_end
+
+def _match_codes(values: pd.Series, targets: List[Optional[str]]):
+    codes, uniques = pd.factorize(values.astype(str))
+    lookup = {value: code for code, value in enumerate(uniques)}
+    # -1 matches everything, -2 matches nothing (unknown category/item).
+    wanted = np.array([-1 if not t else lookup.get(t, -2) for t in targets], dtype=np.int64)
+    return codes, wanted
+
+def estimate_daily_rate(daily: pd.DataFrame, as_of: date, forecast: Optional[Dict] = None) -> float:
+    if forecast is not None:
+        return float(forecast['future_spending'][0]) / AVERAGE_DAYS_PER_MONTH
+    recent = daily['day'].values >= _epoch_day(as_of) - (RECENT_RATE_DAYS - 1)
+    return float(daily['amount'].values[recent].sum()) / RECENT_RATE_DAYS
+
+def evaluate_budgets(daily: pd.DataFrame, budgets: List[Budget], as_of: Optional[date] = None,
+                     daily_rate: Optional[float] = None, threshold: float = 80) -> pd.DataFrame:
+    # daily is the (day, category, item, amount) series from aggregate_daily()
+    # or RunningAggregates.daily_frame().
+    if not budgets:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    as_of = as_of or datetime.now().date()
+    if daily_rate is None:
+        daily_rate = estimate_daily_rate(daily, as_of)
+
+    days = daily['day'].values
+    amounts = daily['amount'].values.astype(np.float64)
+    category_codes, wanted_categories = _match_codes(daily['category'], [b.category for b in budgets])
+    item_codes, wanted_items = _match_codes(daily['item'], [b.item for b in budgets])
+    start, end, period_end = budget_windows(budgets, as_of)
+
+    # One (budgets x aggregated rows) mask answers every budget at once.
+    scope = ((wanted_categories[:, None] == -1) | (category_codes[None, :] == wanted_categories[:, None]))
+    scope &= ((wanted_items[:, None] == -1) | (item_codes[None, :] == wanted_items[:, None]))
+    in_window = (days[None, :] >= start[:, None]) & (days[None, :] <= end[:, None])
+
+    spent = (scope & in_window) @ amounts
+    scope_total = scope @ amounts
+    total = amounts.sum()
+    share = np.divide(scope_total, total, out=np.zeros(len(budgets)), where=total > 0)
+
+    limits = np.array([float(b.limit) for b in budgets])
+    remaining = limits - spent
+    percentage = np.divide(spent * 100, limits, out=np.zeros(len(budgets)), where=limits > 0)
+    status = np.select(
+        [percentage >= 100, percentage >= threshold],
+        ['Budget Exceeded', 'Approaching Limit'],
+        'On Track'
+    )
+
+    scoped_rate = daily_rate * share
+    can_breach = (remaining > 0) & (scoped_rate > 0)
+    days_to_breach = np.ceil(np.divide(remaining, scoped_rate, out=np.full(len(budgets), np.inf), where=can_breach))
+    can_breach &= days_to_breach <= MAX_PROJECTION_DAYS
+    breach_day = _epoch_day(as_of) + np.where(can_breach, days_to_breach, 0)
+    breach_day = np.where(can_breach & (breach_day <= period_end), breach_day, np.nan)
+    projected_breach = pd.to_datetime(breach_day, unit='D')
+
+    return pd.DataFrame({
+        'name': [b.name for b in budgets],
+        'kind': [b.kind for b in budgets],
+        'category': [b.category for b in budgets],
+        'item': [b.item for b in budgets],
+        'window_days': [b.window_days for b in budgets],
+        'limit': limits,
+        'spent': spent,
+        'remaining': remaining,
+        'percentage': percentage,
+        'status': status,
+        'projected_breach': projected_breach,
+    })
+
+def budgets_path(data_dir: str, user_id) -> str:
+    return os.path.join(data_dir, f'{user_id}.budgets.json')
+
+def save_budgets(data_dir: str, user_id, budgets: List[Budget], threshold: float = 80):
+    path = budgets_path(data_dir, user_id)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'threshold': threshold, 'budgets': [b.to_dict() for b in budgets]}, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_budgets(data_dir: str, user_id):
+    path = budgets_path(data_dir, user_id)
+    if not os.path.exists(path):
+        return [], 80
+    with open(path) as f:
+        data = json.load(f)
+    return [Budget.from_dict(b) for b in data.get('budgets', [])], data.get('threshold', 80)
+
+def evaluate_user(data_dir: str, user_id, as_of: Optional[date] = None) -> Optional[pd.DataFrame]:
+    budgets, threshold = load_budgets(data_dir, user_id)
+    store = load_user_history(data_dir, user_id)
+    if not budgets or store is None or len(store) == 0:
+        return None
+
+    as_of = as_of or datetime.now().date()
+    df = store.to_dataframe(spending_only=True)
+    daily = aggregate_daily(df)
+    forecast = forecast_spending(monthly_spending_series(df), months_to_forecast=1, observed_through=as_of)
+    results = evaluate_budgets(daily, budgets, as_of, estimate_daily_rate(daily, as_of, forecast), threshold)
+    results.insert(0, 'user_id', user_id)
+    return results
+
+def run_batch(data_dir: str, as_of: Optional[date] = None, alerts_only: bool = False) -> pd.DataFrame:
+    suffix = '.budgets.json'
+    user_ids = sorted(name[:-len(suffix)] for name in os.listdir(data_dir) if name.endswith(suffix))
+
+    frames = []
+    for user_id in user_ids:
+        try:
+            results = evaluate_user(data_dir, user_id, as_of)
+        except Exception as e:
+            print(f"Error evaluating budgets for {user_id}: {e}")
+            continue
+        if results is not None:
+            frames.append(results)
+
+    if not frames:
+        return pd.DataFrame(columns=['user_id'] + RESULT_COLUMNS)
+    results = pd.concat(frames, ignore_index=True)
+    if alerts_only:
+        results = results[(results['status'] != 'On Track') | results['projected_breach'].notna()]
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Check saved budgets for every user in a data directory.')
+    parser.add_argument('--data-dir', default=os.environ.get('TRANSACTION_DATA_DIR', 'data'))
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None, help='Evaluation date (YYYY-MM-DD)')
+    parser.add_argument('--alerts-only', action='store_true', help='Only report budgets that are at risk')
+    parser.add_argument('--output', default=None, help='Write results to this CSV file instead of stdout')
+    args = parser.parse_args()
+
+    results = run_batch(args.data_dir, args.as_of, args.alerts_only)
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"Wrote {len(results)} budget results for {results['user_id'].nunique()} users to {args.output}")
+    else:
+        print(results.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
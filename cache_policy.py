@@ -0,0 +1,167 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+DATA_CLASSES = ('identity', 'transactions', 'game_details', 'aggregates')
+
+DEFAULT_TTLS = {
+    'identity': timedelta(hours=24),
+    'transactions': timedelta(minutes=30),
+    'game_details': timedelta(hours=6),
+    'aggregates': timedelta(minutes=30),
+}
+
+# Bounds for the adaptive transactions TTL: active spenders refetch often,
+# dormant accounts can go hours between refreshes.
+MIN_TRANSACTIONS_TTL = timedelta(minutes=5)
+MAX_TRANSACTIONS_TTL = timedelta(hours=6)
+ACTIVITY_WINDOW = timedelta(days=30)
+
+def estimate_size(value: Any) -> int:
+    if isinstance(value, str):
+        return 49 + len(value)
+    if isinstance(value, (bytes, bytearray)):
+        return 33 + len(value)
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return 56 + sum(estimate_size(v) for v in value)
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return 32
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @property
+    def requests(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+class CachePolicy:
+    def __init__(self, ttls: Optional[Dict[str, timedelta]] = None, adaptive: bool = True,
+                 transactions_override: Optional[timedelta] = None):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.adaptive = adaptive
+        self.transactions_override = transactions_override
+        self.adaptive_transactions_ttl: Optional[timedelta] = None
+        self.purchases_per_day = 0.0
+        self.stats = {data_class: CacheStats() for data_class in DATA_CLASSES}
+
+    def ttl_for(self, data_class: str) -> timedelta:
+        if data_class in ('transactions', 'aggregates'):
+            if self.transactions_override is not None:
+                return self.transactions_override
+            if self.adaptive and self.adaptive_transactions_ttl is not None:
+                return self.adaptive_transactions_ttl
+        return self.ttls[data_class]
+
+    def update_activity(self, purchase_dates: Iterable[datetime], now: Optional[datetime] = None):
+        # Expected gap between purchases over the last 30 days; the cache lives
+        # for half of it so a new purchase is rarely stale for long.
+        now = now or datetime.now()
+        if not hasattr(purchase_dates, '__len__'):
+            purchase_dates = list(purchase_dates)
+        dates = np.asarray(purchase_dates, dtype='datetime64[ns]')
+        window_start = np.datetime64(now - ACTIVITY_WINDOW, 'ns')
+        recent = int(((dates >= window_start) & (dates <= np.datetime64(now, 'ns'))).sum())
+        self.purchases_per_day = recent / ACTIVITY_WINDOW.days
+
+        if recent == 0:
+            self.adaptive_transactions_ttl = MAX_TRANSACTIONS_TTL
+            return
+
+        expected_gap = ACTIVITY_WINDOW / recent
+        self.adaptive_transactions_ttl = max(MIN_TRANSACTIONS_TTL, min(MAX_TRANSACTIONS_TTL, expected_gap / 2))
+
+    def is_valid(self, data_class: str, timestamp: Optional[datetime], now: Optional[datetime] = None) -> bool:
+        if timestamp is None:
+            return False
+        return (now or datetime.now()) - timestamp < self.ttl_for(data_class)
+
+    def expires_in(self, data_class: str, timestamp: Optional[datetime], now: Optional[datetime] = None) -> timedelta:
+        if timestamp is None:
+            return timedelta(0)
+        remaining = self.ttl_for(data_class) - ((now or datetime.now()) - timestamp)
+        return max(remaining, timedelta(0))
+
+    def record(self, data_class: str, hit: bool):
+        stats = self.stats[data_class]
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+
+class PolicyCache:
+    # LRU store whose entries expire by their data class TTL and are evicted
+    # oldest-first once the entry count or estimated byte size is exceeded.
+    def __init__(self, policy: CachePolicy, max_entries: int = 1024, max_bytes: int = 8 * 1024 * 1024):
+        self.policy = policy
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: 'OrderedDict[Tuple[str, Hashable], Tuple[Any, datetime, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, data_class: str, key: Hashable, now: Optional[datetime] = None) -> Optional[Any]:
+        stats = self.policy.stats[data_class]
+        with self._lock:
+            entry = self._entries.get((data_class, key))
+            if entry is None:
+                stats.misses += 1
+                return None
+            value, stored_at, size = entry
+            if not self.policy.is_valid(data_class, stored_at, now):
+                del self._entries[(data_class, key)]
+                self.total_bytes -= size
+                stats.expirations += 1
+                stats.misses += 1
+                return None
+            self._entries.move_to_end((data_class, key))
+            stats.hits += 1
+            return value
+
+    def set(self, data_class: str, key: Hashable, value: Any, size: Optional[int] = None,
+            now: Optional[datetime] = None):
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            previous = self._entries.pop((data_class, key), None)
+            if previous is not None:
+                self.total_bytes -= previous[2]
+            if size > self.max_bytes:
+                return
+            self._entries[(data_class, key)] = (value, now or datetime.now(), size)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                (evicted_class, _), (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.policy.stats[evicted_class].evictions += 1
+
+    def invalidate(self, data_class: Optional[str] = None):
+        with self._lock:
+            for cache_key in [k for k in self._entries if data_class is None or k[0] == data_class]:
+                self.total_bytes -= self._entries.pop(cache_key)[2]
@@ -0,0 +1,253 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Candidate models are compared by rolling-origin backtests: every model
+# produces, for each origin t, the forecast it would have made from the first t
+# months only, as one (origins x horizon) array, and the one with the lowest
+# mean absolute error against what actually followed is used. Its backtest
+# errors per horizon step give the prediction interval.
+SEASON_LENGTH = 12
+INTERVAL_Z = 1.2816
+MIN_BACKTEST_TRAIN = 3
+HOLT_WINTERS_ALPHAS = (0.2, 0.4, 0.6, 0.8)
+HOLT_WINTERS_BETAS = (0.0, 0.1, 0.3)
+HOLT_WINTERS_GAMMAS = (0.1, 0.3, 0.5)
+MIN_PARTIAL_MONTH_DAYS = 7
+
+MODEL_LABELS = {
+    'linear': 'Linear trend',
+    'holt_winters': 'Holt-Winters',
+    'holt': 'Holt trend',
+    'seasonal_naive': 'Seasonal naive',
+    'naive': 'Last month',
+}
+
+def monthly_spending_series(df):
+    grouped = df.groupby('month')['amount'].sum()
+    return pd.DataFrame({'month': grouped.index.astype(str), 'amount': grouped.values})
+
+def dense_monthly_amounts(monthly_spending_df):
+    # Months without purchases are zeros, so positions line up with the calendar.
+    periods = pd.PeriodIndex(monthly_spending_df['month'], freq='M')
+    months = pd.period_range(periods.min(), periods.max(), freq='M')
+    amounts = pd.Series(monthly_spending_df['amount'].values, index=periods).groupby(level=0).sum()
+    return amounts.reindex(months, fill_value=0).values.astype(np.float64)
+
+def linear_paths(y, horizon):
+    # Least-squares line over y[:t] for every t at once, from running sums.
+    n = len(y)
+    t = np.arange(n + 1, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    sum_y = np.concatenate([[0.0], np.cumsum(y)])
+    sum_xy = np.concatenate([[0.0], np.cumsum(x * y)])
+    sum_x = t * (t - 1) / 2
+    sum_xx = (t - 1) * t * (2 * t - 1) / 6
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = t * sum_xx - sum_x ** 2
+        slope = np.where(denominator > 0, (t * sum_xy - sum_x * sum_y) / denominator, np.nan)
+        intercept = (sum_y - slope * sum_x) / t
+    steps = np.arange(1, horizon + 1)
+    return intercept[:, None] + slope[:, None] * (t[:, None] - 1 + steps[None, :])
+
+def seasonal_naive_paths(y, horizon, season_length):
+    # Each step repeats the value one season earlier (the last value when
+    # season_length is 1).
+    n = len(y)
+    paths = np.full((n + 1, horizon), np.nan)
+    origins = np.arange(season_length, n + 1)
+    if len(origins):
+        paths[origins] = y[origins[:, None] - season_length + (np.arange(horizon) % season_length)[None, :]]
+    return paths
+
+def holt_winters_paths(y, horizon, season_length):
+    # Additive Holt-Winters (Holt's linear trend when season_length is 1). The
+    # smoothing grid is run side by side, keeping every parameter set's state
+    # after each point. The forecast from origin t uses the parameters with the
+    # lowest one-step error on y[:t] only, so backtests never see later months.
+    n = len(y)
+    paths = np.full((n + 1, horizon), np.nan)
+    seasonal = season_length > 1
+    first_origin = 2 * season_length if seasonal else 2
+    if n < first_origin:
+        return paths
+
+    grid = np.array(list(itertools.product(
+        HOLT_WINTERS_ALPHAS, HOLT_WINTERS_BETAS, HOLT_WINTERS_GAMMAS if seasonal else (0.0,)
+    )))
+    alpha, beta, gamma = grid.T
+    if seasonal:
+        start = season_length
+        level = np.full(len(grid), y[:season_length].mean())
+        trend = np.full(len(grid), (y[season_length:first_origin].mean() - y[:season_length].mean()) / season_length)
+        season = np.tile(y[:season_length] - y[:season_length].mean(), (len(grid), 1))
+    else:
+        start = 1
+        level = np.full(len(grid), y[0])
+        trend = np.full(len(grid), y[1] - y[0])
+        season = np.zeros((len(grid), 1))
+
+    levels = np.zeros((n + 1, len(grid)))
+    trends = np.zeros((n + 1, len(grid)))
+    seasons = np.zeros((n + 1, len(grid), season_length))
+    # squared_errors[t]: one-step error of every parameter set over y[:t].
+    squared_errors = np.zeros((n + 1, len(grid)))
+    for i in range(start, n):
+        position = i % season_length
+        previous = season[:, position].copy()
+        squared_errors[i + 1] = squared_errors[i] + (y[i] - (level + trend + previous)) ** 2
+        new_level = alpha * (y[i] - previous) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+        season[:, position] = gamma * (y[i] - level) + (1 - gamma) * previous
+        levels[i + 1], trends[i + 1], seasons[i + 1] = level, trend, season
+
+    origins = np.arange(first_origin, n + 1)
+    best = np.argmin(squared_errors[origins], axis=1)
+    steps = np.arange(1, horizon + 1)
+    positions = (origins[:, None] + steps[None, :] - 1) % season_length
+    paths[origins] = (
+        levels[origins, best][:, None] + steps[None, :] * trends[origins, best][:, None]
+        + seasons[origins, best][np.arange(len(origins))[:, None], positions]
+    )
+    return paths
+
+def backtest_errors(y, paths):
+    # errors[t, k]: actual minus the forecast made at origin t for month t + k
+    # (NaN where that month is not observed yet).
+    horizon = paths.shape[1]
+    actuals = sliding_window_view(np.concatenate([y, np.full(horizon, np.nan)]), horizon)
+    return actuals - paths
+
+def candidate_paths(y, horizon):
+    season_length = SEASON_LENGTH if len(y) >= 2 * SEASON_LENGTH else 1
+    paths = {
+        'linear': linear_paths(y, horizon),
+        'holt_winters' if season_length > 1 else 'holt': holt_winters_paths(y, horizon, season_length),
+        'seasonal_naive' if season_length > 1 else 'naive': seasonal_naive_paths(y, horizon, season_length),
+    }
+    return {name: np.maximum(values, 0) for name, values in paths.items() if np.isfinite(values[-1]).all()}
+
+def select_model(y, paths):
+    # Scores the models that have at least one backtest on the origins all of
+    # them can forecast from.
+    errors = {name: backtest_errors(y, values) for name, values in paths.items()}
+    eligible = np.arange(len(y) + 1) >= MIN_BACKTEST_TRAIN
+    eligible[len(y):] = False
+    tested = {name: eligible & np.isfinite(values[:, 0]) for name, values in paths.items()}
+    common = eligible.copy()
+    for name, origins in tested.items():
+        if origins.any():
+            common &= origins
+    scores = {}
+    if common.any():
+        for name, error in errors.items():
+            if tested[name].any():
+                scores[name] = float(np.nanmean(np.abs(error[common])))
+    best = min(scores, key=scores.get) if scores else 'linear'
+    return best, scores, errors[best]
+
+def interval_widths(errors, horizon, fallback):
+    # Root mean squared backtest error per horizon step; steps with too few
+    # backtests grow the first step's error like a random walk.
+    observed = np.isfinite(errors)
+    counts = observed.sum(axis=0)
+    with np.errstate(invalid='ignore'):
+        rmse = np.sqrt(np.nansum(np.where(observed, errors, 0) ** 2, axis=0) / counts)
+    base = rmse[0] if counts[0] >= 2 else fallback
+    steps = np.arange(1, horizon + 1)
+    sigma = np.where(counts >= 2, rmse, base * np.sqrt(steps))
+    return INTERVAL_Z * sigma
+
+def forecast_spending(monthly_spending_df, months_to_forecast=6, observed_through=None):
+    if len(monthly_spending_df) < 2:
+        return None
+    
+    y = dense_monthly_amounts(monthly_spending_df)
+    x = np.arange(len(y))
+    
+    # A month still in progress would read as a sudden drop to every model.
+    # Once enough of it is observed it is scaled to a full month's pace; before
+    # that a few days would be extrapolated wildly, so the rest of the month is
+    # filled in at the previous month's level instead.
+    last_month = pd.Period(monthly_spending_df['month'].max(), freq='M')
+    if observed_through is not None and pd.Period(observed_through, freq='M') == last_month:
+        observed_share = observed_through.day / last_month.days_in_month
+        if observed_through.day >= MIN_PARTIAL_MONTH_DAYS:
+            y[-1] = y[-1] / observed_share
+        else:
+            y[-1] = y[-1] + (1 - observed_share) * y[-2]
+    
+    coefficients = np.polyfit(x, y, 1)
+    slope, intercept = coefficients
+    
+    historical_trend = slope * x + intercept
+    residuals = y - historical_trend
+    std_dev = np.std(residuals)
+    
+    paths = candidate_paths(y, months_to_forecast)
+    model, backtest_scores, errors = select_model(y, paths)
+    
+    future_x = np.arange(len(y), len(y) + months_to_forecast)
+    future_y = paths[model][-1]
+    margin = interval_widths(errors, months_to_forecast, std_dev)
+    lower = np.maximum(future_y - margin, 0)
+    upper = future_y + margin
+    
+    # Variability is the chosen model's backtest error relative to average
+    # monthly spending (in-sample residuals when the history is too short).
+    avg_spending = np.mean(y)
+    error = backtest_scores.get(model, std_dev)
+    if avg_spending > 0:
+        variability = (error / avg_spending) * 100
+    else:
+        variability = 0
+    
+    if variability < 20:
+        confidence = "High"
+        confidence_color = "#10b981"
+    elif variability < 40:
+        confidence = "Medium"
+        confidence_color = "#f59e0b"
+    else:
+        confidence = "Low"
+        confidence_color = "#ef4444"
+    
+    if slope > avg_spending * 0.05:
+        trend = "Increasing"
+        trend_icon = "↑"
+        trend_color = "#ef4444"
+    elif slope < -avg_spending * 0.05:
+        trend = "Decreasing"
+        trend_icon = "↓"
+        trend_color = "#10b981"
+    else:
+        trend = "Stable"
+        trend_icon = "—"
+        trend_color = "#a0a0a0"
+    
+    last_month_spending = y[-1]
+    if last_month_spending > 0:
+        next_month_change = ((future_y[0] - last_month_spending) / last_month_spending) * 100
+    else:
+        next_month_change = 0
+    
+    return {
+        'future_months': future_x,
+        'future_spending': future_y,
+        'lower': lower,
+        'upper': upper,
+        'model': model,
+        'model_label': MODEL_LABELS[model],
+        'backtest_scores': backtest_scores,
+        'trend': trend,
+        'trend_icon': trend_icon,
+        'trend_color': trend_color,
+        'confidence': confidence,
+        'confidence_color': confidence_color,
+        'variability': variability,
+        'slope': slope,
+        'next_month_change': next_month_change
+    }
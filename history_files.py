@@ -0,0 +1,118 @@
+import os
+from datetime import date, timedelta
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from transaction_store import (
+    TransactionStore, STRING_COLUMNS, MISSING_ID, MISSING_UNIVERSE_ID, OUTGOING, add_time_columns, load_user_store, store_path
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+PARQUET_AVAILABLE = pa is not None
+
+# Rows are written in date order, so each row group covers a narrow date span
+# and its min/max statistics let date filters skip whole groups.
+ROW_GROUP_SIZE = 8192
+
+FRAME_COLUMNS = ['date', 'item', 'type', 'amount', 'category', 'universe_id', 'transaction_type', 'direction']
+
+def history_path(data_dir: str, user_id) -> str:
+    return os.path.join(data_dir, f'{user_id}.parquet')
+
+def write_history(store: TransactionStore, path: str, row_group_size: int = ROW_GROUP_SIZE):
+    order = np.argsort(store.timestamps, kind='stable')
+    universe_ids = store.universe_ids[order]
+    columns = {
+        'date': pa.array(store.timestamps[order].view('datetime64[ns]')),
+        'amount': pa.array(store.amounts[order]),
+        'direction': pa.array(store.directions[order]),
+        'universe_id': pa.array(universe_ids, mask=universe_ids == MISSING_UNIVERSE_ID),
+        'id': pa.array(store.ids[order], mask=store.ids[order] == MISSING_ID),
+    }
+    for column in STRING_COLUMNS:
+        columns[column] = pa.DictionaryArray.from_arrays(
+            pa.array(store.codes[column][order]), pa.array(store.dictionaries[column].values, type=pa.string())
+        )
+
+    tmp_path = f'{path}.tmp'
+    pq.write_table(pa.table(columns), tmp_path, row_group_size=row_group_size)
+    os.replace(tmp_path, path)
+
+def read_history(path: str) -> TransactionStore:
+    table = pq.read_table(path, memory_map=True)
+    store = TransactionStore()
+    store.timestamps = table['date'].to_numpy().astype('datetime64[ns]').view(np.int64)
+    store.amounts = table['amount'].to_numpy().astype(np.int32)
+    store.directions = table['direction'].to_numpy().astype(np.int8)
+    store.universe_ids = table['universe_id'].fill_null(MISSING_UNIVERSE_ID).to_numpy().astype(np.int64)
+    store.ids = table['id'].fill_null(MISSING_ID).to_numpy().astype(np.int64)
+    for column in STRING_COLUMNS:
+        # Each row group carries its own dictionary; unify them so the codes
+        # share one StringDictionary.
+        chunked = table[column].unify_dictionaries()
+        values = chunked.chunk(0).dictionary.to_pylist() if chunked.num_chunks else []
+        dictionary = store.dictionaries[column]
+        dictionary.encode(values)
+        codes = [chunk.indices.to_numpy(zero_copy_only=False) for chunk in chunked.chunks]
+        store.codes[column] = np.concatenate(codes).astype(np.int32) if codes else np.empty(0, dtype=np.int32)
+    return store
+
+def scan_history(
+    paths: List[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    spending_only: bool = False,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    # Filters and the column list are handed to the Parquet reader, which
+    # memory-maps the files and only decodes row groups whose date statistics
+    # overlap [start, end].
+    dataset = ds.dataset(paths, format='parquet', filesystem=pafs.LocalFileSystem(use_mmap=True))
+    predicate = None
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field('date') >= pa.scalar(pd.Timestamp(start), type=pa.timestamp('ns')))
+    if end is not None:
+        conditions.append(ds.field('date') < pa.scalar(pd.Timestamp(end + timedelta(days=1)), type=pa.timestamp('ns')))
+    if spending_only:
+        conditions.append(ds.field('direction') == OUTGOING)
+    for condition in conditions:
+        predicate = condition if predicate is None else predicate & condition
+
+    table = dataset.to_table(columns=columns or FRAME_COLUMNS, filter=predicate)
+    df = table.to_pandas()
+    if 'date' in df:
+        df['date'] = df['date'].astype('datetime64[ns]')
+        add_time_columns(df)
+    return df
+
+def save_user_history(data_dir: str, user_id, store: TransactionStore):
+    if PARQUET_AVAILABLE:
+        write_history(store, history_path(data_dir, user_id))
+    else:
+        store.save(store_path(data_dir, user_id))
+
+def user_history_file(data_dir: str, user_id) -> Optional[str]:
+    path = history_path(data_dir, user_id)
+    return path if PARQUET_AVAILABLE and os.path.exists(path) else None
+
+def has_user_history(data_dir: str, user_id) -> bool:
+    # Whether load_user_history would find the file save_user_history writes.
+    if PARQUET_AVAILABLE:
+        return user_history_file(data_dir, user_id) is not None
+    return os.path.exists(store_path(data_dir, user_id))
+
+def load_user_history(data_dir: str, user_id) -> Optional[TransactionStore]:
+    path = user_history_file(data_dir, user_id)
+    if path is not None:
+        return read_history(path)
+    return load_user_store(data_dir, user_id)
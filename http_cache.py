@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+def loads(content: bytes) -> Any:
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+def user_hash(cookie: str) -> str:
+    # Separates cached pages per account without writing the cookie to disk.
+    return hashlib.sha256(cookie.encode('utf-8')).hexdigest()[:16]
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    expires_at: Optional[float] = None
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return self.expires_at is not None and (now or time.time()) < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+# Raw response bodies on disk, one file per (URL, params, user) with its
+# validators in a one-line JSON header. Only responses that can be revalidated
+# (ETag / Last-Modified) or carry a max-age are stored; a fresh entry is served
+# without a request, a stale one is revalidated with a conditional GET.
+class ResponseCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, url: str, params: Optional[Dict] = None, user: str = '') -> str:
+        material = json.dumps([url, sorted((params or {}).items()), user], default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.page')
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                header = json.loads(f.readline())
+                return CachedResponse(f.read(), header.get('etag'), header.get('last_modified'), header.get('expires_at'))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading cached response {key}: {e}")
+            return None
+
+    def put(self, key: str, body: bytes, headers) -> Optional[CachedResponse]:
+        entry = CachedResponse(body, headers.get('ETag'), headers.get('Last-Modified'))
+        cache_control = headers.get('Cache-Control', '')
+        max_age = MAX_AGE_PATTERN.search(cache_control)
+        if max_age and 'no-store' not in cache_control:
+            entry.expires_at = time.time() + int(max_age.group(1))
+        if 'no-store' in cache_control or not (entry.etag or entry.last_modified or entry.expires_at):
+            return None
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            header = {'etag': entry.etag, 'last_modified': entry.last_modified, 'expires_at': entry.expires_at}
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                f.write(body)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing cached response {key}: {e}")
+            return None
+        return entry
+
+    def refresh(self, key: str, entry: CachedResponse, headers) -> CachedResponse:
+        # A 304 may carry new validators or a new max-age.
+        updated = self.put(key, entry.body, {
+            'ETag': headers.get('ETag') or entry.etag or '',
+            'Last-Modified': headers.get('Last-Modified') or entry.last_modified or '',
+            'Cache-Control': headers.get('Cache-Control', ''),
+        })
+        return updated or entry
@@ -0,0 +1,516 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from mock_roblox_server import MockConfig, start_mock_server
+
+# Drives simulated dashboard sessions against a local `streamlit run app.py`
+# over Streamlit's websocket protocol, the way a browser tab does: every
+# widget change or click is a rerun request carrying the widget states, and
+# the rerun is done when the server reports the script finished. Sessions log
+# in against the mock Roblox API (one mock account each), wait for their data,
+# then click through presets, search, pagination, a comparison and the exports.
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+STREAM_PATH = '/_stcore/stream'
+HEALTH_PATH = '/_stcore/health'
+
+COOKIE_LABEL = 'Roblox Cookie (.ROBLOSECURITY)'
+LOGIN_LABEL = '🔐 Authenticate'
+PRESET_LABELS = ('📅 Last 7 Days', '📅 Last 30 Days', '📅 Last 90 Days', '📅 All Time')
+SEARCH_LABEL = 'Search Items'
+SEARCH_QUERIES = ('pass', '')
+NEXT_LABEL = 'Next ➡️'
+PREVIOUS_LABEL = '⬅️ Previous'
+PAGE_CLICKS = 3
+COMPARISON_LABEL = 'Select Comparison Mode'
+COMPARISON_MODES = ('Week vs Week', 'Custom Period', 'Month vs Month')
+EXPORT_LABELS = ('📥 Export CSV', '📥 Export JSON')
+
+# Widgets created without a key get "None" as the key part of their id.
+UNKEYED = 'None'
+
+PERCENTILES = (50, 95, 99)
+SAMPLE_SECONDS = 0.5
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+# Just enough of an RFC 6455 client for Streamlit's stream: one subprotocol,
+# no extensions, binary messages. Written on asyncio streams so the harness
+# needs nothing beyond what the app itself installs.
+class WebSocket:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, url: str, subprotocol: str, timeout: float) -> 'WebSocket':
+        parsed = urllib.parse.urlsplit(url)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(parsed.hostname, parsed.port or 80), timeout)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((
+            f"GET {parsed.path or '/'} HTTP/1.1\r\nHost: {parsed.netloc}\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n"
+            f"Sec-WebSocket-Protocol: {subprotocol}\r\n\r\n"
+        ).encode())
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+        status, *lines = head.decode('latin-1').split('\r\n')
+        headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in lines if line)}
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        if status.split()[1:2] != ['101'] or headers.get('sec-websocket-accept') != accept:
+            writer.close()
+            raise ConnectionError(f"websocket handshake with {url} failed: {status}")
+        return cls(reader, writer)
+
+    def _frame(self, opcode: int, payload: bytes) -> bytes:
+        # Client frames are always masked.
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+        mask = os.urandom(4)
+        masked = (np.frombuffer(payload, dtype=np.uint8) ^ np.resize(np.frombuffer(mask, dtype=np.uint8), length)).tobytes()
+        return header + mask + masked
+
+    async def send(self, payload: bytes, opcode: int = OP_BINARY):
+        self._writer.write(self._frame(opcode, payload))
+        await self._writer.drain()
+
+    async def recv(self) -> bytes:
+        # The next complete data message; pings are answered on the way.
+        parts: List[bytes] = []
+        while True:
+            first, second = await self._reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                length, = struct.unpack('!H', await self._reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack('!Q', await self._reader.readexactly(8))
+            payload = await self._reader.readexactly(length)
+            opcode = first & 0x0F
+            if opcode == OP_PING:
+                await self.send(payload, OP_PONG)
+            elif opcode == OP_CLOSE:
+                raise ConnectionError("websocket closed by the server")
+            elif opcode in (OP_CONTINUATION, OP_TEXT, OP_BINARY):
+                parts.append(payload)
+                if first & 0x80:
+                    return b''.join(parts)
+
+    async def close(self):
+        try:
+            await self.send(struct.pack('!H', 1000), OP_CLOSE)
+        except ConnectionError:
+            pass
+        self._writer.close()
+
+def _process_tree(pid: int) -> List[int]:
+    # pid and its descendants (the analytics pool's workers), from /proc.
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(parents.get(current, []))
+    return tree
+
+def sample_process(pid: int) -> Optional[Tuple[int, float]]:
+    # (resident bytes, CPU seconds) summed over the process tree; None where
+    # /proc is unavailable.
+    if not os.path.isdir(f'/proc/{pid}'):
+        return None
+    ticks = os.sysconf('SC_CLK_TCK')
+    rss, cpu = 0, 0.0
+    for member in _process_tree(pid):
+        try:
+            with open(f'/proc/{member}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{member}/statm') as f:
+                pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        cpu += (int(fields[11]) + int(fields[12])) / ticks
+        rss += pages * os.sysconf('SC_PAGE_SIZE')
+    return rss, cpu
+
+class ProcessMonitor:
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.peak_rss = 0
+        self._task = None
+
+    def sample(self) -> Optional[Tuple[int, float]]:
+        sample = sample_process(self.pid) if self.pid else None
+        if sample:
+            self.peak_rss = max(self.peak_rss, sample[0])
+        return sample
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(SAMPLE_SECONDS)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+# One browser tab. The widget tree of the latest full run is kept by delta
+# path so the next action can find its widget; values the session has typed
+# or picked are sent with every rerun, like the frontend does.
+class DashboardSession:
+    def __init__(self, base_url: str, cookie: str, timeout: float = 120.0):
+        self.base_url = base_url.rstrip('/')
+        self.cookie = cookie
+        self.timeout = timeout
+        self.elements: Dict[Tuple[int, ...], object] = {}
+        self.values: Dict[str, WidgetState] = {}
+        self.fragments: Dict[str, float] = {}
+        self.fragment_due: Dict[str, float] = {}
+        self.timings: List[Tuple[str, float]] = []
+        self.errors: List[str] = []
+        self._socket = None
+
+    async def connect(self):
+        url = 'ws' + self.base_url[len('http'):] + STREAM_PATH
+        self._socket = await WebSocket.connect(url, 'streamlit', self.timeout)
+
+    async def close(self):
+        if self._socket is not None:
+            await self._socket.close()
+            self._socket = None
+
+    def widget(self, kind: str, label: str, key: Optional[str] = None):
+        for element in self.elements.values():
+            if element.WhichOneof('type') != kind:
+                continue
+            widget = getattr(element, kind)
+            if widget.label == label and (key is None or widget.id.endswith(f'-{key}')):
+                return widget
+        return None
+
+    async def rerun(self, action: str, triggers: Tuple[WidgetState, ...] = (), fragment_id: str = ''):
+        message = BackMsg()
+        state = message.rerun_script
+        state.query_string = ''
+        state.page_script_hash = ''
+        state.widget_states.widgets.extend(list(self.values.values()) + list(triggers))
+        if fragment_id:
+            state.fragment_id = fragment_id
+            state.is_auto_rerun = True
+        began = time.perf_counter()
+        await self._socket.send(message.SerializeToString())
+        try:
+            await asyncio.wait_for(self._until_finished(bool(fragment_id)), self.timeout)
+        except asyncio.TimeoutError:
+            self.errors.append(f"{action}: no response within {self.timeout:.0f}s")
+            return
+        self.timings.append((action, time.perf_counter() - began))
+        if not fragment_id:
+            # Widgets the page no longer shows are no longer sent.
+            shown = {getattr(getattr(element, element.WhichOneof('type')), 'id', None) for element in self.elements.values()}
+            self.values = {widget_id: value for widget_id, value in self.values.items() if widget_id in shown}
+
+    async def _until_finished(self, fragment: bool):
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(await self._socket.recv())
+            kind = message.WhichOneof('type')
+            if kind == 'new_session':
+                # Sent when a full run starts, including one requested by
+                # st.rerun(); the previous run's widgets are gone.
+                self.elements = {}
+            elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+                element = message.delta.new_element
+                self.elements[tuple(message.metadata.delta_path)] = element
+                if element.WhichOneof('type') == 'exception':
+                    self.errors.append(f"{element.exception.type}: {element.exception.message}")
+            elif kind == 'auto_rerun':
+                if message.auto_rerun.interval > 0:
+                    self.fragments[message.auto_rerun.fragment_id] = message.auto_rerun.interval
+            elif kind == 'script_finished':
+                status = message.script_finished
+                if status == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                if fragment == (status == ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY):
+                    return
+                if status == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors.append("Script failed to compile")
+                    return
+
+    async def idle(self, seconds: float):
+        # Think time; fragments with run_every keep rerunning meanwhile, as
+        # the frontend's timers would.
+        deadline = time.monotonic() + seconds
+        while True:
+            now = time.monotonic()
+            for fragment_id, interval in list(self.fragments.items()):
+                due = self.fragment_due.setdefault(fragment_id, now + interval)
+                if due <= now:
+                    self.fragment_due[fragment_id] = now + interval
+                    await self.rerun('fragment', fragment_id=fragment_id)
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            next_due = min(self.fragment_due.values(), default=deadline)
+            await asyncio.sleep(max(0.0, min(deadline, next_due) - now))
+
+    async def set_value(self, action: str, kind: str, label: str, key: Optional[str] = None, **value) -> bool:
+        widget = self.widget(kind, label, key)
+        if widget is None or widget.disabled:
+            self.errors.append(f"{action}: no {kind} {label!r}")
+            return False
+        self.values[widget.id] = WidgetState(id=widget.id, **value)
+        await self.rerun(action)
+        return True
+
+    async def click(self, action: str, label: str, key: Optional[str] = None) -> bool:
+        button = self.widget('button', label, key)
+        if button is None or button.disabled:
+            return False
+        await self.rerun(action, (WidgetState(id=button.id, trigger_value=True),))
+        return True
+
+    async def download(self, action: str, label: str) -> bool:
+        button = self.widget('download_button', label)
+        if button is None or not button.url:
+            self.errors.append(f"{action}: no download {label!r}")
+            return False
+        began = time.perf_counter()
+        try:
+            await asyncio.to_thread(_fetch, self.base_url + button.url, self.timeout)
+        except Exception as e:
+            self.errors.append(f"{action}: {e}")
+            return False
+        self.timings.append((action, time.perf_counter() - began))
+        return True
+
+def _fetch(url: str, timeout: float) -> int:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return len(response.read())
+
+async def run_session(session: DashboardSession, rounds: int, think: float):
+    await session.connect()
+    await session.rerun('open')
+    await session.idle(think)
+    if not await session.set_value('cookie', 'text_input', COOKIE_LABEL, string_value=session.cookie):
+        return
+    if not await session.click('login', LOGIN_LABEL):
+        session.errors.append("login: no authenticate button")
+        return
+    if session.widget('radio', COMPARISON_LABEL) is None:
+        session.errors.append("login: dashboard did not load")
+        return
+
+    for _ in range(rounds):
+        for label in PRESET_LABELS:
+            await session.idle(think)
+            await session.click('preset', label)
+        for query in SEARCH_QUERIES:
+            await session.idle(think)
+            await session.set_value('search', 'text_input', SEARCH_LABEL, key='item_search', string_value=query)
+        for _ in range(PAGE_CLICKS):
+            await session.idle(think)
+            if not await session.click('page', NEXT_LABEL, UNKEYED):
+                break
+        await session.idle(think)
+        await session.click('page', PREVIOUS_LABEL, UNKEYED)
+        for mode in COMPARISON_MODES:
+            await session.idle(think)
+            await session.set_value('compare', 'radio', COMPARISON_LABEL, key='comparison_mode_selector', string_value=mode)
+        for label in EXPORT_LABELS:
+            await session.idle(think)
+            await session.download('export', label)
+
+def start_app(port: int, api_base_url: str) -> subprocess.Popen:
+    env = dict(os.environ, ROBLOX_API_BASE_URL=api_base_url)
+    return subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', APP_PATH, '--server.port', str(port),
+         '--server.headless', 'true', '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+def wait_for_app(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(base_url + HEALTH_PATH, timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"App at {base_url} did not become healthy within {timeout:.0f}s")
+        time.sleep(0.25)
+
+async def run_load(base_url: str, pid: Optional[int], sessions: int, rounds: int, think: float,
+                   ramp: float, timeout: float) -> Dict:
+    # A first session pays for imports and the app's shared caches; keep
+    # that out of the per-session figures.
+    warmup = DashboardSession(base_url, 'loadtest-warmup', timeout)
+    await warmup.connect()
+    await warmup.rerun('open')
+    await warmup.close()
+
+    monitor = ProcessMonitor(pid)
+    baseline = monitor.sample()
+    clients = [DashboardSession(base_url, f'loadtest-{index}', timeout) for index in range(sessions)]
+
+    async def launch(index: int, client: DashboardSession):
+        await asyncio.sleep(ramp * index / max(1, sessions))
+        try:
+            await run_session(client, rounds, think)
+        except Exception as e:
+            client.errors.append(f"{type(e).__name__}: {e}")
+
+    monitor.start()
+    began = time.perf_counter()
+    await asyncio.gather(*(launch(index, client) for index, client in enumerate(clients)))
+    elapsed = time.perf_counter() - began
+    # Sampled before disconnecting, while the server still holds every
+    # session's state.
+    loaded = monitor.sample()
+    await monitor.stop()
+    await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+    timings = [timing for client in clients for timing in client.timings]
+    result = {
+        'sessions': sessions,
+        'rounds': rounds,
+        'elapsed_seconds': elapsed,
+        'errors': [error for client in clients for error in client.errors],
+        'actions': summarize(timings),
+    }
+    if baseline and loaded:
+        result['memory'] = {
+            'baseline_mb': baseline[0] / 2 ** 20,
+            'loaded_mb': loaded[0] / 2 ** 20,
+            'peak_mb': monitor.peak_rss / 2 ** 20,
+            'per_session_mb': (loaded[0] - baseline[0]) / 2 ** 20 / max(1, sessions),
+        }
+        cpu = loaded[1] - baseline[1]
+        reruns = sum(1 for action, _ in timings if action != 'export')
+        result['cpu'] = {
+            'seconds': cpu,
+            'average_cores': cpu / elapsed if elapsed else 0.0,
+            'ms_per_rerun': cpu * 1000 / max(1, reruns),
+        }
+    return result
+
+def summarize(timings: List[Tuple[str, float]]) -> Dict[str, Dict[str, float]]:
+    # Latency percentiles in ms per action, plus "rerun" over every script
+    # run (everything but export downloads).
+    groups: Dict[str, List[float]] = {}
+    for action, seconds in timings:
+        groups.setdefault(action, []).append(seconds * 1000)
+        if action != 'export':
+            groups.setdefault('rerun', []).append(seconds * 1000)
+    summary = {}
+    for action, values in groups.items():
+        values = np.asarray(values)
+        summary[action] = {'count': len(values), **{f'p{p}': float(np.percentile(values, p)) for p in PERCENTILES},
+                           'max': float(values.max())}
+    return summary
+
+def print_report(result: Dict):
+    print(f"{result['sessions']} sessions x {result['rounds']} rounds in {result['elapsed_seconds']:.1f}s")
+    print(f"{'action':<10}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for action, stats in sorted(result['actions'].items(), key=lambda entry: entry[0] == 'rerun'):
+        print(f"{action:<10}{stats['count']:>8}" + ''.join(f"{stats[column]:>8.0f}ms" for column in ('p50', 'p95', 'p99', 'max')))
+    if 'memory' in result:
+        memory, cpu = result['memory'], result['cpu']
+        print(f"Memory: {memory['baseline_mb']:.0f} MB idle, {memory['loaded_mb']:.0f} MB loaded, "
+              f"{memory['peak_mb']:.0f} MB peak, {memory['per_session_mb']:.1f} MB per session")
+        print(f"CPU: {cpu['seconds']:.1f}s ({cpu['average_cores']:.2f} cores average, {cpu['ms_per_rerun']:.0f}ms per rerun)")
+    else:
+        print("Memory/CPU: not measured (pass --pid for an instance started elsewhere; needs /proc)")
+    errors = result['errors']
+    print(f"Errors: {len(errors)}")
+    for error in sorted(set(errors))[:10]:
+        print(f"  {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the dashboard with simulated sessions against the mock Roblox API.')
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent simulated sessions')
+    parser.add_argument('--rounds', type=int, default=1, help='Times each session repeats the interaction script')
+    parser.add_argument('--think-ms', type=float, default=500.0, help='Pause between actions')
+    parser.add_argument('--ramp', type=float, default=5.0, help='Seconds over which sessions start')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Seconds to wait for one rerun')
+    parser.add_argument('--transactions', type=int, default=1000, help='Purchase history size per mock account')
+    parser.add_argument('--income', type=int, default=0, help='Income history size per mock account')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Mock API delay per response')
+    parser.add_argument('--port', type=int, default=8501, help='Port for the app instance started by the harness')
+    parser.add_argument('--url', default=None, help='Test an already running instance instead of starting one')
+    parser.add_argument('--pid', type=int, default=None, help='Process id of the --url instance, for memory and CPU')
+    parser.add_argument('--json', default=None, help='Also write the results to this file')
+    args = parser.parse_args()
+
+    process = None
+    mock = None
+    if args.url:
+        base_url, pid = args.url.rstrip('/'), args.pid
+    else:
+        config = MockConfig(
+            total_transactions=args.transactions,
+            income_transactions=args.income,
+            latency_ms=args.latency_ms,
+            accounts=args.sessions,
+        )
+        mock, api_base_url = start_mock_server(config)
+        base_url = f'http://127.0.0.1:{args.port}'
+        process = start_app(args.port, api_base_url)
+        pid = process.pid
+    try:
+        wait_for_app(base_url)
+        result = asyncio.run(run_load(
+            base_url, pid, args.sessions, args.rounds, args.think_ms / 1000, args.ramp, args.timeout
+        ))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if mock is not None:
+            mock.shutdown()
+            mock.server_close()
+
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
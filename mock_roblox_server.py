@@ -0,0 +1,365 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse, parse_qs
+
+# Stand-in for the users/economy/games endpoints RobloxAPI talks to. Point the
+# app at it with ROBLOX_API_BASE_URL=http://127.0.0.1:<port>.
+
+ITEM_CATALOG = [
+    ('Game Pass', 'VIP Pass'),
+    ('Game Pass', 'Double Coins'),
+    ('Game Pass', 'Speed Boost'),
+    ('Developer Product', '500 Gems'),
+    ('Developer Product', 'Revive Token'),
+    ('Developer Product', 'Mystery Egg'),
+    ('Private Server', 'Private Server'),
+    ('Asset', 'Classic Shirt'),
+    ('Asset', 'Denim Pants'),
+    ('Asset', 'Sparkle Hat'),
+    ('Asset', 'Spiky Hair'),
+    ('Asset', 'Sword Gear'),
+    ('Asset', 'Emote Bundle'),
+    ('Catalog Item', 'Winged Accessory'),
+]
+
+BURST_SECONDS = 6 * 3600
+
+@dataclass
+class MockConfig:
+    user_id: int = 1000001
+    username: str = 'MockPlayer'
+    total_transactions: int = 1000
+    page_size: int = 100
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_seconds: int = 1
+    history_days: int = 365
+    seed: int = 42
+    require_cookie: Optional[str] = None
+    accounts: int = 1
+    income_transactions: int = 0
+    bad_timestamps: int = 0
+    etags: bool = False
+    burst_transactions: int = 0
+
+def generate_transactions(config: MockConfig) -> List[Dict]:
+    rng = random.Random(config.seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    span_seconds = config.history_days * 86400
+    transactions = []
+
+    offsets = [rng.randrange(span_seconds) for _ in range(config.total_transactions)]
+    # Extra purchases packed into the last few hours, like a binge or a
+    # compromised cookie.
+    offsets = sorted(offsets + [rng.randrange(BURST_SECONDS) for _ in range(config.burst_transactions)])
+    for index, offset in enumerate(offsets):
+        item_type, item_name = rng.choice(ITEM_CATALOG)
+        created = now - timedelta(seconds=offset, milliseconds=rng.randrange(1000))
+        if rng.random() < 0.5:
+            created_text = created.strftime('%Y-%m-%dT%H:%M:%S.') + f'{created.microsecond // 1000:03d}Z'
+        else:
+            created_text = created.strftime('%Y-%m-%dT%H:%M:%SZ')
+        transactions.append({
+            'id': config.user_id * 1000000 + index,
+            'idHash': f'mock-{index}',
+            'created': created_text,
+            'isPending': False,
+            'agent': {'id': 2000 + rng.randrange(50), 'type': 'User', 'name': 'MockDeveloper'},
+            'details': {'id': 3000000 + rng.randrange(40), 'name': item_name, 'type': item_type},
+            'currency': {'amount': -rng.choice([5, 10, 25, 40, 75, 100, 150, 250, 400, 800]), 'type': 'Robux'},
+        })
+
+    # Evenly spaced purchases with a timestamp the client cannot parse.
+    if config.bad_timestamps and transactions:
+        step = max(1, len(transactions) // config.bad_timestamps)
+        for transaction in transactions[::step][:config.bad_timestamps]:
+            transaction['created'] = 'not-a-timestamp'
+
+    return transactions
+
+INCOME_TYPES = ('Sale', 'GroupPayout', 'PremiumStipend')
+
+def generate_income(config: MockConfig) -> Dict[str, List[Dict]]:
+    # Positive-amount rows for the income transaction types, newest first.
+    rng = random.Random(config.seed + 2)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    span_seconds = config.history_days * 86400
+    income: Dict[str, List[Dict]] = {transaction_type: [] for transaction_type in INCOME_TYPES}
+
+    offsets = sorted((rng.randrange(span_seconds) for _ in range(config.income_transactions)))
+    for index, offset in enumerate(offsets):
+        transaction_type = rng.choice(INCOME_TYPES)
+        created = now - timedelta(seconds=offset)
+        item_type, item_name = rng.choice(ITEM_CATALOG) if transaction_type == 'Sale' else (transaction_type, transaction_type)
+        income[transaction_type].append({
+            'id': config.user_id * 1000000 + 500000 + index,
+            'idHash': f'mock-income-{index}',
+            'created': created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'isPending': False,
+            'agent': {'id': 2000 + rng.randrange(50), 'type': 'User', 'name': 'MockBuyer'},
+            'details': {'id': 3000000 + rng.randrange(40), 'name': item_name, 'type': item_type},
+            'currency': {'amount': rng.choice([10, 25, 50, 100, 250, 450]), 'type': 'Robux'},
+        })
+
+    return income
+
+class MockRobloxState:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.transactions = generate_transactions(config)
+        self.rng = random.Random(config.seed + 1)
+        self.lock = threading.Lock()
+        self.request_counts: Dict[str, int] = {}
+        self.account_transactions: Dict[int, Dict[str, List[Dict]]] = {
+            config.user_id: {'Purchase': self.transactions, **generate_income(config)}
+        }
+        # With require_cookie set, that cookie signs in as account 0 and
+        # "<cookie>-<n>" as account n; nothing else is accepted.
+        self.account_cookies: Optional[Set[str]] = None
+        if config.require_cookie is not None:
+            self.account_cookies = {config.require_cookie} | {
+                f'{config.require_cookie}-{slot}' for slot in range(max(1, config.accounts))
+            }
+
+    def record(self, key: str):
+        with self.lock:
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+    def roll(self) -> Tuple[bool, bool]:
+        with self.lock:
+            throttled = self.rng.random() < self.config.rate_limit_rate
+            failed = not throttled and self.rng.random() < self.config.error_rate
+        return throttled, failed
+
+    def account_for(self, cookie: Optional[str]) -> Tuple[int, str]:
+        # With accounts > 1 a cookie ending in "-<n>" signs in as mock account n
+        # (user_id + n, with its own seeded history); other cookies get account 0.
+        config = self.config
+        suffix = (cookie or '').rsplit('-', 1)[-1]
+        slot = int(suffix) % max(1, config.accounts) if suffix.isdigit() else 0
+        if slot == 0:
+            return config.user_id, config.username
+        return config.user_id + slot, f'{config.username}{slot + 1}'
+
+    def transactions_for(self, user_id: int, transaction_type: str = 'Purchase') -> List[Dict]:
+        with self.lock:
+            by_type = self.account_transactions.get(user_id)
+        if by_type is None:
+            slot = user_id - self.config.user_id
+            config = replace(self.config, user_id=user_id, seed=self.config.seed + slot)
+            by_type = {'Purchase': generate_transactions(config), **generate_income(config)}
+            with self.lock:
+                by_type = self.account_transactions.setdefault(user_id, by_type)
+        return by_type.get(transaction_type, [])
+
+class MockRobloxHandler(BaseHTTPRequestHandler):
+    server_version = 'MockRoblox/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def state(self) -> MockRobloxState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8')
+        if status == 200 and self.state.config.etags:
+            # Content-derived validator; a matching If-None-Match gets an empty 304.
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            headers = {**(headers or {}), 'ETag': etag}
+            if self.headers.get('If-None-Match') == etag:
+                self.state.record('304')
+                status, body = 304, b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def cookie_value(self) -> Optional[str]:
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        morsel = cookie.get('.ROBLOSECURITY')
+        if morsel is None or not morsel.value:
+            return None
+        return morsel.value
+
+    def authenticated(self) -> bool:
+        value = self.cookie_value()
+        if value is None:
+            return False
+        accepted = self.state.account_cookies
+        return accepted is None or value in accepted
+
+    def do_GET(self):
+        config = self.state.config
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        parts = [part for part in parsed.path.split('/') if part]
+
+        if config.latency_ms or config.latency_jitter_ms:
+            delay = config.latency_ms + self.state.rng.uniform(0, config.latency_jitter_ms)
+            time.sleep(delay / 1000)
+
+        throttled, failed = self.state.roll()
+        if throttled:
+            self.state.record('429')
+            self.send_json(429, {'errors': [{'code': 0, 'message': 'Too many requests'}]},
+                           {'Retry-After': str(config.retry_after_seconds)})
+            return
+        if failed:
+            self.state.record('500')
+            self.send_json(500, {'errors': [{'code': 0, 'message': 'InternalServerError'}]})
+            return
+
+        if parts == ['v1', 'users', 'authenticated']:
+            self.handle_authenticated_user()
+        elif len(parts) == 4 and parts[:2] == ['v2', 'users'] and parts[3] == 'transactions':
+            self.handle_transactions(parts[2], query)
+        elif parts == ['v1', 'games']:
+            self.handle_games(query)
+        else:
+            self.state.record('404')
+            self.send_json(404, {'errors': [{'code': 0, 'message': 'NotFound'}]})
+
+    def handle_authenticated_user(self):
+        self.state.record('users')
+        if not self.authenticated():
+            self.send_json(401, {'errors': [{'code': 0, 'message': 'Authorization has been denied for this request.'}]})
+            return
+        user_id, username = self.state.account_for(self.cookie_value())
+        self.send_json(200, {'id': user_id, 'name': username, 'displayName': username})
+
+    def handle_transactions(self, user_id: str, query: Dict[str, List[str]]):
+        self.state.record('transactions')
+        config = self.state.config
+        if not self.authenticated():
+            self.send_json(401, {'errors': [{'code': 0, 'message': 'Authorization has been denied for this request.'}]})
+            return
+        account_id, _ = self.state.account_for(self.cookie_value())
+        if user_id != str(account_id):
+            self.send_json(403, {'errors': [{'code': 0, 'message': 'Forbidden'}]})
+            return
+
+        transaction_type = query.get('transactionType', ['Purchase'])[0]
+        rows = self.state.transactions_for(account_id, transaction_type)
+
+        try:
+            limit = int(query.get('limit', ['10'])[0])
+            start = int(query.get('cursor', ['0'])[0] or 0)
+        except ValueError:
+            self.send_json(400, {'errors': [{'code': 0, 'message': 'Invalid cursor or limit'}]})
+            return
+
+        # Rows are generated newest first, like the real endpoint returns them.
+        page_size = max(1, min(limit, config.page_size))
+        page = rows[start:start + page_size]
+        next_start = start + page_size
+        self.send_json(200, {
+            'previousPageCursor': str(max(0, start - page_size)) if start > 0 else None,
+            'nextPageCursor': str(next_start) if next_start < len(rows) else None,
+            'data': page,
+        })
+
+    def handle_games(self, query: Dict[str, List[str]]):
+        self.state.record('games')
+        universe_ids = []
+        for value in query.get('universeIds', []):
+            universe_ids.extend(part for part in value.split(',') if part)
+        data = []
+        for universe_id in universe_ids:
+            if not universe_id.isdigit():
+                continue
+            data.append({
+                'id': int(universe_id),
+                'rootPlaceId': int(universe_id) * 10,
+                'name': f'Mock Experience {universe_id}',
+                'creator': {'id': 2000, 'name': 'MockDeveloper', 'type': 'User'},
+                'price': None,
+                'playing': 0,
+                'visits': 0,
+            })
+        self.send_json(200, {'data': data})
+
+def create_mock_server(config: Optional[MockConfig] = None, host: str = '127.0.0.1', port: int = 0,
+                       verbose: bool = False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), MockRobloxHandler)
+    server.daemon_threads = True
+    server.state = MockRobloxState(config or MockConfig())
+    server.verbose = verbose
+    return server
+
+def start_mock_server(config: Optional[MockConfig] = None, host: str = '127.0.0.1',
+                      port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    server = create_mock_server(config, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f'http://{bound_host}:{bound_port}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Roblox users/economy/games APIs.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--transactions', type=int, default=1000, help='Purchase history size')
+    parser.add_argument('--page-size', type=int, default=100, help='Maximum rows returned per page')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Fixed delay added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random extra delay, uniform in [0, jitter]')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--history-days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cookie', default=None, help='Only accept this .ROBLOSECURITY value (and <value>-<n> for each of --accounts)')
+    parser.add_argument('--income', type=int, default=0, help='Sale, group payout and stipend history size')
+    parser.add_argument('--accounts', type=int, default=1, help='Serve this many accounts; a cookie ending in -<n> signs in as account n')
+    parser.add_argument('--bad-timestamps', type=int, default=0, help='Purchases sent with an unparseable timestamp')
+    parser.add_argument('--etags', action='store_true', help='Send ETags and answer matching If-None-Match with 304')
+    parser.add_argument('--burst', type=int, default=0, help='Extra purchases made within the last few hours')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    config = MockConfig(
+        total_transactions=args.transactions,
+        page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_seconds=args.retry_after,
+        history_days=args.history_days,
+        seed=args.seed,
+        require_cookie=args.cookie,
+        accounts=args.accounts,
+        income_transactions=args.income,
+        bad_timestamps=args.bad_timestamps,
+        etags=args.etags,
+        burst_transactions=args.burst,
+    )
+    server = create_mock_server(config, args.host, args.port, verbose=args.verbose)
+    print(f"Mock Roblox API listening on http://{args.host}:{server.server_address[1]}")
+    print(f"Run the app with ROBLOX_API_BASE_URL=http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
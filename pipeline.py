@@ -0,0 +1,145 @@
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from aggregates import RunningAggregates
+from roblox_api import FetchError, RobloxAPI
+from transaction_store import TransactionStore
+
+Boundary = Tuple[Optional[int], Set[int]]
+
+def _produce_pages(api: RobloxAPI, transaction_type: str, max_transactions: int, pages: queue.Queue):
+    # A failure is handed to the consuming thread in place of the end marker.
+    try:
+        for page in api.iter_transaction_pages(max_transactions, transaction_type):
+            pages.put((transaction_type, page))
+    except Exception as e:
+        pages.put((transaction_type, e))
+    else:
+        pages.put((transaction_type, None))
+
+def iter_type_pages(api: RobloxAPI, max_transactions: int = 1000):
+    # Each transaction type paginates on its own thread; pages are yielded to
+    # the caller's thread as they arrive, so the store is only touched there.
+    # A type that fails raises here rather than leaving a partial history.
+    types = api.transaction_types
+    if len(types) == 1:
+        for page in api.iter_transaction_pages(max_transactions, types[0]):
+            yield types[0], page
+        return
+
+    pages: queue.Queue = queue.Queue()
+    for transaction_type in types:
+        threading.Thread(
+            target=_produce_pages, args=(api, transaction_type, max_transactions, pages), daemon=True
+        ).start()
+
+    remaining = len(types)
+    while remaining:
+        transaction_type, page = pages.get()
+        if isinstance(page, Exception):
+            raise page
+        if page is None:
+            remaining -= 1
+            continue
+        yield transaction_type, page
+
+# Pages flow straight from the API into the columnar store and the running
+# aggregates; only the raw pages in flight and their parsed rows are alive.
+def stream_transactions(
+    api: RobloxAPI,
+    max_transactions: int = 1000,
+    on_page: Optional[Callable[[TransactionStore, RunningAggregates], None]] = None
+) -> Optional[Tuple[TransactionStore, RunningAggregates]]:
+    store = TransactionStore()
+    aggregates = RunningAggregates(store)
+
+    for transaction_type, page in iter_type_pages(api, max_transactions):
+        store.extend(api.parse_transactions(page, transaction_type))
+        aggregates.update()
+        if on_page is not None:
+            on_page(store, aggregates)
+
+    if len(store) == 0:
+        return None
+    return store, aggregates
+
+def sync_boundary(store: TransactionStore, transaction_type: str = 'Purchase') -> Boundary:
+    # Newest stored timestamp of one transaction type plus the ids stored at
+    # exactly that instant; the API returns newest first, so syncing that type
+    # stops once it reaches this point.
+    code = store.dictionaries['transaction_type'].index.get(transaction_type)
+    if code is None:
+        return None, set()
+    rows = store.codes['transaction_type'] == code
+    timestamps = store.timestamps[rows]
+    if len(timestamps) == 0:
+        return None, set()
+    newest = int(timestamps.max())
+    return newest, set(store.ids[rows][timestamps == newest].tolist())
+
+def sync_boundaries(store: TransactionStore, transaction_types: List[str]) -> Dict[str, Boundary]:
+    return {transaction_type: sync_boundary(store, transaction_type) for transaction_type in transaction_types}
+
+def fetch_new_records(
+    api: RobloxAPI,
+    newest_timestamp: Optional[int],
+    boundary_ids: Set[int],
+    max_transactions: int = 1000,
+    transaction_type: str = 'Purchase'
+) -> List[Dict]:
+    # Raises FetchError when max_transactions runs out before the boundary is
+    # reached: appending that newer slice alone would move the boundary past
+    # the transactions in between, and they would never be fetched.
+    new_records = []
+    fetched = 0
+    for page in api.iter_transaction_pages(max_transactions, transaction_type):
+        fetched += len(page)
+        for record in api.parse_transactions(page, transaction_type):
+            timestamp = int(np.datetime64(record['date'], 'ns').astype(np.int64))
+            if newest_timestamp is not None and (
+                timestamp < newest_timestamp or
+                (timestamp == newest_timestamp and (record.get('id') is None or record['id'] in boundary_ids))
+            ):
+                return new_records
+            new_records.append(record)
+    if newest_timestamp is not None and fetched >= max_transactions:
+        raise FetchError(f"{transaction_type} sync did not reach the stored transactions within {max_transactions}")
+    return new_records
+
+def fetch_new_records_by_type(
+    api: RobloxAPI,
+    boundaries: Dict[str, Boundary],
+    max_transactions: int = 1000
+) -> List[Dict]:
+    # Types sync concurrently; results are concatenated in the api's type order.
+    # The first type that fails is re-raised once every thread has finished.
+    results: Dict[str, List[Dict]] = {}
+    errors: Dict[str, Exception] = {}
+
+    def fetch(transaction_type: str):
+        newest_timestamp, boundary_ids = boundaries.get(transaction_type, (None, set()))
+        try:
+            results[transaction_type] = fetch_new_records(
+                api, newest_timestamp, boundary_ids, max_transactions, transaction_type
+            )
+        except Exception as e:
+            print(f"Error syncing {transaction_type} transactions: {e}")
+            errors[transaction_type] = e
+
+    threads = [threading.Thread(target=fetch, args=(t,), daemon=True) for t in api.transaction_types]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for t in api.transaction_types:
+        if t in errors:
+            raise errors[t]
+    return [record for t in api.transaction_types for record in results.get(t, [])]
+
+def apply_new_records(store: TransactionStore, aggregates: RunningAggregates, records: List[Dict]) -> int:
+    store.extend(records)
+    aggregates.update()
+    return len(records)
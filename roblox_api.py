@@ -1,18 +1,134 @@
+import os
+import threading
+import time
 import requests
-from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
+from cache_policy import PolicyCache
+from http_cache import ResponseCache, loads, user_hash
+from timestamps import parse_timestamps
+
+DEFAULT_BASE_URLS = {
+    'users': 'https://users.roblox.com',
+    'economy': 'https://economy.roblox.com',
+    'games': 'https://games.roblox.com',
+}
+
+# Transaction types accepted by the v2 transactions endpoint. Purchases are
+# money out; the others are income, except trades, whose direction comes from
+# the sign of the currency amount.
+TRANSACTION_TYPES = ('Purchase', 'Sale', 'AffiliateSale', 'GroupPayout', 'PremiumStipend', 'TradeRobux')
+OUTGOING = -1
+INCOMING = 1
+
+# Rows kept in RobloxAPI.unparseable_rows for display; the count keeps going.
+MAX_UNPARSEABLE_SAMPLES = 50
+
+# Rate-limited (429) and server-error responses are retried this many times,
+# waiting Retry-After when the server sends it and an exponential backoff from
+# RETRY_BACKOFF_SECONDS otherwise, each wait capped at MAX_RETRY_WAIT_SECONDS.
+MAX_RETRIES = 4
+RETRY_BACKOFF_SECONDS = 0.5
+MAX_RETRY_WAIT_SECONDS = 30.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Raised when a request still fails after every retry, or pagination breaks
+# off midway, so callers never take a truncated history for a complete one.
+class FetchError(Exception):
+    pass
+
+def retry_wait(response: Optional[requests.Response], attempt: int) -> float:
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    try:
+        wait = float(retry_after) if retry_after is not None else RETRY_BACKOFF_SECONDS * 2 ** attempt
+    except ValueError:
+        wait = RETRY_BACKOFF_SECONDS * 2 ** attempt
+    return min(max(wait, 0.0), MAX_RETRY_WAIT_SECONDS)
+
+def resolve_transaction_types(types: Optional[List[str]] = None) -> List[str]:
+    # ROBLOX_TRANSACTION_TYPES is a comma-separated subset, e.g. "Purchase,Sale".
+    if types is None:
+        configured = os.environ.get('ROBLOX_TRANSACTION_TYPES')
+        types = [t.strip() for t in configured.split(',') if t.strip()] if configured else list(TRANSACTION_TYPES)
+    return [t for t in types if t in TRANSACTION_TYPES] or ['Purchase']
+
+def resolve_base_urls(overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    # ROBLOX_API_BASE_URL points every service at one host (e.g. the local mock
+    # server); ROBLOX_<SERVICE>_BASE_URL and explicit overrides take precedence.
+    base_urls = dict(DEFAULT_BASE_URLS)
+    shared = os.environ.get('ROBLOX_API_BASE_URL')
+    for service in base_urls:
+        url = os.environ.get(f'ROBLOX_{service.upper()}_BASE_URL') or shared
+        if url:
+            base_urls[service] = url
+    if overrides:
+        base_urls.update(overrides)
+    return {service: url.rstrip('/') for service, url in base_urls.items()}
+
+def default_http_cache() -> Optional[ResponseCache]:
+    # ROBLOX_HTTP_CACHE_DIR turns on the on-disk page cache for every client.
+    directory = os.environ.get('ROBLOX_HTTP_CACHE_DIR')
+    return ResponseCache(directory) if directory else None
 
 class RobloxAPI:
-    def __init__(self, cookie: str):
+    def __init__(self, cookie: str, base_urls: Optional[Dict[str, str]] = None,
+                 cache: Optional[PolicyCache] = None, transaction_types: Optional[List[str]] = None,
+                 http_cache: Optional[ResponseCache] = None):
         self.cookie = cookie
         self.session = requests.Session()
         self.session.cookies.set('.ROBLOSECURITY', cookie)
+        self.base_urls = resolve_base_urls(base_urls)
+        self.cache = cache
+        self.http_cache = http_cache if http_cache is not None else default_http_cache()
+        self.user_hash = user_hash(cookie)
+        self.transaction_types = resolve_transaction_types(transaction_types)
         self.user_id = None
         self.username = None
+        self.unparseable_count = 0
+        self.unparseable_rows: List[Dict] = []
+        # Transaction types are synced on parallel threads sharing this client.
+        self._unparseable_lock = threading.Lock()
         
+    def _send(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> requests.Response:
+        # GET with bounded retries on rate limiting, server errors and dropped
+        # connections; raises FetchError once they are used up.
+        for attempt in range(MAX_RETRIES + 1):
+            response = None
+            try:
+                response = self.session.get(url, params=params, headers=headers)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                error = f"HTTP {response.status_code}"
+            except requests.ConnectionError as e:
+                error = str(e)
+            if attempt < MAX_RETRIES:
+                time.sleep(retry_wait(response, attempt))
+        raise FetchError(f"{url} failed after {MAX_RETRIES + 1} attempts: {error}")
+    
+    def _get_json(self, url: str, params: Optional[Dict] = None, private: bool = True) -> Optional[Dict]:
+        # GET through the page cache: a fresh entry skips the request, a stale
+        # one is revalidated and a 304 reuses the stored body. private pages
+        # are keyed per account.
+        if self.http_cache is None:
+            response = self._send(url, params)
+            return loads(response.content) if response.status_code == 200 else None
+        
+        key = self.http_cache.key(url, params, self.user_hash if private else '')
+        entry = self.http_cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return loads(entry.body)
+        
+        response = self._send(url, params, entry.validators() if entry is not None else None)
+        if response.status_code == 304 and entry is not None:
+            self.http_cache.refresh(key, entry, response.headers)
+            return loads(entry.body)
+        if response.status_code == 200:
+            self.http_cache.put(key, response.content, response.headers)
+            return loads(response.content)
+        return None
+    
     def get_user_info(self) -> Optional[Dict]:
         try:
-            response = self.session.get('https://users.roblox.com/v1/users/authenticated')
+            response = self._send(f"{self.base_urls['users']}/v1/users/authenticated")
             if response.status_code == 200:
                 data = response.json()
                 self.user_id = data.get('id')
@@ -23,7 +139,8 @@ class RobloxAPI:
             print(f"Error fetching user info: {e}")
             return None
     
-    def get_transactions(self, limit: int = 100, cursor: str = None) -> Optional[Dict]:
+    def get_transactions(self, limit: int = 100, cursor: str = None,
+                         transaction_type: str = 'Purchase') -> Optional[Dict]:
         if not self.user_id:
             self.get_user_info()
         
@@ -31,94 +148,131 @@ class RobloxAPI:
             return None
         
         try:
-            url = f'https://economy.roblox.com/v2/users/{self.user_id}/transactions'
+            url = f"{self.base_urls['economy']}/v2/users/{self.user_id}/transactions"
             params = {
                 'limit': min(limit, 100),
-                'transactionType': 'Purchase'
+                'transactionType': transaction_type
             }
             if cursor:
                 params['cursor'] = cursor
             
-            response = self.session.get(url, params=params)
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return self._get_json(url, params)
+        except FetchError:
+            raise
         except Exception as e:
             print(f"Error fetching transactions: {e}")
             return None
     
-    def get_all_transactions(self, max_transactions: int = 500) -> List[Dict]:
-        all_transactions = []
+    def iter_transaction_pages(self, max_transactions: int = 500,
+                               transaction_type: str = 'Purchase') -> Iterator[List[Dict]]:
+        fetched = 0
         cursor = None
         
-        while len(all_transactions) < max_transactions:
-            data = self.get_transactions(limit=100, cursor=cursor)
+        while fetched < max_transactions:
+            data = self.get_transactions(limit=100, cursor=cursor, transaction_type=transaction_type)
             if not data or 'data' not in data:
+                if cursor:
+                    raise FetchError(f"{transaction_type} pagination stopped after {fetched} transactions")
                 break
             
             transactions = data['data']
             if not transactions:
                 break
             
-            all_transactions.extend(transactions)
+            transactions = transactions[:max_transactions - fetched]
+            fetched += len(transactions)
+            yield transactions
             
             cursor = data.get('nextPageCursor')
             if not cursor:
                 break
-        
-        return all_transactions[:max_transactions]
+    
+    def get_all_transactions(self, max_transactions: int = 500, transaction_type: str = 'Purchase') -> List[Dict]:
+        all_transactions = []
+        for page in self.iter_transaction_pages(max_transactions, transaction_type):
+            all_transactions.extend(page)
+        return all_transactions
     
     def get_game_details(self, universe_id: int) -> Optional[Dict]:
+        if self.cache is not None:
+            cached = self.cache.get('game_details', universe_id)
+            if cached is not None:
+                return cached
+        
         try:
-            url = f'https://games.roblox.com/v1/games'
+            url = f"{self.base_urls['games']}/v1/games"
             params = {'universeIds': universe_id}
-            response = self.session.get(url, params=params)
+            data = self._get_json(url, params, private=False)
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('data'):
-                    return data['data'][0]
+            if data and data.get('data'):
+                if self.cache is not None:
+                    self.cache.set('game_details', universe_id, data['data'][0])
+                return data['data'][0]
             return None
         except Exception:
             return None
     
-    def parse_transactions(self, transactions: List[Dict]) -> List[Dict]:
+    def parse_transactions(self, transactions: List[Dict], transaction_type: str = 'Purchase') -> List[Dict]:
         parsed = []
+        default_direction = OUTGOING if transaction_type == 'Purchase' else INCOMING
         
-        for trans in transactions:
+        # Timestamps are decoded for the whole page at once; rows whose
+        # timestamp cannot be parsed are skipped and reported rather than
+        # given an invented date.
+        created = [trans.get('created', '') for trans in transactions]
+        timestamps, invalid = parse_timestamps(created)
+        dates = timestamps.astype('datetime64[us]').tolist()
+        if invalid.any():
+            self._report_unparseable(transactions, created, invalid, transaction_type)
+        
+        for trans, date, skip in zip(transactions, dates, invalid.tolist()):
+            if skip:
+                continue
             item_name = trans.get('details', {}).get('name', 'Unknown')
             item_type = trans.get('details', {}).get('type', 'Unknown')
-            amount = abs(trans.get('currency', {}).get('amount', 0))
-            created = trans.get('created', '')
-            
-            try:
-                date = datetime.strptime(created, '%Y-%m-%dT%H:%M:%S.%fZ')
-            except:
-                try:
-                    date = datetime.strptime(created, '%Y-%m-%dT%H:%M:%SZ')
-                except:
-                    date = datetime.now()
+            raw_amount = trans.get('currency', {}).get('amount', 0)
+            amount = abs(raw_amount)
+            if transaction_type == 'TradeRobux' and raw_amount:
+                direction = OUTGOING if raw_amount < 0 else INCOMING
+            else:
+                direction = default_direction
             
             universe_id = trans.get('details', {}).get('id')
             
-            category = self._categorize_transaction(item_type, item_name)
+            category = self._categorize_transaction(item_type, item_name, transaction_type)
             
             parsed.append({
+                'id': trans.get('id'),
                 'date': date,
                 'item': item_name,
                 'type': item_type,
                 'amount': amount,
                 'category': category,
-                'universe_id': universe_id
+                'universe_id': universe_id,
+                'transaction_type': transaction_type,
+                'direction': direction
             })
         
         return parsed
     
-    def _categorize_transaction(self, item_type: str, item_name: str) -> str:
+    def _report_unparseable(self, transactions: List[Dict], created: List, invalid, transaction_type: str):
+        rows = [index for index, skip in enumerate(invalid.tolist()) if skip]
+        print(f"Error parsing {len(rows)} {transaction_type} timestamps, skipping rows: {[created[i] for i in rows[:5]]}")
+        with self._unparseable_lock:
+            self.unparseable_count += len(rows)
+            room = MAX_UNPARSEABLE_SAMPLES - len(self.unparseable_rows)
+            self.unparseable_rows.extend(
+                {'id': transactions[i].get('id'), 'transaction_type': transaction_type, 'created': created[i]}
+                for i in rows[:max(room, 0)]
+            )
+    
+    def _categorize_transaction(self, item_type: str, item_name: str, transaction_type: str = 'Purchase') -> str:
         item_type_lower = item_type.lower()
         item_name_lower = item_name.lower()
         
-        if 'game' in item_type_lower or 'pass' in item_type_lower:
+        if transaction_type == 'TradeRobux':
+            return 'Trading'
+        elif 'game' in item_type_lower or 'pass' in item_type_lower:
             return 'Game'
         elif 'developer product' in item_type_lower:
             return 'Game'
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Set
+
+from transaction_store import TransactionStore
+
+SEARCH_COLUMNS = ('item', 'type')
+GRAM_SIZE = 3
+
+# Rough cost of one code in a posting set and of one gram's set and key.
+POSTING_BYTES = 40
+GRAM_BYTES = 280
+
+# Rank of a match, best first.
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING = range(4)
+RANK_LABELS = {EXACT: 'Exact', PREFIX: 'Prefix', WORD_PREFIX: 'Word prefix', SUBSTRING: 'Contains'}
+
+def _grams(text: str) -> Set[str]:
+    # Every substring of up to GRAM_SIZE characters, so a query of any
+    # length has posting lists to intersect.
+    return {text[start:start + size] for size in range(1, GRAM_SIZE + 1) for start in range(len(text) - size + 1)}
+
+def _query_grams(query: str) -> Set[str]:
+    if len(query) <= GRAM_SIZE:
+        return {query}
+    return {query[start:start + GRAM_SIZE] for start in range(len(query) - GRAM_SIZE + 1)}
+
+def _rank(name: str, query: str) -> int:
+    if name == query:
+        return EXACT
+    if name.startswith(query):
+        return PREFIX
+    if ' ' + query in name:
+        return WORD_PREFIX
+    return SUBSTRING
+
+# N-gram index over the distinct item and type names in a store's
+# dictionaries rather than over rows: a history repeats a few hundred names,
+# so lookups touch only those and a match turns into a row filter through the
+# codes. update() indexes names added since the previous call, like
+# RunningAggregates.update().
+class SearchIndex:
+    def __init__(self, store: TransactionStore):
+        self.store = store
+        self.indexed = {column: 0 for column in SEARCH_COLUMNS}
+        self.names: Dict[str, List[str]] = {column: [] for column in SEARCH_COLUMNS}
+        self.postings: Dict[str, Dict[str, Set[int]]] = {column: {} for column in SEARCH_COLUMNS}
+
+    def update(self):
+        for column in SEARCH_COLUMNS:
+            values = self.store.dictionaries[column].values
+            postings = self.postings[column]
+            for code in range(self.indexed[column], len(values)):
+                name = values[code].casefold()
+                self.names[column].append(name)
+                for gram in _grams(name):
+                    postings.setdefault(gram, set()).add(code)
+            self.indexed[column] = len(values)
+
+    @property
+    def nbytes(self) -> int:
+        postings = sum(len(codes) for column in SEARCH_COLUMNS for codes in self.postings[column].values())
+        grams = sum(len(self.postings[column]) for column in SEARCH_COLUMNS)
+        return postings * POSTING_BYTES + grams * GRAM_BYTES + sum(49 + len(name) for column in SEARCH_COLUMNS for name in self.names[column])
+
+    def lookup(self, column: str, query: str) -> Dict[int, int]:
+        # {code: rank} for names of column containing query.
+        query = query.casefold().strip()
+        if not query:
+            return {}
+        postings = self.postings[column]
+        lists = sorted((postings.get(gram, set()) for gram in _query_grams(query)), key=len)
+        candidates = set.intersection(*lists) if lists else set()
+        names = self.names[column]
+        return {code: _rank(names[code], query) for code in candidates if query in names[code]}
+
+    def search(self, query: str, weights: Optional[Dict[str, np.ndarray]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        # Matches in both columns ranked by match quality, then by weight
+        # (e.g. all-time spend per code).
+        frames = []
+        for column in SEARCH_COLUMNS:
+            found = self.lookup(column, query)
+            codes = np.fromiter(found.keys(), dtype=np.int64, count=len(found))
+            column_weights = (weights or {}).get(column)
+            weight = np.zeros(len(codes), dtype=np.int64)
+            if column_weights is not None:
+                known = codes < len(column_weights)
+                weight[known] = column_weights[codes[known]]
+            values = self.store.dictionaries[column].values
+            frames.append(pd.DataFrame({
+                'column': column,
+                'value': [values[code] for code in codes.tolist()],
+                'rank': np.fromiter(found.values(), dtype=np.int64, count=len(found)),
+                'weight': weight,
+            }))
+        matches = pd.concat(frames, ignore_index=True)
+        order = np.lexsort((-matches['weight'].values, matches['rank'].values))
+        matches = matches.iloc[order[:limit] if limit else order].reset_index(drop=True)
+        matches['match'] = matches['rank'].map(RANK_LABELS)
+        return matches
+
+def search_mask(df: pd.DataFrame, matches: pd.DataFrame) -> np.ndarray:
+    # Rows of df whose item or type is one of the matches.
+    mask = np.zeros(len(df), dtype=bool)
+    for column in SEARCH_COLUMNS:
+        values = matches.loc[matches['column'] == column, 'value']
+        if len(values):
+            mask |= df[column].isin(values.tolist()).to_numpy()
+    return mask
@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import List, Optional
+
+from accounts import Account, combine_accounts
+from aggregates import RunningAggregates
+from background_refresh import BackgroundRefresher
+from cache_policy import PolicyCache
+from history_files import has_user_history, load_user_history, save_user_history
+
+DEFAULT_BUDGET_MB = 512
+
+# A session used this recently is never evicted, so a script run in progress
+# keeps its data.
+MIN_IDLE_SECONDS = 60
+
+# The heavy, rebuildable part of one browser session: every account's store
+# and running aggregates, the combined view over them and the session's
+# response cache. evict() drops the stores and rehydrate() reads them back and
+# refolds the aggregates. With a history directory the stores are read back
+# from the histories the app already saves there (only missing ones are
+# written). Otherwise they are written to a directory named after the session
+# under the spill directory, deleted once read back, when the session is
+# garbage collected or when the process exits.
+class SessionData:
+    def __init__(self, refresher: Optional[BackgroundRefresher] = None, response_cache: Optional[PolicyCache] = None):
+        self.id = uuid.uuid4().hex
+        self.accounts: List[Account] = []
+        self.transactions = None
+        self.aggregates = None
+        self.refresher = refresher
+        self.response_cache = response_cache
+        self.last_active = time.monotonic()
+        self.evicted = False
+        self._nbytes = 0
+        self._restore_dir: Optional[str] = None
+        self._spill: Optional[weakref.finalize] = None
+        # Guards eviction against the session's own script runs: touch()
+        # registers the running thread under it and evict() skips the session
+        # while any registered thread is still alive.
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def nbytes(self) -> int:
+        # Size as of the last measure(); kept current by the session itself so
+        # budget checks never walk other sessions' data.
+        return self._nbytes
+
+    def measure(self) -> int:
+        # A single account's store doubles as the combined view; count it once.
+        stores = {id(store): store for store in [self.transactions] + [a.store for a in self.accounts] if store is not None}
+        aggregates = {id(agg): agg for agg in [self.aggregates] + [a.aggregates for a in self.accounts] if agg is not None}
+        total = sum(store.nbytes for store in stores.values()) + sum(agg.nbytes for agg in aggregates.values())
+        if self.response_cache is not None:
+            total += self.response_cache.total_bytes
+        self._nbytes = total
+        return total
+
+    def running(self) -> bool:
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        return bool(self._threads)
+
+    def spill_path(self, spill_dir: str) -> str:
+        return os.path.join(spill_dir, self.id)
+
+    def busy(self) -> bool:
+        # A refresh in flight or waiting to be applied still needs the stores.
+        return self.refresher is not None and (self.refresher.is_running() or self.refresher.has_result())
+
+    def evict(self, spill_dir: Optional[str], min_idle_seconds: float = MIN_IDLE_SECONDS, history_dir: Optional[str] = None) -> int:
+        # Bytes released; 0 when there was nothing to evict or the session
+        # became active in the meantime.
+        with self._lock:
+            if self.evicted or self.transactions is None or self.running():
+                return 0
+            if time.monotonic() - self.last_active < min_idle_seconds:
+                return 0
+            freed = self.nbytes
+            path = history_dir or self.spill_path(spill_dir)
+            try:
+                os.makedirs(path, exist_ok=True)
+                for account in self.accounts:
+                    if history_dir is None or not has_user_history(path, account.user_id):
+                        save_user_history(path, account.user_id, account.store)
+            except Exception as e:
+                print(f"Error evicting session data: {e}")
+                if history_dir is None:
+                    shutil.rmtree(path, ignore_errors=True)
+                return 0
+            self._restore_dir = path
+            if history_dir is None:
+                self._spill = weakref.finalize(self, shutil.rmtree, path, True)
+            for account in self.accounts:
+                account.store = None
+                account.aggregates = None
+            self.transactions = None
+            self.aggregates = None
+            if self.response_cache is not None:
+                self.response_cache.invalidate()
+            self.evicted = True
+            self._nbytes = 0
+            return freed
+
+    def rehydrate(self) -> bool:
+        # False when a store could not be read back; transactions stay None
+        # and the app fetches the accounts from the API again.
+        with self._lock:
+            if not self.evicted:
+                return True
+            self.evicted = False
+            try:
+                stores = [load_user_history(self._restore_dir, account.user_id) for account in self.accounts]
+            except Exception as e:
+                print(f"Error restoring session data: {e}")
+                return False
+            finally:
+                if self._spill is not None:
+                    self._spill()
+                    self._spill = None
+            if any(store is None for store in stores):
+                return False
+            for account, store in zip(self.accounts, stores):
+                account.store = store
+                account.aggregates = RunningAggregates(store)
+                account.aggregates.update()
+            self.transactions, self.aggregates = combine_accounts(self.accounts)
+            self.measure()
+            return True
+
+# Process-wide accounting of every live SessionData, least recently active
+# first. Once the sessions together hold more than budget_bytes, idle ones are
+# evicted oldest first until the total fits again; a session is restored the
+# next time it is touched. Only weak references are kept, so sessions
+# Streamlit has dropped fall out of the accounting on their own. Sizes are the
+# ones each session last measured, so enforcing the budget is O(sessions).
+# Sessions are restored from history_dir when one is configured; the spill
+# directory is only the fallback for running without one.
+class SessionMemory:
+    def __init__(self, budget_bytes: int, history_dir: Optional[str] = None, spill_dir: Optional[str] = None,
+                 min_idle_seconds: float = MIN_IDLE_SECONDS):
+        self.budget_bytes = budget_bytes
+        self.history_dir = history_dir
+        self.spill_dir = spill_dir
+        if spill_dir is None and history_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='session-spill-')
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        self.min_idle_seconds = min_idle_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._sessions: 'OrderedDict[str, weakref.ref]' = OrderedDict()
+
+    def touch(self, data: SessionData):
+        # Called from the session's script run: holds the session against
+        # eviction until the calling thread finishes, marks it the most
+        # recently active, restores it if it was evicted, remeasures it (the
+        # previous run may have grown its caches) and enforces the budget.
+        with data._lock:
+            data._threads = [thread for thread in data._threads if thread.is_alive()] + [threading.current_thread()]
+            data.last_active = time.monotonic()
+        with self._lock:
+            self._sessions[data.id] = weakref.ref(data)
+            self._sessions.move_to_end(data.id)
+        data.rehydrate()
+        data.measure()
+        self.enforce()
+
+    def sessions(self) -> List[SessionData]:
+        with self._lock:
+            live = []
+            for key, ref in list(self._sessions.items()):
+                data = ref()
+                if data is None:
+                    del self._sessions[key]
+                else:
+                    live.append(data)
+            return live
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(data.nbytes for data in self.sessions())
+
+    def enforce(self) -> int:
+        # Number of sessions evicted.
+        sessions = self.sessions()
+        sizes = [data.nbytes for data in sessions]
+        total = sum(sizes)
+        evicted = 0
+        for data, size in zip(sessions, sizes):
+            if total <= self.budget_bytes:
+                break
+            if size == 0 or data.busy():
+                continue
+            if data.evict(self.spill_dir, self.min_idle_seconds, self.history_dir):
+                total -= size
+                evicted += 1
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+        return evicted
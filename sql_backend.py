@@ -0,0 +1,178 @@
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from aggregates import BREAKDOWN_COLUMNS, NS_PER_DAY
+from transaction_store import TransactionStore, STRING_COLUMNS, OUTGOING
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+BACKENDS = ('duckdb', 'sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    user_id BIGINT,
+    seq BIGINT,
+    ts BIGINT,
+    day INTEGER,
+    month VARCHAR,
+    item VARCHAR,
+    type VARCHAR,
+    category VARCHAR,
+    transaction_type VARCHAR,
+    amount BIGINT,
+    direction INTEGER
+)
+"""
+
+COLUMNS = ('user_id', 'seq', 'ts', 'day', 'month') + STRING_COLUMNS + ('amount', 'direction')
+
+# Embedded SQL copy of every loaded account's transactions, one table for all
+# users. DuckDB is used when installed (parallel, vectorized scans); otherwise
+# the standard library's sqlite3 answers the same queries. One connection is
+# shared behind a lock, since neither driver allows concurrent use of it.
+class SqlStore:
+    def __init__(self, backend: str = 'duckdb', path: str = ':memory:'):
+        if backend == 'duckdb' and duckdb is None:
+            print("Error opening DuckDB backend: duckdb is not installed, using sqlite")
+            backend = 'sqlite'
+        self.backend = backend
+        self._lock = threading.Lock()
+        if backend == 'duckdb':
+            self._connection = duckdb.connect(path)
+        else:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(SCHEMA)
+        if backend == 'sqlite':
+            self._connection.execute('CREATE INDEX IF NOT EXISTS transactions_range ON transactions (user_id, direction, ts)')
+
+    def load(self, user_id: int, store: TransactionStore):
+        # Replaces everything held for user_id with the store's rows.
+        timestamps = store.timestamps
+        frame = pd.DataFrame({
+            'user_id': np.full(len(store), user_id, dtype=np.int64),
+            'seq': np.arange(len(store), dtype=np.int64),
+            'ts': timestamps,
+            'day': (timestamps // NS_PER_DAY).astype(np.int64),
+            'month': timestamps.view('datetime64[ns]').astype('datetime64[M]').astype(str),
+            **{column: store.categorical(column).astype(object) for column in STRING_COLUMNS},
+            'amount': store.amounts.astype(np.int64),
+            'direction': store.directions.astype(np.int64),
+        })
+        with self._lock:
+            self._connection.execute('DELETE FROM transactions WHERE user_id = ?', [user_id])
+            if self.backend == 'duckdb':
+                self._connection.register('incoming', frame)
+                self._connection.execute('INSERT INTO transactions SELECT * FROM incoming')
+                self._connection.unregister('incoming')
+            else:
+                placeholders = ', '.join('?' * len(COLUMNS))
+                self._connection.executemany(
+                    f'INSERT INTO transactions VALUES ({placeholders})',
+                    zip(*(frame[column].tolist() for column in COLUMNS))
+                )
+                self._connection.commit()
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._connection.execute('DELETE FROM transactions WHERE user_id = ?', [user_id])
+            if self.backend == 'sqlite':
+                self._connection.commit()
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, list(params)).fetchall()
+
+# Same read interface as FrameAggregates, answered by SQL over the spending
+# rows of user_ids between start and end (inclusive dates, both optional), so
+# nothing is materialized in pandas beyond the aggregated result.
+class SqlAggregates:
+    def __init__(self, db: SqlStore, user_ids: List[int], start: Optional[date] = None, end: Optional[date] = None):
+        self.db = db
+        conditions = [f"user_id IN ({', '.join('?' * len(user_ids))})", 'direction = ?']
+        self._params: List = list(user_ids) + [OUTGOING]
+        if start is not None:
+            conditions.append('ts >= ?')
+            self._params.append(int(pd.Timestamp(start).value))
+        if end is not None:
+            conditions.append('ts < ?')
+            self._params.append(int(pd.Timestamp(end + timedelta(days=1)).value))
+        self._where = ' AND '.join(conditions)
+        self._totals = {}
+        count, total = self._query('SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM transactions WHERE {where}')[0]
+        self.count = int(count)
+        self.total = int(total)
+
+    def _query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        return self.db.query(sql.format(where=self._where), self._params + list(params))
+
+    def _column(self, column: str) -> str:
+        if column not in STRING_COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        return column
+
+    def _grouped(self, column: str, suffix: str = '', params: Sequence = ()) -> pd.DataFrame:
+        # Highest amount first; ties keep first-seen order like the other
+        # aggregates.
+        column = self._column(column)
+        rows = self._query(
+            f'SELECT {column}, SUM(amount) AS amount, COUNT(*) AS count FROM transactions WHERE {{where}} '
+            f'GROUP BY {column} ORDER BY amount DESC, MIN(user_id), MIN(seq) {suffix}',
+            params
+        )
+        frame = pd.DataFrame(rows, columns=[column, 'amount', 'count'])
+        frame[column] = frame[column].astype(object)
+        return frame.astype({'amount': np.int64, 'count': np.int64})
+
+    def distinct(self, column: str) -> int:
+        return int(self._query(f'SELECT COUNT(DISTINCT {self._column(column)}) FROM transactions WHERE {{where}}')[0][0])
+
+    def totals(self, column: str) -> pd.DataFrame:
+        if column not in self._totals:
+            self._totals[column] = self._grouped(column)
+        return self._totals[column]
+
+    def totals_page(self, column: str, page: int, page_size: int) -> pd.DataFrame:
+        if column in self._totals:
+            return self._totals[column].iloc[page * page_size:(page + 1) * page_size].reset_index(drop=True)
+        return self._grouped(column, 'LIMIT ? OFFSET ?', [page_size, page * page_size])
+
+    def top(self, column: str, n: int) -> pd.DataFrame:
+        if column in self._totals:
+            return self._totals[column].head(n)
+        return self._grouped(column, 'LIMIT ?', [n])
+
+    def breakdown(self) -> pd.DataFrame:
+        columns = ', '.join(BREAKDOWN_COLUMNS)
+        rows = self._query(
+            f'SELECT {columns}, SUM(amount), COUNT(*) FROM transactions WHERE {{where}} GROUP BY {columns}'
+        )
+        frame = pd.DataFrame(rows, columns=list(BREAKDOWN_COLUMNS) + ['amount', 'count'])
+        return frame.astype({column: object for column in BREAKDOWN_COLUMNS} | {'amount': np.int64, 'count': np.int64})
+
+    def monthly_series(self) -> pd.DataFrame:
+        rows = self._query('SELECT month, SUM(amount) FROM transactions WHERE {where} GROUP BY month ORDER BY month')
+        return pd.DataFrame(rows, columns=['month', 'amount']).astype({'amount': np.int64})
+
+    def daily_series(self) -> pd.DataFrame:
+        rows = self._query('SELECT day, SUM(amount), COUNT(*) FROM transactions WHERE {where} GROUP BY day ORDER BY day')
+        days, amounts, counts = (zip(*rows) if rows else ((), (), ()))
+        return pd.DataFrame({
+            'date': np.array(days, dtype=np.int64).astype('datetime64[D]'),
+            'amount': np.array(amounts, dtype=np.int64),
+            'count': np.array(counts, dtype=np.int64),
+        })
+
+    def daily_frame(self) -> pd.DataFrame:
+        rows = self._query(
+            'SELECT day, category, item, SUM(amount) FROM transactions WHERE {where} GROUP BY day, category, item'
+        )
+        frame = pd.DataFrame(rows, columns=['day', 'category', 'item', 'amount'])
+        return frame.astype({'day': np.int64, 'amount': np.int64})
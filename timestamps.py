@@ -0,0 +1,97 @@
+import argparse
+import re
+import time
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# The transactions endpoint sends UTC timestamps with a 'Z' suffix and
+# optional fractional seconds. Every value is checked against that shape; the
+# ones that match have the suffix stripped and are parsed natively by numpy
+# (any fraction length up to nanoseconds). Everything else, such as explicit
+# offsets, goes through pandas' ISO 8601 parser, which must still find a time
+# of day: a bare date is reported as unparseable rather than read as midnight.
+UTC_PATTERN = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(\.\d{1,9})?Z')
+DATETIME_PATTERN = re.compile(r'\d{4}-\d\d-\d\d[T ]\d\d:\d\d.*')
+ISO8601 = 'ISO8601'
+
+def _matches(values: pd.Series, pattern: re.Pattern) -> np.ndarray:
+    # Non-string values never match.
+    return np.fromiter(
+        (isinstance(value, str) and pattern.fullmatch(value) is not None for value in values),
+        dtype=bool, count=len(values)
+    )
+
+def _parse_iso8601(values: pd.Series) -> np.ndarray:
+    parsed = pd.to_datetime(values, format=ISO8601, utc=True, errors='coerce')
+    parsed = parsed.dt.tz_localize(None).astype('datetime64[ns]').to_numpy()
+    return np.where(_matches(values, DATETIME_PATTERN), parsed, np.datetime64('NaT'))
+
+def parse_timestamps(values: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    # Returns naive UTC datetime64[ns] values and a mask of rows that could not
+    # be parsed (NaT in the result).
+    series = pd.Series(values, dtype=object)
+    parsed = np.full(len(series), np.datetime64('NaT'), dtype='datetime64[ns]')
+    utc = _matches(series, UTC_PATTERN)
+    if utc.any():
+        try:
+            parsed[utc] = np.array([value[:-1] for value in series[utc]], dtype='datetime64[ns]')
+        except ValueError:
+            # Well-formed but out of range (month 13, say); let pandas decide.
+            utc[:] = False
+    if not utc.all():
+        parsed[~utc] = _parse_iso8601(series[~utc])
+    return parsed, np.isnat(parsed)
+
+def _legacy_parse(created: str) -> datetime:
+    try:
+        return datetime.strptime(created, '%Y-%m-%dT%H:%M:%S.%fZ')
+    except ValueError:
+        try:
+            return datetime.strptime(created, '%Y-%m-%dT%H:%M:%SZ')
+        except ValueError:
+            return datetime.now()
+
+BENCHMARK_START = datetime(2024, 1, 1)
+BENCHMARK_STEP = timedelta(seconds=37)
+
+def benchmark_batches(rows: int) -> List[Tuple[str, List[str]]]:
+    moments = [BENCHMARK_START + BENCHMARK_STEP * i + timedelta(microseconds=(i * 7919) % 1000000) for i in range(rows)]
+    return [
+        ('milliseconds', [m.strftime('%Y-%m-%dT%H:%M:%S.') + f'{m.microsecond // 1000:03d}Z' for m in moments]),
+        ('seconds', [m.strftime('%Y-%m-%dT%H:%M:%SZ') for m in moments]),
+        ('7-digit fraction', [m.strftime('%Y-%m-%dT%H:%M:%S.%f') + '0Z' for m in moments]),
+        ('offset', [m.strftime('%Y-%m-%dT%H:%M:%S+02:00') for m in moments]),
+    ]
+
+def benchmark(rows: int = 100000, repeat: int = 3):
+    # Compares the per-row strptime chain parse_transactions used to run with
+    # the batch parser; "fallback" counts rows the old path replaced with now().
+    latest = BENCHMARK_START + BENCHMARK_STEP * rows
+    print(f"{'batch':<18}{'strptime':>12}{'batch parser':>14}{'speedup':>10}{'fallback':>10}{'unparsed':>10}")
+    for label, values in benchmark_batches(rows):
+        legacy_times, fast_times = [], []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            legacy = [_legacy_parse(value) for value in values]
+            legacy_times.append(time.perf_counter() - began)
+            began = time.perf_counter()
+            parsed, invalid = parse_timestamps(values)
+            parsed.astype('datetime64[us]').tolist()
+            fast_times.append(time.perf_counter() - began)
+        fallback = sum(1 for result in legacy if result > latest)
+        legacy_time, fast_time = min(legacy_times), min(fast_times)
+        print(f"{label:<18}{legacy_time * 1000:>10.1f}ms{fast_time * 1000:>12.1f}ms{legacy_time / fast_time:>9.1f}x"
+              f"{fallback:>10}{int(invalid.sum()):>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark for the transaction timestamp parser.')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.rows, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import itertools
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+STRING_COLUMNS = ('item', 'type', 'category', 'transaction_type')
+MISSING_UNIVERSE_ID = -1
+MISSING_ID = -1
+OUTGOING = -1
+TIME_COLUMNS = ('day', 'week', 'month')
+
+_versions = itertools.count(1)
+
+def add_time_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Calendar buckets derived once per frame: day (midnight), week
+    # (Period[W-SUN]) and month (Period[M]). Sections filter and group on
+    # these instead of deriving them from date on every rerun.
+    dates = pd.DatetimeIndex(df['date'])
+    df['day'] = dates.normalize()
+    df['week'] = dates.to_period('W')
+    df['month'] = dates.to_period('M')
+    return df
+
+class StringDictionary:
+    def __init__(self):
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, strings: Iterable[str]) -> np.ndarray:
+        index = self.index
+        values = self.values
+        codes = []
+        for value in strings:
+            code = index.get(value)
+            if code is None:
+                code = len(values)
+                index[value] = code
+                values.append(value)
+            codes.append(code)
+        return np.asarray(codes, dtype=np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(49 + len(value) for value in self.values)
+
+# Columnar replacement for the list of parsed transaction dicts: repeated
+# strings are dictionary-encoded, dates are int64 epoch nanoseconds and
+# amounts are int32. to_dataframe() wraps the arrays without copying them and
+# is cached until the store grows, time columns included. version is unique in
+# the process and changes whenever rows are appended, so derived results can be
+# cached on it instead of hashing the rows.
+# Amounts are always positive; directions holds -1 for money spent and +1 for
+# income (sales, payouts, stipends, incoming trades).
+class TransactionStore:
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.amounts = np.empty(0, dtype=np.int32)
+        self.directions = np.empty(0, dtype=np.int8)
+        self.universe_ids = np.empty(0, dtype=np.int64)
+        self.codes = {column: np.empty(0, dtype=np.int32) for column in STRING_COLUMNS}
+        self.dictionaries = {column: StringDictionary() for column in STRING_COLUMNS}
+        self._frames: Dict[bool, Tuple[np.ndarray, pd.DataFrame]] = {}
+        self.version = next(_versions)
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'TransactionStore':
+        store = cls()
+        store.extend(records)
+        return store
+
+    @classmethod
+    def merge(cls, stores: List['TransactionStore']) -> 'TransactionStore':
+        # Each store's codes are remapped through a lookup built from its own
+        # dictionary, so merging never touches individual rows in Python.
+        merged = cls()
+        stores = [store for store in stores if len(store)]
+        if not stores:
+            return merged
+
+        merged.ids = np.concatenate([store.ids for store in stores])
+        merged.timestamps = np.concatenate([store.timestamps for store in stores])
+        merged.amounts = np.concatenate([store.amounts for store in stores])
+        merged.directions = np.concatenate([store.directions for store in stores])
+        merged.universe_ids = np.concatenate([store.universe_ids for store in stores])
+        for column in STRING_COLUMNS:
+            dictionary = merged.dictionaries[column]
+            merged.codes[column] = np.concatenate([
+                dictionary.encode(store.dictionaries[column].values)[store.codes[column]] for store in stores
+            ])
+        return merged
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def extend(self, records: List[Dict]):
+        if not records:
+            return
+
+        ids = np.fromiter(
+            (MISSING_ID if r.get('id') is None else r['id'] for r in records),
+            dtype=np.int64,
+            count=len(records)
+        )
+        timestamps = np.array([r['date'] for r in records], dtype='datetime64[ns]').view(np.int64)
+        amounts = np.fromiter((r['amount'] for r in records), dtype=np.int32, count=len(records))
+        directions = np.fromiter((r.get('direction', OUTGOING) for r in records), dtype=np.int8, count=len(records))
+        universe_ids = np.fromiter(
+            (MISSING_UNIVERSE_ID if r.get('universe_id') is None else r['universe_id'] for r in records),
+            dtype=np.int64,
+            count=len(records)
+        )
+
+        self.ids = np.concatenate([self.ids, ids])
+        self.timestamps = np.concatenate([self.timestamps, timestamps])
+        self.amounts = np.concatenate([self.amounts, amounts])
+        self.directions = np.concatenate([self.directions, directions])
+        self.universe_ids = np.concatenate([self.universe_ids, universe_ids])
+        for column in STRING_COLUMNS:
+            new_codes = self.dictionaries[column].encode(r[column] for r in records)
+            self.codes[column] = np.concatenate([self.codes[column], new_codes])
+        self.version = next(_versions)
+
+    def save(self, path: str):
+        arrays = {
+            'ids': self.ids,
+            'timestamps': self.timestamps,
+            'amounts': self.amounts,
+            'directions': self.directions,
+            'universe_ids': self.universe_ids,
+        }
+        for column in STRING_COLUMNS:
+            arrays[f'{column}_codes'] = self.codes[column]
+            arrays[f'{column}_values'] = np.array(self.dictionaries[column].values, dtype=str)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'TransactionStore':
+        store = cls()
+        with np.load(path, allow_pickle=False) as data:
+            store.timestamps = data['timestamps']
+            if 'ids' in data.files:
+                store.ids = data['ids']
+            else:
+                store.ids = np.full(len(store.timestamps), MISSING_ID, dtype=np.int64)
+            store.amounts = data['amounts']
+            store.universe_ids = data['universe_ids']
+            # Histories saved before income types were fetched hold purchases only.
+            if 'directions' in data.files:
+                store.directions = data['directions']
+            else:
+                store.directions = np.full(len(store.timestamps), OUTGOING, dtype=np.int8)
+            for column in STRING_COLUMNS:
+                dictionary = store.dictionaries[column]
+                if f'{column}_codes' in data.files:
+                    store.codes[column] = data[f'{column}_codes']
+                    dictionary.values = data[f'{column}_values'].tolist()
+                    dictionary.index = {value: code for code, value in enumerate(dictionary.values)}
+                else:
+                    store.codes[column] = np.zeros(len(store.timestamps), dtype=np.int32)
+                    dictionary.encode(['Purchase'])
+        return store
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.timestamps.view('datetime64[ns]')
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.ids, self.timestamps, self.amounts, self.directions, self.universe_ids, *self.codes.values()]
+        derived = sum(frame[column].array.nbytes for _, frame in self._frames.values() for column in TIME_COLUMNS)
+        return sum(a.nbytes for a in arrays) + sum(d.nbytes for d in self.dictionaries.values()) + derived
+
+    def categorical(self, column: str, rows: Optional[np.ndarray] = None) -> pd.Categorical:
+        codes = self.codes[column] if rows is None else self.codes[column][rows]
+        return pd.Categorical.from_codes(codes, categories=self.dictionaries[column].values)
+
+    def spending_rows(self) -> Optional[np.ndarray]:
+        # None when every row is spending, so callers can skip the copy.
+        outgoing = self.directions == OUTGOING
+        return None if outgoing.all() else outgoing
+
+    def to_dataframe(self, spending_only: bool = False) -> pd.DataFrame:
+        # The returned frame is shared between calls; callers must not modify
+        # it in place.
+        cached = self._frames.get(spending_only)
+        if cached is not None and cached[0] is self.timestamps:
+            return cached[1]
+        rows = self.spending_rows() if spending_only else None
+        take = (lambda values: values) if rows is None else (lambda values: values[rows])
+
+        universe_ids = take(self.universe_ids)
+        missing = universe_ids == MISSING_UNIVERSE_ID
+        if missing.any():
+            universe_ids = np.where(missing, np.nan, universe_ids)
+
+        frame = pd.DataFrame({
+            'date': pd.DatetimeIndex(take(self.timestamps).view('datetime64[ns]')),
+            'item': self.categorical('item', rows),
+            'type': self.categorical('type', rows),
+            'amount': take(self.amounts),
+            'category': self.categorical('category', rows),
+            'universe_id': universe_ids,
+            'transaction_type': self.categorical('transaction_type', rows),
+            'direction': take(self.directions),
+        }, copy=False)
+        add_time_columns(frame)
+        self._frames[spending_only] = (self.timestamps, frame)
+        return frame
+
+def store_path(data_dir: str, user_id) -> str:
+    return os.path.join(data_dir, f'{user_id}.npz')
+
+def load_user_store(data_dir: str, user_id) -> Optional[TransactionStore]:
+    path = store_path(data_dir, user_id)
+    if not os.path.exists(path):
+        return None
+    return TransactionStore.load(path)